@@ -1,11 +1,18 @@
-from flask import Blueprint, request, jsonify, g
+from flask import Blueprint, request, jsonify, g, Response
 from datetime import datetime
-from auth.models import User
+from auth.middleware import current_user_id, auth_error_response
 from models.community_posts import CommunityPost, PostComment
+from services.feed_cache import FeedCache
+from services.http_cache import etag_matches, not_modified
+from models.projection import parse_fields
+from bson import ObjectId
 import logging
 
 community_bp = Blueprint('community', __name__)
 
+# Upper bound on post ids accepted by the batch status endpoint
+MAX_STATUS_BATCH = 100
+
 @community_bp.route('/posts', methods=['POST'])
 def create_post():
     """Create a new community post"""
@@ -15,14 +22,9 @@ def create_post():
             return jsonify({"error": "No JSON data provided"}), 400
         
         # Get user from JWT token
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({"error": "Authorization header required"}), 401
-        
-        token = auth_header.split(' ')[1]
-        user_id = User.verify_jwt_token(token)
+        user_id = current_user_id()
         if not user_id:
-            return jsonify({"error": "Invalid or expired token"}), 401
+            return auth_error_response()
         
         # Validate required fields
         mood = data.get('mood', '').strip()
@@ -68,45 +70,59 @@ def get_posts():
     try:
         limit = request.args.get('limit', 20, type=int)
         skip = request.args.get('skip', 0, type=int)
+        cursor = request.args.get('cursor', '').strip() or None
         mood_filter = request.args.get('mood', '').strip()
         activity_type_filter = request.args.get('activity_type', '').strip()
         
         if limit > 50:
             limit = 50
+        elif limit < 1:
+            limit = 1
         
         # Get current user if authenticated
-        current_user_id = None
-        auth_header = request.headers.get('Authorization')
-        if auth_header and auth_header.startswith('Bearer '):
-            token = auth_header.split(' ')[1]
-            current_user_id = User.verify_jwt_token(token)
-        
-        posts = CommunityPost.get_posts(
-            limit=limit,
-            skip=skip,
-            mood_filter=mood_filter if mood_filter else None,
-            activity_type_filter=activity_type_filter if activity_type_filter else None
-        )
-        
-        # Add user interaction status to each post
-        for post in posts:
-            post['_id'] = str(post['_id'])
-            post['user_id'] = str(post['user_id'])
-            post['created_at'] = post['created_at'].isoformat()
-            
-            # Add like/star status for current user
-            if current_user_id:
-                post['isLiked'] = CommunityPost.is_post_liked_by_user(str(post['_id']), current_user_id)
-                post['isStarred'] = CommunityPost.is_post_starred_by_user(str(post['_id']), current_user_id)
-            else:
-                post['isLiked'] = False
-                post['isStarred'] = False
-        
-        return jsonify({
-            "posts": posts,
-            "count": len(posts),
-            "has_more": len(posts) == limit
-        }), 200
+        viewer_id = current_user_id()
+        
+        mood_filter = mood_filter if mood_filter else None
+        activity_type_filter = activity_type_filter if activity_type_filter else None
+        
+        try:
+            fields = parse_fields(request.args.get('fields'), CommunityPost.FIELDS)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        def build_page():
+            return CommunityPost.get_posts_page(
+                limit=limit,
+                cursor=cursor,
+                mood_filter=mood_filter,
+                activity_type_filter=activity_type_filter,
+                skip=skip,
+                fields=fields
+            )
+        
+        try:
+            # The first pages of each filter are shared by every viewer; legacy skip requests bypass the cache
+            page = None
+            if not skip:
+                page = FeedCache.get_page(mood_filter, activity_type_filter, limit, cursor, build_page, fields)
+            if page is None:
+                page = FeedCache.build_page(build_page)
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
+        
+        # Overlay like/star status for the current user with two batched queries
+        liked, starred = set(), set()
+        if viewer_id:
+            liked, starred = CommunityPost.get_user_reactions(page.post_ids, viewer_id)
+        
+        # A client that already has this exact page gets a 304 without it being rendered
+        etag = FeedCache.etag(page, liked, starred)
+        if etag_matches(etag):
+            return not_modified(etag)
+        
+        response = Response(FeedCache.render(page, liked, starred), mimetype='application/json')
+        response.set_etag(etag)
+        return response, 200
         
     except Exception as e:
         logging.error(f"Error getting posts: {str(e)}")
@@ -120,46 +136,48 @@ def get_post(post_id):
         if not post:
             return jsonify({"error": "Post not found"}), 404
         
-        # Convert ObjectId to string
-        post['_id'] = str(post['_id'])
-        post['user_id'] = str(post['user_id'])
-        post['created_at'] = post['created_at'].isoformat()
-        
         return jsonify(post), 200
         
     except Exception as e:
         logging.error(f"Error getting post: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
 
+@community_bp.route('/posts/<post_id>', methods=['DELETE'])
+def delete_post(post_id):
+    """Delete one of the current user's posts"""
+    try:
+        user_id = current_user_id()
+        if not user_id:
+            return auth_error_response()
+        
+        if not ObjectId.is_valid(post_id) or not CommunityPost.delete(post_id, user_id):
+            return jsonify({"error": "Post not found"}), 404
+        
+        return jsonify({"message": "Post deleted"}), 200
+        
+    except Exception as e:
+        logging.error(f"Error deleting post: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
 @community_bp.route('/posts/<post_id>/like', methods=['POST'])
 def like_post(post_id):
     """Like a post"""
     try:
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({"error": "Authorization header required"}), 401
-        
-        token = auth_header.split(' ')[1]
-        user_id = User.verify_jwt_token(token)
+        user_id = current_user_id()
         if not user_id:
-            return jsonify({"error": "Invalid or expired token"}), 401
+            return auth_error_response()
         
-        post = CommunityPost.get_post_by_id(post_id)
+        post = CommunityPost.get_post_by_id(post_id, fields=['_id'])
         if not post:
             return jsonify({"error": "Post not found"}), 404
         
         success = CommunityPost.like_post(post_id, user_id)
         
-        if success:
-            return jsonify({
-                "message": "Post liked successfully",
-                "liked": True
-            }), 200
-        else:
-            return jsonify({
-                "message": "Post already liked",
-                "liked": True
-            }), 200
+        return jsonify({
+            "message": "Post liked successfully" if success else "Post already liked",
+            "liked": True,
+            "changed": success
+        }), 200
         
     except Exception as e:
         logging.error(f"Error liking post: {str(e)}")
@@ -170,21 +188,17 @@ def unlike_post(post_id):
     """Unlike a post"""
     try:
         # Get user from JWT token
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({"error": "Authorization header required"}), 401
-        
-        token = auth_header.split(' ')[1]
-        user_id = User.verify_jwt_token(token)
+        user_id = current_user_id()
         if not user_id:
-            return jsonify({"error": "Invalid or expired token"}), 401
+            return auth_error_response()
         
         # Unlike the post
         success = CommunityPost.unlike_post(post_id, user_id)
         
         return jsonify({
             "message": "Post unliked successfully" if success else "Post was not liked",
-            "liked": False
+            "liked": False,
+            "changed": success
         }), 200
         
     except Exception as e:
@@ -195,31 +209,21 @@ def unlike_post(post_id):
 def star_post(post_id):
     """Star a post"""
     try:
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({"error": "Authorization header required"}), 401
-        
-        token = auth_header.split(' ')[1]
-        user_id = User.verify_jwt_token(token)
+        user_id = current_user_id()
         if not user_id:
-            return jsonify({"error": "Invalid or expired token"}), 401
+            return auth_error_response()
         
-        post = CommunityPost.get_post_by_id(post_id)
+        post = CommunityPost.get_post_by_id(post_id, fields=['_id'])
         if not post:
             return jsonify({"error": "Post not found"}), 404
         
         success = CommunityPost.star_post(post_id, user_id)
         
-        if success:
-            return jsonify({
-                "message": "Post starred successfully",
-                "starred": True
-            }), 200
-        else:
-            return jsonify({
-                "message": "Post already starred",
-                "starred": True
-            }), 200
+        return jsonify({
+            "message": "Post starred successfully" if success else "Post already starred",
+            "starred": True,
+            "changed": success
+        }), 200
         
     except Exception as e:
         logging.error(f"Error starring post: {str(e)}")
@@ -230,21 +234,17 @@ def unstar_post(post_id):
     """Unstar a post"""
     try:
         # Get user from JWT token
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({"error": "Authorization header required"}), 401
-        
-        token = auth_header.split(' ')[1]
-        user_id = User.verify_jwt_token(token)
+        user_id = current_user_id()
         if not user_id:
-            return jsonify({"error": "Invalid or expired token"}), 401
+            return auth_error_response()
         
         # Unstar the post
         success = CommunityPost.unstar_post(post_id, user_id)
         
         return jsonify({
             "message": "Post unstarred successfully" if success else "Post was not starred",
-            "starred": False
+            "starred": False,
+            "changed": success
         }), 200
         
     except Exception as e:
@@ -255,16 +255,11 @@ def unstar_post(post_id):
 def get_post_status(post_id):
     """Get current like/star status of a post for the current user"""
     try:
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({"error": "Authorization header required"}), 401
-        
-        token = auth_header.split(' ')[1]
-        user_id = User.verify_jwt_token(token)
+        user_id = current_user_id()
         if not user_id:
-            return jsonify({"error": "Invalid or expired token"}), 401
+            return auth_error_response()
         
-        post = CommunityPost.get_post_by_id(post_id)
+        post = CommunityPost.get_post_by_id(post_id, fields=['likes', 'stars'])
         if not post:
             return jsonify({"error": "Post not found"}), 404
         
@@ -283,6 +278,50 @@ def get_post_status(post_id):
         logging.error(f"Error getting post status: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
 
+@community_bp.route('/posts/status', methods=['POST'])
+def get_posts_status():
+    """Get like/star status of many posts for the current user in one call"""
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({"error": "No JSON data provided"}), 400
+        
+        user_id = current_user_id()
+        if not user_id:
+            return auth_error_response()
+        
+        post_ids = data.get('post_ids')
+        if not isinstance(post_ids, list) or not post_ids:
+            return jsonify({"error": "post_ids must be a non-empty list"}), 400
+        
+        if len(post_ids) > MAX_STATUS_BATCH:
+            return jsonify({"error": f"At most {MAX_STATUS_BATCH} post_ids per request"}), 400
+        
+        if not all(isinstance(post_id, str) and ObjectId.is_valid(post_id) for post_id in post_ids):
+            return jsonify({"error": "post_ids must be valid post IDs"}), 400
+        
+        posts = CommunityPost.get_posts_by_ids(post_ids, fields=['likes', 'stars'])
+        liked, starred = CommunityPost.get_user_reactions([post['_id'] for post in posts], user_id)
+        
+        statuses = {}
+        for post in posts:
+            post_id = str(post['_id'])
+            statuses[post_id] = {
+                "is_liked": post_id in liked,
+                "is_starred": post_id in starred,
+                "total_likes": post.get('likes', 0),
+                "total_stars": post.get('stars', 0)
+            }
+        
+        return jsonify({
+            "statuses": statuses,
+            "missing": [post_id for post_id in post_ids if post_id not in statuses]
+        }), 200
+        
+    except Exception as e:
+        logging.error(f"Error getting posts status: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
 @community_bp.route('/posts/<post_id>/comments', methods=['POST'])
 def add_comment(post_id):
     """Add a comment to a post"""
@@ -292,14 +331,9 @@ def add_comment(post_id):
             return jsonify({"error": "No JSON data provided"}), 400
         
         # Get user from JWT token
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({"error": "Authorization header required"}), 401
-        
-        token = auth_header.split(' ')[1]
-        user_id = User.verify_jwt_token(token)
+        user_id = current_user_id()
         if not user_id:
-            return jsonify({"error": "Invalid or expired token"}), 401
+            return auth_error_response()
         
         # Validate comment
         comment = data.get('comment', '').strip()
@@ -307,7 +341,7 @@ def add_comment(post_id):
             return jsonify({"error": "comment is required"}), 400
         
         # Check if post exists
-        post = CommunityPost.get_post_by_id(post_id)
+        post = CommunityPost.get_post_by_id(post_id, fields=['_id'])
         if not post:
             return jsonify({"error": "Post not found"}), 404
         
@@ -327,17 +361,16 @@ def add_comment(post_id):
 def get_comments(post_id):
     """Get comments for a post"""
     try:
-        post = CommunityPost.get_post_by_id(post_id)
+        post = CommunityPost.get_post_by_id(post_id, fields=['_id'])
         if not post:
             return jsonify({"error": "Post not found"}), 404
         
-        comments = PostComment.get_post_comments(post_id)
+        try:
+            fields = parse_fields(request.args.get('fields'), PostComment.FIELDS)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
-        for comment in comments:
-            comment['_id'] = str(comment['_id'])
-            comment['post_id'] = str(comment['post_id'])
-            comment['user_id'] = str(comment['user_id'])
-            comment['created_at'] = comment['created_at'].isoformat()
+        comments = PostComment.get_post_comments(post_id, fields=fields)
         
         return jsonify({
             "comments": comments,
@@ -348,28 +381,40 @@ def get_comments(post_id):
         logging.error(f"Error getting comments: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
 
+@community_bp.route('/posts/<post_id>/comments/<comment_id>', methods=['DELETE'])
+def delete_comment(post_id, comment_id):
+    """Delete a comment (by its author or the post's owner)"""
+    try:
+        user_id = current_user_id()
+        if not user_id:
+            return auth_error_response()
+        
+        if not ObjectId.is_valid(post_id) or not ObjectId.is_valid(comment_id) \
+                or not PostComment.delete(post_id, comment_id, user_id):
+            return jsonify({"error": "Comment not found"}), 404
+        
+        return jsonify({"message": "Comment deleted"}), 200
+        
+    except Exception as e:
+        logging.error(f"Error deleting comment: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
 @community_bp.route('/my-posts', methods=['GET'])
 def get_my_posts():
     """Get current user's posts"""
     try:
         # Get user from JWT token
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({"error": "Authorization header required"}), 401
-        
-        token = auth_header.split(' ')[1]
-        user_id = User.verify_jwt_token(token)
+        user_id = current_user_id()
         if not user_id:
-            return jsonify({"error": "Invalid or expired token"}), 401
+            return auth_error_response()
         
-        # Get user's posts
-        posts = CommunityPost.get_user_posts(user_id)
+        try:
+            fields = parse_fields(request.args.get('fields'), CommunityPost.FIELDS)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
-        # Convert ObjectId to string
-        for post in posts:
-            post['_id'] = str(post['_id'])
-            post['user_id'] = str(post['user_id'])
-            post['created_at'] = post['created_at'].isoformat()
+        # Get user's posts
+        posts = CommunityPost.get_user_posts(user_id, fields=fields)
         
         return jsonify({
             "posts": posts,
@@ -384,25 +429,32 @@ def get_my_posts():
 def get_my_liked_posts():
     """Get posts that current user has liked"""
     try:
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({"error": "Authorization header required"}), 401
-        
-        token = auth_header.split(' ')[1]
-        user_id = User.verify_jwt_token(token)
+        user_id = current_user_id()
         if not user_id:
-            return jsonify({"error": "Invalid or expired token"}), 401
+            return auth_error_response()
         
-        posts = CommunityPost.get_user_liked_posts(user_id)
+        limit = request.args.get('limit', 20, type=int)
+        if limit > 50:
+            limit = 50
+        elif limit < 1:
+            limit = 1
+        cursor = request.args.get('cursor', '').strip() or None
         
-        for post in posts:
-            post['_id'] = str(post['_id'])
-            post['user_id'] = str(post['user_id'])
-            post['created_at'] = post['created_at'].isoformat()
+        try:
+            fields = parse_fields(request.args.get('fields'), CommunityPost.FIELDS)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        try:
+            posts, next_cursor = CommunityPost.get_user_liked_posts(user_id, limit, cursor, fields)
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
         
         return jsonify({
             "posts": posts,
-            "count": len(posts)
+            "count": len(posts),
+            "has_more": next_cursor is not None,
+            "next_cursor": next_cursor
         }), 200
         
     except Exception as e:
@@ -414,27 +466,33 @@ def get_my_starred_posts():
     """Get posts that current user has starred"""
     try:
         # Get user from JWT token
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({"error": "Authorization header required"}), 401
-        
-        token = auth_header.split(' ')[1]
-        user_id = User.verify_jwt_token(token)
+        user_id = current_user_id()
         if not user_id:
-            return jsonify({"error": "Invalid or expired token"}), 401
+            return auth_error_response()
         
         # Get user's starred posts
-        posts = CommunityPost.get_user_starred_posts(user_id)
+        limit = request.args.get('limit', 20, type=int)
+        if limit > 50:
+            limit = 50
+        elif limit < 1:
+            limit = 1
+        cursor = request.args.get('cursor', '').strip() or None
         
-        # Convert ObjectId to string
-        for post in posts:
-            post['_id'] = str(post['_id'])
-            post['user_id'] = str(post['user_id'])
-            post['created_at'] = post['created_at'].isoformat()
+        try:
+            fields = parse_fields(request.args.get('fields'), CommunityPost.FIELDS)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        try:
+            posts, next_cursor = CommunityPost.get_user_starred_posts(user_id, limit, cursor, fields)
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
         
         return jsonify({
             "posts": posts,
-            "count": len(posts)
+            "count": len(posts),
+            "has_more": next_cursor is not None,
+            "next_cursor": next_cursor
         }), 200
         
     except Exception as e:
@@ -1,13 +1,69 @@
 from flask import Blueprint, request, jsonify, g
 from datetime import datetime, date, timezone
+from bson import ObjectId
 from auth.models import User
-from models.mood_journal import MoodEntry, Recommendation, UserFeedback
-from services.mood_ai_service import MoodAIService
-import asyncio
+from auth.middleware import current_user_id, auth_error_response, token_profile
+from models.mood_journal import MoodEntry, MoodRollup, Recommendation, UserFeedback, MAX_STATS_DAYS, local_day
+from services.ai_pool import AIBusyError, generate_recommendation
+from api.v1.streaming import wants_ndjson, ndjson_response
+from models.projection import parse_fields
 import logging
 
 mood_journal_bp = Blueprint('mood_journal', __name__)
 
+MAX_BULK_ENTRIES = 500
+
+def _parse_mood_entry(data):
+    """Validate one mood entry payload. Returns (fields, None) or (None, error message)."""
+    mood = data.get('mood')
+    mood = mood.strip() if isinstance(mood, str) else ''
+    intensity = data.get('intensity')
+    description = data.get('description') or ''
+    note = data.get('note') or ''
+    
+    # Get optional date parameter (for logging moods on specific dates)
+    mood_date = data.get('date')
+    if mood_date:
+        try:
+            # Parse the date string from frontend
+            mood_date = datetime.fromisoformat(mood_date.replace('Z', '+00:00'))
+        except (AttributeError, ValueError):
+            return None, "Invalid date format"
+    else:
+        # Use current UTC time if no date provided
+        mood_date = datetime.now(timezone.utc)
+    
+    # The user's local calendar day; defaults to the date's own UTC offset
+    day = data.get('day')
+    if day:
+        try:
+            day = date.fromisoformat(day).isoformat()
+        except (TypeError, ValueError):
+            return None, "day must be formatted as YYYY-MM-DD"
+    else:
+        day = local_day(mood_date)
+    
+    if not mood:
+        return None, "mood is required"
+    
+    if intensity is None or not isinstance(intensity, int) or isinstance(intensity, bool) or intensity < 1 or intensity > 10:
+        return None, "intensity must be an integer between 1-10"
+    
+    if not isinstance(description, str):
+        return None, "description must be a string"
+    
+    if not isinstance(note, str):
+        return None, "note must be a string"
+    
+    return {
+        'mood': mood,
+        'intensity': intensity,
+        'description': description.strip(),
+        'note': note.strip(),
+        'mood_date': mood_date,
+        'day': day
+    }, None
+
 @mood_journal_bp.route('/mood', methods=['POST'])
 def log_mood():
     """Log a new mood entry"""
@@ -17,115 +73,204 @@ def log_mood():
             return jsonify({"error": "No JSON data provided"}), 400
         
         # Get user from JWT token
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({"error": "Authorization header required"}), 401
-        
-        token = auth_header.split(' ')[1]
-        user_id = User.verify_jwt_token(token)
+        user_id = current_user_id()
         if not user_id:
-            return jsonify({"error": "Invalid or expired token"}), 401
+            return auth_error_response()
         
-        # Validate required fields
-        mood = data.get('mood', '').strip()
-        intensity = data.get('intensity')
-        description = data.get('description', '').strip()
-        note = data.get('note', '').strip()
-        
-        # Get optional date parameter (for logging moods on specific dates)
-        mood_date = data.get('date')
-        if mood_date:
-            try:
-                # Parse the date string from frontend
-                mood_date = datetime.fromisoformat(mood_date.replace('Z', '+00:00'))
-            except ValueError:
-                return jsonify({"error": "Invalid date format"}), 400
+        entry, error = _parse_mood_entry(data)
+        if error:
+            return jsonify({"error": error}), 400
+        
+        # Multiple moods per day are allowed unless the client asks for one entry per day
+        if data.get('one_per_day') is True:
+            mood_id, created = MoodEntry.upsert_daily(user_id, **entry)
         else:
-            # Use current UTC time if no date provided
-            mood_date = datetime.now(timezone.utc)
+            mood_id, created = MoodEntry.create(user_id, **entry), True
         
-        if not mood:
-            return jsonify({"error": "mood is required"}), 400
+        return jsonify({
+            "message": "Mood logged successfully" if created else "Mood for the day updated",
+            "mood_id": mood_id,
+            "mood": entry['mood'],
+            "intensity": entry['intensity'],
+            "description": entry['description'],
+            "date": entry['mood_date'],
+            "day": entry['day']
+        }), 201 if created else 200
+        
+    except Exception as e:
+        logging.error(f"Error logging mood: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@mood_journal_bp.route('/mood/<mood_id>', methods=['DELETE'])
+def delete_mood(mood_id):
+    """Delete one of the user's mood entries"""
+    try:
+        user_id = current_user_id()
+        if not user_id:
+            return auth_error_response()
         
-        if intensity is None or not isinstance(intensity, int) or intensity < 1 or intensity > 10:
-            return jsonify({"error": "intensity must be an integer between 1-10"}), 400
+        if not ObjectId.is_valid(mood_id) or not MoodEntry.delete(user_id, mood_id):
+            return jsonify({"error": "Mood entry not found"}), 404
         
-        # Create mood entry (allow multiple moods per day)
-        mood_id = MoodEntry.create(user_id, mood, intensity, description, note, mood_date)
+        return jsonify({"message": "Mood entry deleted"}), 200
+        
+    except Exception as e:
+        logging.error(f"Error deleting mood: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@mood_journal_bp.route('/mood/bulk', methods=['POST'])
+def log_moods_bulk():
+    """Log a batch of mood entries recorded offline, idempotently by client id"""
+    try:
+        data = request.get_json()
+        if not data or not isinstance(data.get('entries'), list):
+            return jsonify({"error": "entries must be a list"}), 400
+        
+        user_id = current_user_id()
+        if not user_id:
+            return auth_error_response()
+        
+        if len(data['entries']) > MAX_BULK_ENTRIES:
+            return jsonify({"error": f"At most {MAX_BULK_ENTRIES} entries per request"}), 400
+        
+        results = []
+        valid = []
+        seen = set()
+        for item in data['entries']:
+            client_id = item.get('client_id') if isinstance(item, dict) else None
+            if not isinstance(client_id, str) or not client_id.strip() or len(client_id) > 64:
+                results.append({"client_id": client_id, "status": "invalid",
+                                "error": "client_id must be a non-empty string of at most 64 characters"})
+                continue
+            if client_id in seen:
+                results.append({"client_id": client_id, "status": "duplicate"})
+                continue
+            seen.add(client_id)
+            
+            entry, error = _parse_mood_entry(item)
+            if error:
+                results.append({"client_id": client_id, "status": "invalid", "error": error})
+                continue
+            entry['client_id'] = client_id
+            valid.append(entry)
+            results.append(None)
+        
+        stored = iter(MoodEntry.create_many(user_id, valid)) if valid else iter(())
+        for index, result in enumerate(results):
+            if result is None:
+                client_id, status, mood_id = next(stored)
+                results[index] = {"client_id": client_id, "status": status, "mood_id": mood_id}
+        
+        # Repeats within the batch point at the entry stored for the first occurrence
+        stored_ids = {result['client_id']: result['mood_id'] for result in results if result.get('mood_id')}
+        for result in results:
+            if result['status'] == 'duplicate' and 'mood_id' not in result:
+                result['mood_id'] = stored_ids.get(result['client_id'])
+        
+        counts = {}
+        for result in results:
+            counts[result['status']] = counts.get(result['status'], 0) + 1
         
         return jsonify({
-            "message": "Mood logged successfully",
-            "mood_id": mood_id,
-            "mood": mood,
-            "intensity": intensity,
-            "description": description,
-            "date": mood_date.isoformat()
-        }), 201
+            "results": results,
+            "created": counts.get('created', 0),
+            "duplicates": counts.get('duplicate', 0),
+            "invalid": counts.get('invalid', 0),
+            "failed": counts.get('failed', 0)
+        }), 200
         
     except Exception as e:
-        logging.error(f"Error logging mood: {str(e)}")
+        logging.error(f"Error logging moods in bulk: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
 
 @mood_journal_bp.route('/mood', methods=['GET'])
 def get_mood_history():
     """Get user's mood history"""
     try:
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({"error": "Authorization header required"}), 401
-        
-        token = auth_header.split(' ')[1]
-        user_id = User.verify_jwt_token(token)
+        user_id = current_user_id()
         if not user_id:
-            return jsonify({"error": "Invalid or expired token"}), 401
+            return auth_error_response()
+        
+        try:
+            fields = parse_fields(request.args.get('fields'), MoodEntry.FIELDS)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        if wants_ndjson(request):
+            return ndjson_response(MoodEntry.iter_user_moods(user_id, fields=fields))
         
         limit = request.args.get('limit', 30, type=int)
         if limit > 100:
             limit = 100
+        elif limit < 1:
+            limit = 1
+        cursor = request.args.get('cursor', '').strip() or None
         
-        moods = MoodEntry.get_user_moods(user_id, limit)
-        
-        for mood in moods:
-            mood['_id'] = str(mood['_id'])
-            mood['user_id'] = str(mood['user_id'])
-            mood['created_at'] = mood['created_at'].isoformat()
-            mood['date'] = mood['date'].isoformat()
+        try:
+            moods, next_cursor = MoodEntry.get_user_moods_page(user_id, limit, cursor, fields)
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
         
         return jsonify({
             "moods": moods,
-            "count": len(moods)
+            "count": len(moods),
+            "has_more": next_cursor is not None,
+            "next_cursor": next_cursor
         }), 200
         
     except Exception as e:
         logging.error(f"Error getting mood history: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
 
+@mood_journal_bp.route('/mood/calendar', methods=['GET'])
+def get_mood_calendar():
+    """Get the user's mood for each day of a month"""
+    try:
+        user_id = current_user_id()
+        if not user_id:
+            return auth_error_response()
+        
+        month = request.args.get('month', '').strip() or datetime.now(timezone.utc).strftime('%Y-%m')
+        try:
+            days = MoodEntry.get_calendar(user_id, month)
+        except ValueError:
+            return jsonify({"error": "month must be formatted as YYYY-MM"}), 400
+        
+        return jsonify({
+            "month": month,
+            "days": days
+        }), 200
+        
+    except Exception as e:
+        logging.error(f"Error getting mood calendar: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+
 @mood_journal_bp.route('/mood/stats', methods=['GET'])
 def get_mood_stats():
     """Get mood statistics"""
     try:
         # Get user from JWT token
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({"error": "Authorization header required"}), 401
-        
-        token = auth_header.split(' ')[1]
-        user_id = User.verify_jwt_token(token)
+        user_id = current_user_id()
         if not user_id:
-            return jsonify({"error": "Invalid or expired token"}), 401
+            return auth_error_response()
         
         # Get query parameters
         days = request.args.get('days', 7, type=int)
-        if days > 30:
-            days = 30
+        if days > MAX_STATS_DAYS:
+            days = MAX_STATS_DAYS
+        elif days < 1:
+            days = 1
         
         # Get mood statistics
         stats = MoodEntry.get_mood_stats(user_id, days)
-        
-        return jsonify({
+        response = {
             "stats": stats,
             "period_days": days
-        }), 200
+        }
+        if request.args.get('daily', '').lower() == 'true':
+            response["daily"] = MoodRollup.get_daily(user_id, days)
+        
+        return jsonify(response), 200
         
     except Exception as e:
         logging.error(f"Error getting mood stats: {str(e)}")
@@ -139,18 +284,9 @@ def get_recommendation():
         if not data:
             return jsonify({"error": "No JSON data provided"}), 400
         
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({"error": "Authorization header required"}), 401
-        
-        token = auth_header.split(' ')[1]
-        user_id = User.verify_jwt_token(token)
+        user_id = current_user_id()
         if not user_id:
-            return jsonify({"error": "Invalid or expired token"}), 401
-        
-        user = User.find_by_id(user_id)
-        if not user:
-            return jsonify({"error": "User not found"}), 404
+            return auth_error_response()
         
         mood = data.get('mood', '').strip()
         description = data.get('description', '').strip()
@@ -159,16 +295,30 @@ def get_recommendation():
         if not mood:
             return jsonify({"error": "mood is required"}), 400
         
-        user_profile = {
-            'age': user.get('age'),
-            'gender': user.get('gender'),
-            'nationality': user.get('nationality'),
-            'hobbies': user.get('hobbies', [])
-        }
-        
-        recommendation_data = asyncio.run(
-            MoodAIService.generate_mood_recommendation(mood, user_profile, description, activity_type)
-        )
+        # Prefer the profile signed into the token; fall back to the user record
+        user_profile = token_profile()
+        if user_profile is None:
+            user = User.get_profile(user_id)
+            if not user:
+                return jsonify({"error": "User not found"}), 404
+            
+            user_profile = {
+                'age': user.get('age'),
+                'gender': user.get('gender'),
+                'nationality': user.get('nationality'),
+                'hobbies': user.get('hobbies', [])
+            }
+        
+        # Runs on the AI bulkhead so slow model calls can't hold every worker thread;
+        # an overloaded worker answers from local templates (see services/load_shedding.py)
+        try:
+            recommendation_data = generate_recommendation(
+                mood, user_profile, description, activity_type, local_only=g.get('ai_local_only', False)
+            )
+        except AIBusyError:
+            response = jsonify({"error": "Recommendations are busy, please retry shortly"})
+            response.headers['Retry-After'] = '5'
+            return response, 503
         
         main_rec = recommendation_data['recommendation']
         rec_id = Recommendation.create(
@@ -198,14 +348,9 @@ def submit_feedback():
             return jsonify({"error": "No JSON data provided"}), 400
         
         # Get user from JWT token
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({"error": "Authorization header required"}), 401
-        
-        token = auth_header.split(' ')[1]
-        user_id = User.verify_jwt_token(token)
+        user_id = current_user_id()
         if not user_id:
-            return jsonify({"error": "Invalid or expired token"}), 401
+            return auth_error_response()
         
         # Validate required fields
         recommendation_id = data.get('recommendation_id', '').strip()
@@ -238,16 +383,11 @@ def submit_feedback():
 def get_profile():
     """Get user profile"""
     try:
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({"error": "Authorization header required"}), 401
-        
-        token = auth_header.split(' ')[1]
-        user_id = User.verify_jwt_token(token)
+        user_id = current_user_id()
         if not user_id:
-            return jsonify({"error": "Invalid or expired token"}), 401
+            return auth_error_response()
         
-        user = User.find_by_id(user_id)
+        user = User.get_profile(user_id)
         if not user:
             return jsonify({"error": "User not found"}), 404
         
@@ -258,7 +398,7 @@ def get_profile():
             "gender": user.get('gender'),
             "nationality": user.get('nationality'),
             "hobbies": user.get('hobbies', []),
-            "created_at": user.get('created_at').isoformat() if user.get('created_at') else None
+            "created_at": user.get('created_at')
         }
         
         return jsonify(profile_data), 200
@@ -276,14 +416,9 @@ def update_profile():
             return jsonify({"error": "No JSON data provided"}), 400
         
         # Get user from JWT token
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({"error": "Authorization header required"}), 401
-        
-        token = auth_header.split(' ')[1]
-        user_id = User.verify_jwt_token(token)
+        user_id = current_user_id()
         if not user_id:
-            return jsonify({"error": "Invalid or expired token"}), 401
+            return auth_error_response()
         
         # Validate and extract fields
         age = data.get('age')
@@ -300,11 +435,18 @@ def update_profile():
             return jsonify({"error": "hobbies must be a list"}), 400
         
         # Update profile
-        User.update_profile(user_id, age, nationality, gender, hobbies)
-        
+        User.update_profile(user_id, {
+            'age': age,
+            'nationality': nationality,
+            'gender': gender,
+            'hobbies': hobbies
+        })
+        
+        # Reissue the token so its profile claims carry the new profile_version
         return jsonify({
             "message": "Profile updated successfully",
-            "updated_fields": [k for k, v in data.items() if v is not None]
+            "updated_fields": [k for k, v in data.items() if v is not None],
+            "token": User.generate_jwt_token(user_id, User.get_profile(user_id))
         }), 200
         
     except Exception as e:
@@ -315,14 +457,9 @@ def update_profile():
 def get_user_insights():
     """Get user insights and feedback analysis"""
     try:
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({"error": "Authorization header required"}), 401
-        
-        token = auth_header.split(' ')[1]
-        user_id = User.verify_jwt_token(token)
+        user_id = current_user_id()
         if not user_id:
-            return jsonify({"error": "Invalid or expired token"}), 401
+            return auth_error_response()
         
         try:
             from services.feedback_analysis_service import FeedbackAnalysisService
@@ -353,14 +490,9 @@ def share_recommendation():
             return jsonify({"error": "No JSON data provided"}), 400
         
         # Get user from JWT token
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({"error": "Authorization header required"}), 401
-        
-        token = auth_header.split(' ')[1]
-        user_id = User.verify_jwt_token(token)
+        user_id = current_user_id()
         if not user_id:
-            return jsonify({"error": "Invalid or expired token"}), 401
+            return auth_error_response()
         
         # Validate required fields
         recommendation_id = data.get('recommendation_id')
@@ -416,14 +548,9 @@ def share_ai_recommendation():
             return jsonify({"error": "No JSON data provided"}), 400
         
         # Get user from JWT token
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({"error": "Authorization header required"}), 401
-        
-        token = auth_header.split(' ')[1]
-        user_id = User.verify_jwt_token(token)
+        user_id = current_user_id()
         if not user_id:
-            return jsonify({"error": "Invalid or expired token"}), 401
+            return auth_error_response()
         
         # Validate required fields for AI recommendations
         recommendation_title = data.get('recommendation_title', '').strip()
@@ -476,14 +603,9 @@ def submit_recommendation_feedback():
             return jsonify({"error": "No JSON data provided"}), 400
         
         # Get user from JWT token
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({"error": "Authorization header required"}), 401
-        
-        token = auth_header.split(' ')[1]
-        user_id = User.verify_jwt_token(token)
+        user_id = current_user_id()
         if not user_id:
-            return jsonify({"error": "Invalid or expired token"}), 401
+            return auth_error_response()
         
         # Validate required fields
         recommendation_id = data.get('recommendation_id')
@@ -529,14 +651,9 @@ def submit_ai_recommendation_feedback():
             return jsonify({"error": "No JSON data provided"}), 400
         
         # Get user from JWT token
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({"error": "Authorization header required"}), 401
-        
-        token = auth_header.split(' ')[1]
-        user_id = User.verify_jwt_token(token)
+        user_id = current_user_id()
         if not user_id:
-            return jsonify({"error": "Invalid or expired token"}), 401
+            return auth_error_response()
         
         # Validate required fields
         recommendation_title = data.get('recommendation_title', '').strip()
@@ -585,28 +702,36 @@ def get_feedback_history():
     """Get user's feedback history"""
     try:
         # Get user from JWT token
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({"error": "Authorization header required"}), 401
-        
-        token = auth_header.split(' ')[1]
-        user_id = User.verify_jwt_token(token)
+        user_id = current_user_id()
         if not user_id:
-            return jsonify({"error": "Invalid or expired token"}), 401
+            return auth_error_response()
+        
+        try:
+            fields = parse_fields(request.args.get('fields'), UserFeedback.FIELDS)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
-        # Get feedback history
-        feedback_history = Recommendation.get_user_feedback_history(user_id)
+        if wants_ndjson(request):
+            return ndjson_response(Recommendation.iter_user_feedback_history(user_id, fields=fields))
         
-        # Convert ObjectIds to strings
-        for feedback in feedback_history:
-            feedback['_id'] = str(feedback['_id'])
-            feedback['user_id'] = str(feedback['user_id'])
-            feedback['recommendation_id'] = str(feedback['recommendation_id'])
-            feedback['created_at'] = feedback['created_at'].isoformat()
+        limit = request.args.get('limit', 50, type=int)
+        if limit > 100:
+            limit = 100
+        elif limit < 1:
+            limit = 1
+        cursor = request.args.get('cursor', '').strip() or None
+        
+        # Get one page of feedback history
+        try:
+            feedback_history, next_cursor = Recommendation.get_user_feedback_history_page(user_id, limit, cursor, fields)
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
         
         return jsonify({
             "feedback_history": feedback_history,
-            "count": len(feedback_history)
+            "count": len(feedback_history),
+            "has_more": next_cursor is not None,
+            "next_cursor": next_cursor
         }), 200
         
     except Exception as e:
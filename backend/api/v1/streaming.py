@@ -0,0 +1,23 @@
+from flask import Response, stream_with_context
+from services.json_provider import dumps
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+def wants_ndjson(request) -> bool:
+    """True if the client asked for a streamed NDJSON body (?format=ndjson or Accept header)"""
+    if request.args.get('format', '').lower() == 'ndjson':
+        return True
+    return request.accept_mimetypes.best == NDJSON_MIMETYPE
+
+def ndjson_response(docs):
+    """Stream an iterable of documents as one JSON object per line.
+
+    docs is consumed lazily (typically a PyMongo cursor), so memory use stays
+    constant however long the history is. The request context is kept alive
+    until the last line is sent so g.db stays open while streaming.
+    """
+    def generate():
+        for doc in docs:
+            yield dumps(doc) + b'\n'
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
@@ -0,0 +1,37 @@
+from flask import Blueprint, request, jsonify
+from auth.middleware import current_user_id, auth_error_response
+from models.sync import ChangeFeed
+import logging
+
+sync_bp = Blueprint('sync', __name__)
+
+@sync_bp.route('/sync', methods=['GET'])
+def sync_changes():
+    """Return the user's moods, posts, comments and feedback changed since a sync token"""
+    try:
+        user_id = current_user_id()
+        if not user_id:
+            return auth_error_response()
+        
+        token = request.args.get('since', '').strip() or None
+        try:
+            changes, next_token, has_more, reset = ChangeFeed.changes(user_id, token)
+        except ValueError:
+            return jsonify({"error": "Invalid sync token"}), 400
+        
+        deleted = [
+            {"type": tombstone['type'], "id": str(tombstone['doc_id']), "deleted_at": tombstone['updated_at']}
+            for tombstone in changes.pop('deleted')
+        ]
+        
+        return jsonify({
+            **changes,
+            "deleted": deleted,
+            "has_more": has_more,
+            "reset": reset,
+            "next": next_token
+        }), 200
+        
+    except Exception as e:
+        logging.error(f"Error syncing changes: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
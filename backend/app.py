@@ -1,7 +1,5 @@
 import os
-import json
-from datetime import datetime
-from bson import ObjectId
+import time
 from flask import Flask, request, jsonify, g
 from flask_cors import CORS
 from pymongo import MongoClient
@@ -14,6 +12,18 @@ try:
     from auth.routes import auth_bp
     from api.v1.mood_journal import mood_journal_bp
     from api.v1.community import community_bp
+    from api.v1.sync import sync_bp
+    from models.indexes import ensure_indexes
+    from auth.middleware import authenticate_request, refresh_stale_token
+    from auth.profile_cache import profile_cache
+    from auth.bcrypt_pool import bcrypt_executor
+    from services.ai_pool import ai_executor
+    from services.rate_limiter import init_rate_limiting
+    from services.load_shedding import init_load_shedding
+    from services.idempotency import init_idempotency
+    from services.json_provider import init_json
+    from services.http_cache import init_http_cache
+    from services.metrics import init_metrics
 except ImportError:
     # Fallback for when running from parent directory
     import sys
@@ -21,26 +31,53 @@ except ImportError:
     from auth.routes import auth_bp
     from api.v1.mood_journal import mood_journal_bp
     from api.v1.community import community_bp
-
-class CustomJSONEncoder(json.JSONEncoder):
-    def default(self, o):
-        if isinstance(o, ObjectId):
-            return str(o)
-        if isinstance(o, datetime):
-            return o.isoformat()
-        return super().default(o)
+    from api.v1.sync import sync_bp
+    from models.indexes import ensure_indexes
+    from auth.middleware import authenticate_request, refresh_stale_token
+    from auth.profile_cache import profile_cache
+    from auth.bcrypt_pool import bcrypt_executor
+    from services.ai_pool import ai_executor
+    from services.rate_limiter import init_rate_limiting
+    from services.load_shedding import init_load_shedding
+    from services.idempotency import init_idempotency
+    from services.json_provider import init_json
+    from services.http_cache import init_http_cache
+    from services.metrics import init_metrics
 
 def create_app():
     app = Flask(__name__)
-    app.json_encoder = CustomJSONEncoder
+    # jsonify handles ObjectId, datetime and Decimal itself (orjson when installed)
+    init_json(app)
 
     # Use configuration from config.py
     app.config['JWT_SECRET_KEY'] = config.JWT_SECRET_KEY
     app.config['MONGO_URI'] = config.MONGO_URI
+    app.config['JWT_PROFILE_CLAIMS'] = config.JWT_PROFILE_CLAIMS
 
     # Configure CORS with allowed origins from config
     CORS(app, origins=config.ALLOWED_ORIGINS)
 
+    # Latency, status and in-flight metrics at /metrics; registered first so every other hook is inside the measurement
+    init_metrics(app)
+
+    # ETags and compression are applied last, after every other hook has shaped the response
+    init_http_cache(app)
+
+    # Shed low-priority work while this worker is overloaded, before any auth or database work
+    init_load_shedding(app)
+
+    # Verify the bearer token once per request; handlers read the result from g.
+    # Tokens whose profile claims turned out stale get a refreshed one on the way out.
+    app.before_request(authenticate_request)
+    app.after_request(refresh_stale_token)
+
+    # Per-user / per-IP limits, checked before any database work is done
+    init_rate_limiting(app)
+
+    # Indexes are created once per worker, on the first request that reaches MongoDB;
+    # after a failure the next attempt waits INDEX_RETRY_SECONDS instead of running on every request
+    indexes_state = {'ready': False, 'retry_at': 0.0}
+
     @app.before_request
     def before_request():
         try:
@@ -50,6 +87,9 @@ def create_app():
                     raise ValueError("MONGO_URI environment variable not set.")
                 g.db_client = MongoClient(mongo_uri)
                 g.db = g.db_client.get_default_database()
+                if not indexes_state['ready'] and time.monotonic() >= indexes_state['retry_at']:
+                    indexes_state['ready'] = ensure_indexes(g.db)
+                    indexes_state['retry_at'] = time.monotonic() + config.INDEX_RETRY_SECONDS
         except Exception as e:
             app.logger.critical(f"Could not connect to MongoDB: {e}")
             g.db = None 
@@ -60,6 +100,9 @@ def create_app():
         if db_client is not None:
             db_client.close()
 
+    # Retries carrying an Idempotency-Key replay the first response instead of re-running the handler
+    init_idempotency(app)
+
     # Configure logging
     logging.basicConfig(level=getattr(logging, config.LOG_LEVEL))
     app.logger.setLevel(getattr(logging, config.LOG_LEVEL))
@@ -68,6 +111,7 @@ def create_app():
     app.register_blueprint(auth_bp, url_prefix='/api/v1/auth')
     app.register_blueprint(mood_journal_bp, url_prefix='/api/v1/mood')
     app.register_blueprint(community_bp, url_prefix='/api/v1/community')
+    app.register_blueprint(sync_bp, url_prefix='/api/v1')
 
     @app.route('/health', methods=['GET'])
     def health_check():
@@ -81,7 +125,13 @@ def create_app():
                 'mongo_connected': g.db is not None,
                 'ai_service_configured': bool(config.OPENROUTER_API_KEY),
                 'debug_mode': config.DEBUG
-            }
+            },
+            'caches': {
+                'profile': profile_cache.stats()
+            },
+            'bcrypt_pool': bcrypt_executor.stats(),
+            'ai_pool': ai_executor.stats(),
+            'load_shedding': app.extensions['load_shedder'].stats() if 'load_shedder' in app.extensions else None
         }), 200
 
     return app
@@ -0,0 +1,248 @@
+"""
+ASGI entry point
+POST /api/v1/mood/recommend runs as a native async handler: the OpenRouter
+call (through the AI bulkhead) and the MongoDB reads and writes around it
+are awaited, so one worker holds many slow recommendations at once instead
+of one thread each. Every other request goes to the Flask app from
+create_app() through a WSGI bridge, so both servers expose the same API. Run from the backend directory:
+
+    uvicorn asgi:app --host 0.0.0.0 --port 8080 --workers 4
+"""
+
+import contextlib
+import inspect
+import logging
+import os
+
+from a2wsgi import WSGIMiddleware
+from bson import ObjectId
+from bson.errors import InvalidId
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import Response
+from starlette.routing import Route
+
+try:
+    from pymongo import AsyncMongoClient
+except ImportError:
+    # PyMongo < 4.9 has no async client; Motor's has the same interface
+    from motor.motor_asyncio import AsyncIOMotorClient as AsyncMongoClient
+
+from config import config
+
+try:
+    from app import create_app, app as wsgi_app
+    from auth.models import User
+    from auth.middleware import claims_profile
+    from auth.profile_cache import profile_cache
+    from models.mood_journal import Recommendation
+    from services.idempotency import HEADER as IDEMPOTENCY_HEADER, IDEMPOTENCY_ENABLED
+    from services.json_provider import dumps, loads
+    from services.metrics import request_started, request_finished
+    from services.ai_pool import AIBusyError, generate_recommendation_async
+    from services.rate_limiter import RATE_LIMIT_TRUST_FORWARDED, TOO_MANY_REQUESTS
+except ImportError:
+    # Fallback for when running from parent directory
+    import sys
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    from app import create_app, app as wsgi_app
+    from auth.models import User
+    from auth.middleware import claims_profile
+    from auth.profile_cache import profile_cache
+    from models.mood_journal import Recommendation
+    from services.idempotency import HEADER as IDEMPOTENCY_HEADER, IDEMPOTENCY_ENABLED
+    from services.json_provider import dumps, loads
+    from services.metrics import request_started, request_finished
+    from services.ai_pool import AIBusyError, generate_recommendation_async
+    from services.rate_limiter import RATE_LIMIT_TRUST_FORWARDED, TOO_MANY_REQUESTS
+
+RECOMMEND_PATH = '/api/v1/mood/recommend'
+# The Flask endpoint this replaces, so the same rate limit rule applies
+RECOMMEND_ENDPOINT = 'mood_journal.get_recommendation'
+
+def json_response(payload, status: int = 200, headers: dict = None) -> Response:
+    return Response(dumps(payload), status_code=status, headers=headers, media_type='application/json')
+
+def client_ip(request) -> str:
+    """services.rate_limiter.client_ip for a Starlette request"""
+    if RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.headers.get('X-Forwarded-For', '')
+        if forwarded:
+            return forwarded.split(',')[0].strip()
+    return request.client.host if request.client else 'unknown'
+
+def authenticate(flask_app, request):
+    """(payload, error) for the request's bearer token, verified as authenticate_request does"""
+    auth_header = request.headers.get('Authorization')
+    if not auth_header or not auth_header.startswith('Bearer '):
+        return None, "Authorization header required"
+    # decode_jwt_token reads the secret from current_app and shares the worker's token cache
+    with flask_app.app_context():
+        payload = User.decode_jwt_token(auth_header.split(' ')[1])
+    if not payload:
+        return None, "Invalid or expired token"
+    return payload, None
+
+async def load_profile(db, user_id: str):
+    """User.get_profile on the async client: the profile cache first, MongoDB on a miss"""
+    user = profile_cache.peek(user_id)
+    if user is not None:
+        return user
+    try:
+        user = await db.users.find_one({'_id': ObjectId(user_id)}, User.PROFILE_PROJECTION)
+    except InvalidId:
+        return None
+    if user is None:
+        return None
+    return profile_cache.get(user_id, lambda: user)
+
+async def get_recommendation(request):
+    """Async twin of mood_journal.get_recommendation; same responses, same limits"""
+    flask_app = request.app.state.flask_app
+    db = request.app.state.db
+
+    payload, auth_error = authenticate(flask_app, request)
+    user_id = payload['user_id'] if payload else None
+
+    limiter = flask_app.extensions.get('rate_limiter')
+    if limiter is not None:
+        identity = f"user:{user_id}" if user_id else f"ip:{client_ip(request)}"
+        limit_headers = limiter.check(RECOMMEND_ENDPOINT, 'mood_journal', identity)
+        if limit_headers is not None:
+            return json_response({"error": TOO_MANY_REQUESTS}, 429, limit_headers)
+
+    try:
+        try:
+            data = loads(await request.body())
+        except ValueError:
+            data = None
+        if not data or not isinstance(data, dict):
+            return json_response({"error": "No JSON data provided"}, 400)
+
+        if not user_id:
+            return json_response({"error": auth_error}, 401)
+
+        mood = data.get('mood', '').strip()
+        description = data.get('description', '').strip()
+        activity_type = data.get('activity_type', '').strip() or None
+
+        if not mood:
+            return json_response({"error": "mood is required"}, 400)
+
+        # Prefer the profile signed into the token; fall back to the user record
+        headers = {}
+        claims = payload.get('prf')
+        user = await load_profile(db, user_id) if claims else None
+        user_profile, stale = claims_profile(claims, user)
+        if user_profile is None:
+            user = user or await load_profile(db, user_id)
+            if not user:
+                return json_response({"error": "User not found"}, 404)
+
+            user_profile = {
+                'age': user.get('age'),
+                'gender': user.get('gender'),
+                'nationality': user.get('nationality'),
+                'hobbies': user.get('hobbies', [])
+            }
+            if stale:
+                # Straight from MongoDB, as refresh_stale_token does
+                fresh = await db.users.find_one({'_id': ObjectId(user_id)}, User.PROFILE_PROJECTION) or user
+                with flask_app.app_context():
+                    headers['X-Refreshed-Token'] = User.generate_jwt_token(user_id, fresh)
+
+        # This handler holds no worker thread, but follows the Flask side's overload state
+        shedder = flask_app.extensions.get('load_shedder')
+        local_only = shedder is not None and shedder.degrade_ai()
+        try:
+            recommendation_data = await generate_recommendation_async(
+                mood, user_profile, description, activity_type, local_only=local_only
+            )
+        except AIBusyError:
+            return json_response({"error": "Recommendations are busy, please retry shortly"}, 503, {'Retry-After': '5'})
+
+        main_rec = recommendation_data['recommendation']
+        result = await db.recommendations.insert_one(Recommendation.build(
+            user_id=user_id,
+            mood=mood,
+            activity_type=main_rec['type'],
+            title=main_rec['title'],
+            description=main_rec['description'],
+            url=main_rec.get('url'),
+            category=main_rec.get('category')
+        ))
+
+        recommendation_data['recommendation']['id'] = str(result.inserted_id)
+
+        return json_response(recommendation_data, 200, headers)
+
+    except Exception as e:
+        logging.error(f"Error getting recommendation: {str(e)}")
+        return json_response({"error": "Internal server error"}, 500)
+
+def is_async_route(scope) -> bool:
+    """True for requests the async handlers serve. Idempotent retries go to Flask, which stores their responses."""
+    if scope['type'] != 'http' or scope['method'] != 'POST' or scope['path'] != RECOMMEND_PATH:
+        return False
+    if IDEMPOTENCY_ENABLED:
+        header = IDEMPOTENCY_HEADER.lower().encode('latin-1')
+        return not any(name == header for name, _ in scope['headers'])
+    return True
+
+def create_asgi_app(flask_app=None):
+    """ASGI counterpart of create_app(): async /recommend, the Flask app for every other route"""
+    flask_app = flask_app or create_app()
+    wsgi = WSGIMiddleware(flask_app, workers=config.ASGI_WSGI_THREADS)
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        # One pooled client per worker, shared by every in-flight request
+        client = AsyncMongoClient(config.MONGO_URI)
+        app.state.db = client.get_default_database()
+        try:
+            yield
+        finally:
+            closed = client.close()
+            if inspect.isawaitable(closed):
+                await closed
+
+    native = Starlette(
+        routes=[Route(RECOMMEND_PATH, get_recommendation, methods=['POST'])],
+        middleware=[Middleware(CORSMiddleware, allow_origins=config.ALLOWED_ORIGINS)],
+        lifespan=lifespan
+    )
+    native.state.flask_app = flask_app
+
+    async def instrumented(scope, receive, send):
+        """native, recorded under the Flask endpoint name so /metrics shows one series per route"""
+        started = request_started(RECOMMEND_ENDPOINT)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await native(scope, receive, send_with_status)
+        finally:
+            request_finished(RECOMMEND_ENDPOINT, scope['method'], status, started)
+
+    async def app(scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await native(scope, receive, send)
+        elif is_async_route(scope):
+            await instrumented(scope, receive, send)
+        else:
+            await wsgi(scope, receive, send)
+
+    app.native = native
+    return app
+
+app = create_asgi_app(wsgi_app)
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host=config.HOST, port=config.PORT)
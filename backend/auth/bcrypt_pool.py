@@ -0,0 +1,119 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+
+try:
+    from config import config
+    BCRYPT_POOL_WORKERS = config.BCRYPT_POOL_WORKERS
+    BCRYPT_POOL_MAX_PENDING = config.BCRYPT_POOL_MAX_PENDING
+    BCRYPT_POOL_TIMEOUT_SECONDS = config.BCRYPT_POOL_TIMEOUT_SECONDS
+except ModuleNotFoundError:
+    BCRYPT_POOL_WORKERS = int(os.getenv("BCRYPT_POOL_WORKERS",
+                                        str(max(1, (os.cpu_count() or 1) // int(os.getenv("WEB_CONCURRENCY", "1"))))))
+    BCRYPT_POOL_MAX_PENDING = int(os.getenv("BCRYPT_POOL_MAX_PENDING", "32"))
+    BCRYPT_POOL_TIMEOUT_SECONDS = float(os.getenv("BCRYPT_POOL_TIMEOUT_SECONDS", "10"))
+
+class BcryptBusyError(Exception):
+    """Raised when the bcrypt pool is saturated and the caller should retry later"""
+
+def _timed_call(fn, args):
+    """Runs in the pool process; returns the result with its start time and duration"""
+    started_at = time.time()
+    result = fn(*args)
+    return result, started_at, time.time() - started_at
+
+def _pool_context():
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return multiprocessing.get_context(method)
+
+class BcryptExecutor:
+    """Bounded process pool for bcrypt work.
+
+    bcrypt at production cost holds a CPU for hundreds of milliseconds. This
+    keeps it off the request threads, caps how much work can queue up
+    (workers + max_pending jobs), and rejects with BcryptBusyError beyond
+    that, so a login burst can't starve every other endpoint. With workers
+    set to 0, calls run inline.
+    """
+
+    def __init__(self, workers: int = BCRYPT_POOL_WORKERS, max_pending: int = BCRYPT_POOL_MAX_PENDING,
+                 timeout: float = BCRYPT_POOL_TIMEOUT_SECONDS):
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max(1, workers + max_pending))
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+        self._stats = {
+            'completed': 0,
+            'rejected': 0,
+            'timed_out': 0,
+            'queue_wait_seconds_total': 0.0,
+            'queue_wait_seconds_max': 0.0,
+            'hash_seconds_total': 0.0,
+            'hash_seconds_max': 0.0
+        }
+
+    def run(self, fn, *args):
+        """Run fn(*args) in the pool and wait for the result"""
+        if self.workers <= 0:
+            result, _, hash_seconds = _timed_call(fn, args)
+            self._record(0.0, hash_seconds)
+            return result
+
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats['rejected'] += 1
+            raise BcryptBusyError("Password hashing queue is full")
+
+        submitted_at = time.time()
+        try:
+            future = self._get_pool().submit(_timed_call, fn, args)
+        except Exception:
+            self._slots.release()
+            raise
+        # The slot is held until the job really finishes, even if we stop waiting for it
+        future.add_done_callback(lambda _: self._slots.release())
+
+        try:
+            result, started_at, hash_seconds = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            with self._lock:
+                self._stats['timed_out'] += 1
+            raise BcryptBusyError("Password hashing timed out")
+
+        self._record(max(0.0, started_at - submitted_at), hash_seconds)
+        return result
+
+    def _record(self, queue_wait: float, hash_seconds: float):
+        with self._lock:
+            self._stats['completed'] += 1
+            self._stats['queue_wait_seconds_total'] += queue_wait
+            self._stats['queue_wait_seconds_max'] = max(self._stats['queue_wait_seconds_max'], queue_wait)
+            self._stats['hash_seconds_total'] += hash_seconds
+            self._stats['hash_seconds_max'] = max(self._stats['hash_seconds_max'], hash_seconds)
+
+    def stats(self):
+        """Queue wait and hash time counters for this worker"""
+        with self._lock:
+            stats = dict(self._stats)
+        completed = stats['completed']
+        stats['workers'] = self.workers
+        stats['queue_wait_seconds_avg'] = stats['queue_wait_seconds_total'] / completed if completed else 0
+        stats['hash_seconds_avg'] = stats['hash_seconds_total'] / completed if completed else 0
+        return stats
+
+    def _get_pool(self):
+        # Created lazily and per process, so each forked gunicorn worker gets its own pool.
+        # By then the worker runs request, AI loop and pub/sub threads, and forking a
+        # multithreaded process can leave a child stuck on a lock another thread held,
+        # so pool processes come from a fork server (spawned where that is unavailable).
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=_pool_context())
+                self._pool_pid = os.getpid()
+            return self._pool
+
+bcrypt_executor = BcryptExecutor()
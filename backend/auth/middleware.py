@@ -0,0 +1,74 @@
+from flask import request, jsonify, g
+from auth.models import User
+
+def authenticate_request():
+    """before_request hook: verify the bearer token once per request and store the outcome on g.
+
+    g.user_id is the authenticated user's id or None; g.auth_error holds the
+    message to return when a handler requires authentication.
+    """
+    g.auth_checked = True
+    g.user_id = None
+    g.token_claims = None
+    g.auth_error = "Authorization header required"
+
+    auth_header = request.headers.get('Authorization')
+    if not auth_header or not auth_header.startswith('Bearer '):
+        return
+
+    token = auth_header.split(' ')[1]
+    payload = User.decode_jwt_token(token)
+    if not payload:
+        g.auth_error = "Invalid or expired token"
+        return
+    g.user_id = payload['user_id']
+    g.token_claims = payload.get('prf')
+
+def current_user_id():
+    """The authenticated user's id for this request, or None"""
+    if not g.get('auth_checked'):
+        authenticate_request()
+    return g.user_id
+
+def auth_error_response():
+    """401 response explaining why current_user_id() is None"""
+    return jsonify({"error": g.auth_error}), 401
+
+def token_profile():
+    """The user_profile carried in the token's claims, or None if absent or stale.
+
+    Claims are stale when the user's current profile_version (read through
+    the profile cache, so usually without a MongoDB round trip) is newer
+    than the one signed into the token; the response then carries a
+    refreshed token, see refresh_stale_token. A cached version older than
+    the claims only means this worker's cache is behind, so the claims win.
+    """
+    if not g.get('auth_checked'):
+        authenticate_request()
+    if not g.token_claims:
+        return None
+    profile, stale = claims_profile(g.token_claims, User.get_profile(g.user_id))
+    if stale:
+        g.stale_profile_claims = True
+    return profile
+
+def claims_profile(claims: dict, current: dict):
+    """(user_profile, stale) for a token's profile claims checked against the user's current profile document.
+
+    The profile is None when claims are absent, the user is gone, or the
+    claims were signed before the latest profile update.
+    """
+    if not claims or current is None:
+        return None, False
+    if current.get('profile_version', 0) > claims.get('v', 0):
+        return None, True
+    return User.profile_from_claims(claims), False
+
+def refresh_stale_token(response):
+    """after_request hook: hand out a token with current profile claims when the presented one was stale"""
+    if g.get('stale_profile_claims') and g.get('user_id'):
+        # Straight from MongoDB: a token built from a lagging cache entry would undo a newer update
+        user = User.find_by_id(g.user_id)
+        if user:
+            response.headers['X-Refreshed-Token'] = User.generate_jwt_token(g.user_id, user)
+    return response
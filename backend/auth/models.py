@@ -3,8 +3,25 @@ import jwt
 from flask import current_app, g
 from werkzeug.exceptions import BadRequest
 from bson.objectid import ObjectId
+from auth.token_cache import token_cache
+from auth.profile_cache import profile_cache
+from models.projection import build_projection
 
 class User:
+    # Fields handlers actually read from a user document; excludes password_hash
+    PROFILE_PROJECTION = {
+        'username': 1,
+        'email': 1,
+        'age': 1,
+        'nationality': 1,
+        'gender': 1,
+        'hobbies': 1,
+        'created_at': 1,
+        'profile_version': 1
+    }
+    # Login is the only read that needs the password hash
+    CREDENTIAL_FIELDS = list(PROFILE_PROJECTION) + ['password_hash']
+
     @staticmethod
     def create(username: str, email: str, password_hash: str, age: int = None, nationality: str = None, gender: str = None, hobbies: list = None):
         user_data = {
@@ -17,28 +34,41 @@ class User:
             'hobbies': hobbies or [],
             'created_at': datetime.now(timezone.utc),
             'updated_at': datetime.now(timezone.utc),
-            'last_login': None
+            'last_login': None,
+            'profile_version': 0
         }
         result = g.db.users.insert_one(user_data)
         return str(result.inserted_id)
 
     @staticmethod
-    def find_by_username_or_email(identifier: str):
+    def find_by_username_or_email(identifier: str, fields: list = None):
+        """Find a user by username or email; profile fields only unless fields says otherwise"""
         return g.db.users.find_one({
             '$or': [
                 {'username': identifier},
                 {'email': identifier}
             ]
-        })
+        }, build_projection(fields) or User.PROFILE_PROJECTION)
 
     @staticmethod
-    def find_by_id(user_id: str):
+    def find_by_id(user_id: str, fields: list = None):
+        """Find a user by id; profile fields only unless fields says otherwise"""
         try:
-            doc = g.db.users.find_one({'_id': ObjectId(user_id)})
+            doc = g.db.users.find_one({'_id': ObjectId(user_id)}, build_projection(fields) or User.PROFILE_PROJECTION)
             return doc
         except:
             return None
 
+    @staticmethod
+    def get_profile(user_id: str):
+        """Get a user's profile fields through the per-worker profile cache"""
+        def load():
+            try:
+                return g.db.users.find_one({'_id': ObjectId(user_id)}, User.PROFILE_PROJECTION)
+            except:
+                return None
+        return profile_cache.get(user_id, load)
+
     @staticmethod
     def update_profile(user_id: str, update_data: dict):
         update_data['updated_at'] = datetime.now(timezone.utc)
@@ -46,13 +76,23 @@ class User:
         try:
             result = g.db.users.update_one(
                 {'_id': ObjectId(user_id)},
-                {'$set': update_data}
+                {'$set': update_data, '$inc': {'profile_version': 1}}
             )
+            profile_cache.invalidate(user_id)
             return result.modified_count > 0
         except Exception as e:
             print(f"Error updating profile: {e}")
             return False
 
+    @staticmethod
+    def replace_password_hash(user_id: str, old_hash: str, new_hash: str):
+        """Swap in a rehashed password, unless the stored hash changed in the meantime"""
+        result = g.db.users.update_one(
+            {'_id': ObjectId(user_id), 'password_hash': old_hash},
+            {'$set': {'password_hash': new_hash}}
+        )
+        return result.modified_count > 0
+
     @staticmethod
     def update_last_login(user_id: str):
         g.db.users.update_one(
@@ -61,22 +101,56 @@ class User:
         )
 
     @staticmethod
-    def generate_jwt_token(user_id: str):
+    def profile_claims(user: dict):
+        """Compact, recommendation-relevant profile fields to embed in a token"""
+        return {
+            'a': user.get('age'),
+            'g': user.get('gender'),
+            'n': user.get('nationality'),
+            'h': user.get('hobbies', []),
+            'v': user.get('profile_version', 0)
+        }
+
+    @staticmethod
+    def profile_from_claims(claims: dict):
+        """Expand profile claims back into the user_profile shape MoodAIService expects"""
+        return {
+            'age': claims.get('a'),
+            'gender': claims.get('g'),
+            'nationality': claims.get('n'),
+            'hobbies': claims.get('h') or []
+        }
+
+    @staticmethod
+    def generate_jwt_token(user_id: str, user: dict = None):
+        """Issue a token; with JWT_PROFILE_CLAIMS on and a user document given, it also carries profile claims"""
         payload = {
             'user_id': str(user_id),
             'iat': datetime.now(timezone.utc),
             'exp': datetime.now(timezone.utc) + timedelta(days=7)
         }
+        if user is not None and current_app.config.get('JWT_PROFILE_CLAIMS'):
+            payload['prf'] = User.profile_claims(user)
         return jwt.encode(payload, current_app.config['JWT_SECRET_KEY'], algorithm='HS256')
 
     @staticmethod
-    def verify_jwt_token(token: str):
+    def decode_jwt_token(token: str, use_cache: bool = True):
+        """Return the verified token payload, or None if the token is invalid or expired"""
+        if use_cache:
+            payload = token_cache.get(token)
+            if payload:
+                return payload
         try:
             payload = jwt.decode(token, current_app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
-            return payload['user_id']
         except jwt.ExpiredSignatureError:
             return None
         except jwt.InvalidTokenError:
             return None
-        
-        
\ No newline at end of file
+        if use_cache:
+            token_cache.put(token, payload)
+        return payload
+
+    @staticmethod
+    def verify_jwt_token(token: str, use_cache: bool = True):
+        payload = User.decode_jwt_token(token, use_cache)
+        return payload['user_id'] if payload else None
@@ -0,0 +1,145 @@
+import copy
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+try:
+    from config import config
+    PROFILE_CACHE_SIZE = config.PROFILE_CACHE_SIZE
+    PROFILE_CACHE_TTL_SECONDS = config.PROFILE_CACHE_TTL_SECONDS
+    PROFILE_CACHE_REDIS_URL = config.PROFILE_CACHE_REDIS_URL
+except ModuleNotFoundError:
+    PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "10000"))
+    PROFILE_CACHE_TTL_SECONDS = float(os.getenv("PROFILE_CACHE_TTL_SECONDS", "60"))
+    PROFILE_CACHE_REDIS_URL = os.getenv("PROFILE_CACHE_REDIS_URL", "")
+
+INVALIDATION_CHANNEL = 'mood_journal:profile_invalidations'
+
+class ProfileCache:
+    """Per-worker read-through TTL/LRU cache of user profile documents.
+
+    Only the projected profile fields are cached, never the password hash.
+    Profile updates invalidate the local entry straight away, and a read that
+    raced with the invalidation is not cached. With
+    PROFILE_CACHE_REDIS_URL set, invalidations are also published over Redis
+    pub/sub so other workers drop their copy; without it they expire after
+    PROFILE_CACHE_TTL_SECONDS.
+    """
+
+    def __init__(self, max_size: int = PROFILE_CACHE_SIZE, ttl: float = PROFILE_CACHE_TTL_SECONDS,
+                 redis_url: str = PROFILE_CACHE_REDIS_URL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.redis_url = redis_url
+        self._entries = OrderedDict()
+        # key -> [generation, loads in flight]; invalidate() bumps the generation of keys being loaded
+        self._loading = {}
+        self._lock = threading.Lock()
+        self._redis = None
+        self._listener_started = False
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: str, loader: Callable[[], Optional[dict]]) -> Optional[dict]:
+        """Return the cached profile, calling loader() to read it from MongoDB on a miss"""
+        key = str(user_id)
+        self._ensure_listener()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(entry[1])
+            self.misses += 1
+            loading = self._loading.setdefault(key, [0, 0])
+            loading[1] += 1
+            generation = loading[0]
+
+        try:
+            doc = loader()
+        except BaseException:
+            with self._lock:
+                self._finish_load_locked(key, loading)
+            raise
+
+        with self._lock:
+            self._finish_load_locked(key, loading)
+            # Invalidated while we were reading: return what we read but don't cache it
+            if doc is None or self.max_size <= 0 or loading[0] != generation:
+                return doc
+            self._entries[key] = (time.monotonic() + self.ttl, copy.deepcopy(doc))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return doc
+
+    def _finish_load_locked(self, key: str, loading: list):
+        """Count a load for key as done. Caller holds self._lock."""
+        loading[1] -= 1
+        if not loading[1]:
+            del self._loading[key]
+
+    def peek(self, user_id: str) -> Optional[dict]:
+        """Return the cached profile if present and fresh, without loading or counting a lookup"""
+        with self._lock:
+            entry = self._entries.get(str(user_id))
+            if entry is None or entry[0] <= time.monotonic():
+                return None
+            return copy.deepcopy(entry[1])
+
+    def invalidate(self, user_id: str, broadcast: bool = True):
+        """Drop a user's cached profile here and, if configured, in every other worker"""
+        key = str(user_id)
+        with self._lock:
+            self._entries.pop(key, None)
+            if key in self._loading:
+                self._loading[key][0] += 1
+
+        if broadcast and self._redis is not None:
+            try:
+                self._redis.publish(INVALIDATION_CHANNEL, key)
+            except Exception as e:
+                logging.warning(f"Could not publish profile invalidation for {key}: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Hit rate and the number of MongoDB user reads the cache has saved in this worker"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0,
+                'mongo_reads_saved': self.hits,
+                'entries': len(self._entries)
+            }
+
+    def _ensure_listener(self):
+        """Subscribe to cross-worker invalidations the first time the cache is used"""
+        if self._listener_started or not self.redis_url:
+            return
+        self._listener_started = True
+        try:
+            import redis
+            self._redis = redis.Redis.from_url(self.redis_url)
+            pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{INVALIDATION_CHANNEL: self._on_invalidation})
+            pubsub.run_in_thread(sleep_time=1, daemon=True)
+        except Exception as e:
+            logging.warning(f"Profile cache invalidation channel unavailable, relying on TTL: {e}")
+            self._redis = None
+
+    def _on_invalidation(self, message):
+        user_id = message['data']
+        if isinstance(user_id, bytes):
+            user_id = user_id.decode('utf-8')
+        self.invalidate(user_id, broadcast=False)
+
+profile_cache = ProfileCache()
@@ -1,40 +1,35 @@
 from flask import Blueprint, request, jsonify, current_app, g
 from werkzeug.exceptions import BadRequest
 from functools import wraps
-import jwt
 from auth.models import User
-from auth.utils import hash_password, verify_password
+from auth.utils import hash_password, verify_password, needs_rehash
+from auth.bcrypt_pool import BcryptBusyError
+from auth.middleware import current_user_id, auth_error_response
 
 auth_bp = Blueprint("auth_bp", __name__)
 
 def require_auth(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        token = None
-        if 'Authorization' in request.headers and request.headers['Authorization'].startswith('Bearer '):
-            token = request.headers['Authorization'].split(' ')[1]
+        # The token was already verified once for this request by the auth middleware
+        user_id = current_user_id()
+        if not user_id:
+            return auth_error_response()
+        
+        user = User.get_profile(user_id)
+        if not user:
+            return jsonify({'error': 'User not found!'}), 401
 
-        if not token:
-            return jsonify({'error': 'Authentication token is missing!'}), 401
-
-        try:
-            user_id = User.verify_jwt_token(token)
-            if not user_id:
-                return jsonify({'error': 'Invalid or expired token!'}), 401
-            
-            user = User.find_by_id(user_id)
-            if not user:
-                return jsonify({'error': 'User not found!'}), 401
-
-            g.current_user = user
-        except jwt.ExpiredSignatureError:
-            return jsonify({'error': 'Token has expired!'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'error': 'Invalid token!'}), 401
+        g.current_user = user
 
         return f(*args, **kwargs)
     return decorated_function
 
+def _busy_response():
+    response = jsonify({'error': 'Server is busy, please retry shortly'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
 @auth_bp.route("/register", methods=["POST"])
 def register():
     try:
@@ -57,7 +52,7 @@ def register():
         if len(password) < 6:
             current_app.logger.error(f"Password too short: {len(password)} characters")
             return jsonify({'error': 'Password must be at least 6 characters'}), 400
-        if User.find_by_username_or_email(username) or User.find_by_username_or_email(email):
+        if User.find_by_username_or_email(username, fields=['_id']) or User.find_by_username_or_email(email, fields=['_id']):
             current_app.logger.error(f"Username or email already exists: {username}, {email}")
             return jsonify({'error': 'Username or email already exists'}), 409
         
@@ -71,7 +66,13 @@ def register():
         
         pw_hash = hash_password(password)
         user_id = User.create(username, email, pw_hash, age, nationality, gender, hobbies)
-        token = User.generate_jwt_token(user_id)
+        token = User.generate_jwt_token(user_id, {
+            'age': age,
+            'nationality': nationality,
+            'gender': gender,
+            'hobbies': hobbies,
+            'profile_version': 0
+        })
         current_app.logger.info(f"User created successfully: {user_id}")
         return jsonify({
             'message': 'User created successfully',
@@ -86,10 +87,25 @@ def register():
                 'hobbies': hobbies
             }
         }), 201
+    except BcryptBusyError as e:
+        current_app.logger.warning(f"Registration rejected, bcrypt pool busy: {str(e)}")
+        return _busy_response()
     except Exception as e:
         current_app.logger.error(f"Registration error: {str(e)}")
         return jsonify({'error': 'Registration failed'}), 500
 
+def _rehash_if_needed(user_doc, password):
+    """Upgrade a stored hash to the configured BCRYPT_ROUNDS using the password we just verified"""
+    if not needs_rehash(user_doc["password_hash"]):
+        return
+    try:
+        new_hash = hash_password(password)
+        User.replace_password_hash(user_doc['_id'], user_doc["password_hash"], new_hash)
+        current_app.logger.info(f"Rehashed password for user {user_doc['_id']}")
+    except BcryptBusyError:
+        # Best effort: the login still succeeds and the next one will retry
+        current_app.logger.info(f"Skipped password rehash for user {user_doc['_id']}, bcrypt pool busy")
+
 @auth_bp.route("/login", methods=["POST"])
 def login():
     try:
@@ -98,11 +114,12 @@ def login():
         password = data.get("password", "")
         if not all([identifier, password]):
             return jsonify({'error': 'All fields are required'}), 400
-        user_doc = User.find_by_username_or_email(identifier)
+        user_doc = User.find_by_username_or_email(identifier, fields=User.CREDENTIAL_FIELDS)
         if not user_doc or not verify_password(password, user_doc["password_hash"]):
             return jsonify({'error': 'Invalid credentials'}), 401
+        _rehash_if_needed(user_doc, password)
         User.update_last_login(user_doc['_id'])
-        token = User.generate_jwt_token(str(user_doc['_id']))
+        token = User.generate_jwt_token(str(user_doc['_id']), user_doc)
         user_safe = {
             'id': str(user_doc['_id']),
             'username': user_doc['username'],
@@ -113,6 +130,9 @@ def login():
             'hobbies': user_doc.get('hobbies', ['reading', 'music'])
         }
         return jsonify({'message': 'Login successful', 'token': token, 'user': user_safe}), 200
+    except BcryptBusyError as e:
+        current_app.logger.warning(f"Login rejected, bcrypt pool busy: {str(e)}")
+        return _busy_response()
     except Exception as e:
         current_app.logger.error(f"Login error: {str(e)}")
         return jsonify({'error': 'Login failed'}), 500
@@ -140,7 +160,7 @@ def update_profile():
             return jsonify({'error': 'Hobbies must be a list'}), 400
 
         # Check if username is already taken by another user
-        existing_user = User.find_by_username_or_email(username)
+        existing_user = User.find_by_username_or_email(username, fields=['_id'])
         if existing_user and existing_user['_id'] != g.current_user['_id']:
             return jsonify({'error': 'Username already exists'}), 409
 
@@ -158,8 +178,11 @@ def update_profile():
             return jsonify({'error': 'Failed to update profile'}), 500
 
         current_app.logger.info(f"Profile updated successfully for user {g.current_user['_id']}")
+        # Reissue the token so its profile claims carry the new profile_version
+        updated_user = User.get_profile(g.current_user['_id'])
         return jsonify({
             'message': 'Profile updated successfully',
+            'token': User.generate_jwt_token(str(g.current_user['_id']), updated_user),
             'user': {
                 'id': str(g.current_user['_id']),
                 'username': username,
@@ -207,7 +230,7 @@ def verify_token():
         user_id = User.verify_jwt_token(token)
         if not user_id:
             return jsonify({'error': 'Invalid or expired token'}), 401
-        user = User.find_by_id(user_id)
+        user = User.get_profile(user_id)
         if not user:
             return jsonify({'error': 'User not found'}), 404
         return jsonify({
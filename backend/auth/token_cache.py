@@ -0,0 +1,62 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+try:
+    from config import config
+    JWT_CACHE_SIZE = config.JWT_CACHE_SIZE
+except ModuleNotFoundError:
+    JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "4096"))
+
+class TokenCache:
+    """Bounded LRU of recently verified JWTs mapped to their decoded payload.
+
+    A hit skips the HMAC check and JSON decode entirely. Entries are only
+    served until the token's own expiry, so caching never extends a token's
+    lifetime.
+    """
+
+    def __init__(self, max_size: int = JWT_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> Optional[dict]:
+        """Return the cached payload for a still-valid token, or None"""
+        with self._lock:
+            payload = self._entries.get(token)
+            if payload is None:
+                self.misses += 1
+                return None
+            if payload['exp'] <= time.time():
+                del self._entries[token]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return payload
+
+    def put(self, token: str, payload: dict):
+        """Remember the payload of a token that has just passed full verification"""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[token] = payload
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Hit/miss counters for this worker"""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries)}
+
+token_cache = TokenCache()
@@ -1,6 +1,7 @@
 import bcrypt
 import jwt
 import os
+from auth.bcrypt_pool import bcrypt_executor
 
 try:
     from config import config
@@ -8,12 +9,12 @@ try:
 except ModuleNotFoundError:
     BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
 
-def hash_password(plaintext_password: str) -> str:
+def _hash_password_inline(plaintext_password: str) -> str:
     salt = bcrypt.gensalt(BCRYPT_ROUNDS)
     hashed = bcrypt.hashpw(plaintext_password.encode("utf-8"), salt)
     return hashed.decode("utf-8")
 
-def check_password(plaintext_password: str, password_hash: str) -> bool:
+def _check_password_inline(plaintext_password: str, password_hash: str) -> bool:
     try:
         return bcrypt.checkpw(
             plaintext_password.encode("utf-8"),
@@ -22,9 +23,28 @@ def check_password(plaintext_password: str, password_hash: str) -> bool:
     except:
         return False
 
+def hash_password(plaintext_password: str) -> str:
+    """Hash a password on the bcrypt pool. Raises BcryptBusyError when the pool is saturated."""
+    return bcrypt_executor.run(_hash_password_inline, plaintext_password)
+
+def check_password(plaintext_password: str, password_hash: str) -> bool:
+    """Check a password on the bcrypt pool. Raises BcryptBusyError when the pool is saturated."""
+    return bcrypt_executor.run(_check_password_inline, plaintext_password, password_hash)
+
 def verify_password(plaintext_password: str, password_hash: str) -> bool:
     return check_password(plaintext_password, password_hash)
 
+def bcrypt_cost(password_hash: str):
+    """Cost factor encoded in a bcrypt hash ("$2b$12$..." -> 12), or None if unparseable"""
+    try:
+        return int(password_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+def needs_rehash(password_hash: str) -> bool:
+    """True if the hash was made with a cost other than the configured BCRYPT_ROUNDS"""
+    return bcrypt_cost(password_hash) != BCRYPT_ROUNDS
+
 def decode_token(token: str):
     """Decode JWT token and return user ID"""
     try:
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Mood rollup backfill
+Adds day keys to entries that predate them, then rebuilds the
+mood_daily_rollups collection from existing mood entries. Run it once after
+deploying rollups, or for a single user if their counters drift:
+
+    python backfill_mood_rollups.py
+    python backfill_mood_rollups.py --user-id 64f0c0ffee0000000000000
+"""
+
+import argparse
+import time
+
+from pymongo import MongoClient
+
+from config import config
+from models.mood_journal import MoodEntry, MoodRollup
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild daily mood rollups from mood entries")
+    parser.add_argument("--user-id", help="only rebuild this user's rollups")
+    parser.add_argument("--batch-size", type=int, default=1000, help="rollup writes per bulk_write")
+    args = parser.parse_args()
+
+    client = MongoClient(config.MONGO_URI)
+    db = client.get_default_database()
+    try:
+        MoodEntry.ensure_indexes(db)
+        MoodRollup.ensure_indexes(db)
+        updated = MoodEntry.backfill_day_keys(db, args.batch_size)
+        if updated:
+            print(f"📅 Added day keys to {updated} older entries")
+        print(f"🔄 Rebuilding mood rollups{' for ' + args.user_id if args.user_id else ''}...")
+        started = time.perf_counter()
+        written = MoodRollup.rebuild(db, args.user_id, args.batch_size)
+        print(f"✅ Wrote {written} day rollups in {time.perf_counter() - started:.1f}s")
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Delta sync backfill
+Stamps updated_at on moods, posts, comments and feedback written before
+change tracking existed, so /api/v1/sync can return them. Safe to re-run:
+
+    python backfill_sync_fields.py
+"""
+
+import time
+
+from pymongo import MongoClient
+
+from config import config
+from models.sync import ChangeFeed
+
+def main():
+    client = MongoClient(config.MONGO_URI)
+    db = client.get_default_database()
+    try:
+        ChangeFeed.ensure_indexes(db)
+        print("🔄 Stamping updated_at on older documents...")
+        started = time.perf_counter()
+        counts = ChangeFeed.backfill_updated_at(db)
+        for collection, updated in counts.items():
+            print(f"   {collection}: {updated}")
+        print(f"✅ Done in {time.perf_counter() - started:.1f}s")
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    main()
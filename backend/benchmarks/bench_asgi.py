@@ -0,0 +1,117 @@
+"""
+Benchmark: WSGI vs ASGI under slow recommendation calls
+Fires the same burst of concurrent POST /api/v1/mood/recommend requests at
+the Flask app (served by a fixed pool of threads, as a gthread worker would)
+and at asgi.py (one event loop), with the OpenRouter call replaced by a
+sleep of --latency seconds. Reports wall time, throughput and latency
+percentiles. Needs a MongoDB server (MONGO_URI); the throwaway user and its
+recommendations are removed afterwards. Run from the backend directory:
+
+    python benchmarks/bench_asgi.py --requests 200 --threads 8 --latency 1.0
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Both apps would otherwise stop the burst at the per-user /recommend limit
+os.environ['RATE_LIMIT_ENABLED'] = 'False'
+# ...or answer most of it from local templates once the AI bulkhead is full
+os.environ['AI_POOL_MAX_CONCURRENT'] = '0'
+
+import httpx
+from bson import ObjectId
+from pymongo import MongoClient
+
+from config import config
+from app import create_app
+from asgi import create_asgi_app
+from auth.models import User
+from services.mood_ai_service import MoodAIService
+
+def slow_upstream(latency: float):
+    """Stand-in for generate_mood_recommendation: wait like an OpenRouter call, answer from local templates"""
+    async def generate(mood, user_profile, description=None, activity_type=None):
+        await asyncio.sleep(latency)
+        return MoodAIService._generate_local_recommendation(mood, user_profile, description=description,
+                                                            activity_type=activity_type)
+    return generate
+
+def burst_results(started: float, results: list):
+    """(wall time, latencies, statuses); the whole burst arrives at once, so latency includes queueing"""
+    latencies = [finished - started for finished, _ in results]
+    return max(latencies), latencies, [status for _, status in results]
+
+def summarise(label: str, wall: float, latencies: list, statuses: list):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    failed = sum(1 for status in statuses if status != 200)
+    print(f"   {label:6s}: {wall:6.2f} s wall, {len(latencies) / wall:7.1f} req/s, "
+          f"p50 {statistics.median(latencies):6.2f} s, p95 {p95:6.2f} s, {failed} failed")
+
+def run_wsgi(flask_app, requests: int, threads: int, body: dict, headers: dict):
+    client = flask_app.test_client()
+
+    def one(_):
+        response = client.post('/api/v1/mood/recommend', json=body, headers=headers)
+        return time.perf_counter(), response.status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(one, range(requests)))
+    return burst_results(started, results)
+
+async def run_asgi(asgi_app, requests: int, body: dict, headers: dict):
+    native = asgi_app.native
+    async with native.router.lifespan_context(native):
+        transport = httpx.ASGITransport(app=asgi_app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=None) as client:
+            async def one():
+                response = await client.post('/api/v1/mood/recommend', json=body, headers=headers)
+                return time.perf_counter(), response.status_code
+
+            started = time.perf_counter()
+            results = await asyncio.gather(*(one() for _ in range(requests)))
+    return burst_results(started, results)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the WSGI and ASGI apps under slow upstream calls")
+    parser.add_argument("--requests", type=int, default=200, help="concurrent requests in the burst")
+    parser.add_argument("--threads", type=int, default=8, help="WSGI request threads")
+    parser.add_argument("--latency", type=float, default=1.0, help="simulated OpenRouter latency in seconds")
+    args = parser.parse_args()
+
+    MoodAIService.generate_mood_recommendation = slow_upstream(args.latency)
+    flask_app = create_app()
+    asgi_app = create_asgi_app(flask_app)
+
+    db = MongoClient(config.MONGO_URI).get_default_database()
+    user_id = db.users.insert_one({
+        'username': f'bench-{ObjectId()}',
+        'email': f'bench-{ObjectId()}@example.com',
+        'age': 30,
+        'hobbies': ['music'],
+        'profile_version': 1
+    }).inserted_id
+    with flask_app.app_context():
+        token = User.generate_jwt_token(str(user_id))
+    headers = {'Authorization': f'Bearer {token}'}
+    body = {'mood': 'happy', 'description': 'Finished a big project'}
+
+    try:
+        print(f"⏱️  {args.requests} concurrent /recommend requests, {args.latency:.1f} s upstream latency")
+        summarise('wsgi', *run_wsgi(flask_app, args.requests, args.threads, body, headers))
+        summarise('asgi', *asyncio.run(run_asgi(asgi_app, args.requests, body, headers)))
+        print(f"   (WSGI served by {args.threads} threads; ASGI by one event loop)")
+    finally:
+        db.recommendations.delete_many({'user_id': user_id})
+        db.users.delete_one({'_id': user_id})
+        db.client.close()
+
+if __name__ == "__main__":
+    main()
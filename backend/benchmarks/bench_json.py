@@ -0,0 +1,94 @@
+"""
+Benchmark: JSON serialisation of 100-item pages
+Times the old path (per-field str()/isoformat() loop, then json.dumps) against
+services.json_provider.dumps with orjson and with the stdlib fallback, for a
+mood history page and a community feed page. No database needed. Run from
+the backend directory:
+python benchmarks/bench_json.py
+"""
+
+import copy
+import json
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+import services.json_provider as json_provider
+
+PAGE_SIZE = 100
+ITERATIONS = 2000
+
+def mood_page():
+    user_id = ObjectId()
+    now = datetime.utcnow()
+    return [{
+        '_id': ObjectId(),
+        'user_id': user_id,
+        'mood': 'calm',
+        'intensity': i % 10 + 1,
+        'description': 'Walked to work and listened to a podcast',
+        'note': 'Slept well',
+        'created_at': now - timedelta(hours=i),
+        'date': now - timedelta(hours=i),
+        'day': (now - timedelta(hours=i)).strftime('%Y-%m-%d'),
+        'updated_at': now - timedelta(hours=i)
+    } for i in range(PAGE_SIZE)]
+
+def post_page():
+    now = datetime.utcnow()
+    return [{
+        '_id': ObjectId(),
+        'user_id': ObjectId(),
+        'username': f'user{i}',
+        'mood': 'happy',
+        'mood_intensity': 7,
+        'activity_type': 'music',
+        'activity_title': 'Evening playlist',
+        'activity_description': 'A mix of lo-fi tracks that helped me unwind after a long day',
+        'activity_data': {'genre': 'lo-fi', 'duration_minutes': 45, 'tags': ['relax', 'focus']},
+        'likes': i,
+        'stars': i // 2,
+        'comments_count': i % 5,
+        'created_at': now - timedelta(minutes=i),
+        'updated_at': now - timedelta(minutes=i)
+    } for i in range(PAGE_SIZE)]
+
+def legacy_dumps(docs):
+    """What the handlers did before: convert each field in place, then json.dumps"""
+    docs = copy.copy(docs)
+    for i, doc in enumerate(docs):
+        doc = dict(doc)
+        for field in ('_id', 'user_id'):
+            doc[field] = str(doc[field])
+        for field in ('created_at', 'date', 'updated_at'):
+            if field in doc:
+                doc[field] = doc[field].isoformat()
+        docs[i] = doc
+    return json.dumps({'items': docs, 'count': len(docs)}).encode('utf-8')
+
+def bench(name, docs):
+    orjson = json_provider.orjson
+    page = lambda: json_provider.dumps({'items': docs, 'count': len(docs)})
+    variants = [('per-field loop + json', lambda: legacy_dumps(docs), orjson),
+                ('dumps (stdlib)', page, None),
+                ('dumps (orjson)', page, orjson)]
+
+    print(f"⏱️  {name}: {PAGE_SIZE} items, {ITERATIONS} pages")
+    baseline = None
+    for label, func, backend in variants:
+        if label == 'dumps (orjson)' and orjson is None:
+            print(f"   {label:22s}: orjson not installed")
+            continue
+        json_provider.orjson = backend
+        micros = timeit.timeit(func, number=ITERATIONS) / ITERATIONS * 1e6
+        baseline = baseline or micros
+        print(f"   {label:22s}: {micros:8.1f} µs/page, {len(func()):6d} bytes, {baseline / micros:4.1f}x")
+    json_provider.orjson = orjson
+
+if __name__ == "__main__":
+    bench('Mood history page', mood_page())
+    bench('Community feed page', post_page())
@@ -0,0 +1,141 @@
+"""
+Benchmark: mood entry storage layouts (documents vs monthly buckets)
+Generates a synthetic mood history, stores it in both layouts, and reports
+collection/index size plus latency for the history queries MoodEntry serves.
+Needs a MongoDB server (MONGO_URI); it works in a scratch database that is
+dropped afterwards. Run from the backend directory:
+
+    python benchmarks/bench_mood_storage.py --entries 10000000 --users 20000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+from flask import Flask, g
+from pymongo import MongoClient
+
+from config import config
+import models.mood_journal as mood_models
+from models.mood_buckets import MoodBucketStore
+from models.mood_journal import MoodEntry
+
+BENCH_DB_NAME = 'mood_journal_storage_bench'
+MOODS = ['happy', 'sad', 'calm', 'anxious', 'angry', 'excited', 'tired', 'grateful']
+
+def generate(db, entries: int, users: int, batch_size: int = 10000):
+    """Insert synthetic entries into mood_entries: ~1-2 a day per user, going back in time"""
+    user_ids = [ObjectId() for _ in range(users)]
+    per_user = max(1, entries // users)
+    now = datetime.utcnow().replace(microsecond=0)
+    batch = []
+    written = 0
+    started = time.perf_counter()
+    for user_id in user_ids:
+        moment = now
+        for _ in range(per_user):
+            moment -= timedelta(hours=random.randint(6, 30))
+            batch.append({
+                'user_id': user_id,
+                'mood': random.choice(MOODS),
+                'intensity': random.randint(1, 10),
+                'description': 'Synthetic entry for storage benchmarking',
+                'note': '',
+                'created_at': moment,
+                'date': moment
+            })
+            if len(batch) >= batch_size:
+                db.mood_entries.insert_many(batch, ordered=False)
+                written += len(batch)
+                batch = []
+                if written % (batch_size * 50) == 0:
+                    print(f"   ... {written} entries ({time.perf_counter() - started:.0f}s)")
+    if batch:
+        db.mood_entries.insert_many(batch, ordered=False)
+        written += len(batch)
+    return user_ids, written
+
+def collection_size(db, name: str) -> dict:
+    stats = db.command('collStats', name)
+    return {
+        'documents': stats['count'],
+        'data_mb': stats['size'] / 1e6,
+        'storage_mb': stats['storageSize'] / 1e6,
+        'index_mb': stats['totalIndexSize'] / 1e6
+    }
+
+def time_queries(user_ids, samples: int) -> dict:
+    """Median milliseconds for each history query, sampled over random users"""
+    timings = {'first page': [], 'page 10': [], 'by date': [], 'full history': []}
+    for user_id in random.sample(user_ids, min(samples, len(user_ids))):
+        user_id = str(user_id)
+
+        started = time.perf_counter()
+        page, cursor = MoodEntry.get_user_moods_page(user_id, 30)
+        timings['first page'].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        for _ in range(9):
+            if not cursor:
+                break
+            page, cursor = MoodEntry.get_user_moods_page(user_id, 30, cursor)
+        timings['page 10'].append((time.perf_counter() - started) / 9)
+
+        started = time.perf_counter()
+        MoodEntry.get_mood_by_date(user_id, page[-1]['created_at'] if page else datetime.utcnow())
+        timings['by date'].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        sum(1 for _ in MoodEntry.iter_user_moods(user_id))
+        timings['full history'].append(time.perf_counter() - started)
+    return {name: statistics.median(values) * 1000 for name, values in timings.items()}
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare mood entry storage layouts")
+    parser.add_argument("--entries", type=int, default=10_000_000)
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--samples", type=int, default=200, help="users sampled for latency")
+    args = parser.parse_args()
+
+    client = MongoClient(config.MONGO_URI)
+    client.drop_database(BENCH_DB_NAME)
+    db = client[BENCH_DB_NAME]
+    app = Flask(__name__)
+
+    try:
+        print(f"🧪 Generating {args.entries} entries for {args.users} users...")
+        user_ids, written = generate(db, args.entries, args.users)
+        db.mood_entries.create_index([('user_id', 1), ('created_at', -1), ('_id', -1)])
+
+        print("🔄 Building the bucket layout...")
+        MoodBucketStore.ensure_indexes(db)
+        started = time.perf_counter()
+        MoodBucketStore.migrate_to_buckets(db, batch_size=10000)
+        print(f"   migrated {written} entries in {time.perf_counter() - started:.1f}s")
+
+        print("\n💾 Storage")
+        for layout, name in [('documents', 'mood_entries'), ('buckets', 'mood_entry_buckets')]:
+            size = collection_size(db, name)
+            print(f"   {layout:9s}: {size['documents']:>10d} docs, data {size['data_mb']:9.1f} MB, "
+                  f"on disk {size['storage_mb']:9.1f} MB, indexes {size['index_mb']:8.1f} MB")
+
+        print(f"\n⏱️  Median query latency over {args.samples} users (ms)")
+        with app.app_context():
+            g.db = db
+            for layout in ('documents', 'buckets'):
+                mood_models.MOOD_STORAGE_LAYOUT = layout
+                results = time_queries(user_ids, args.samples)
+                print(f"   {layout:9s}: " + ", ".join(f"{name} {ms:7.2f}" for name, ms in results.items()))
+    finally:
+        client.drop_database(BENCH_DB_NAME)
+        client.close()
+
+if __name__ == "__main__":
+    main()
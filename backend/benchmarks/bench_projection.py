@@ -0,0 +1,127 @@
+"""
+Benchmark: full documents vs sparse fieldsets
+Seeds a scratch database with one user's mood history and a community feed,
+then compares each list query with and without a fields= projection: BSON
+bytes read from MongoDB, JSON bytes sent to the client, server query time
+and client decode time. Needs a MongoDB server (MONGO_URI); the scratch
+database is dropped afterwards. Run from the backend directory:
+
+    python benchmarks/bench_projection.py --moods 2000 --posts 2000
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bson
+from bson import ObjectId
+from flask import Flask, g
+from pymongo import MongoClient
+
+from config import config
+from models.community_posts import CommunityPost
+from models.mood_journal import MoodEntry
+from services.json_provider import dumps
+
+BENCH_DB_NAME = 'mood_journal_projection_bench'
+PAGE_SIZE = 50
+REPEATS = 50
+
+def seed(db, moods: int, posts: int):
+    user_id = ObjectId()
+    now = datetime.utcnow()
+    db.mood_entries.insert_many([{
+        'user_id': user_id,
+        'mood': 'calm',
+        'intensity': i % 10 + 1,
+        'description': 'Walked to work, listened to a long podcast about sleep and felt rested afterwards',
+        'note': 'Remember to go to bed before eleven again tonight',
+        'created_at': now - timedelta(hours=i),
+        'date': now - timedelta(hours=i),
+        'day': (now - timedelta(hours=i)).strftime('%Y-%m-%d'),
+        'updated_at': now - timedelta(hours=i)
+    } for i in range(moods)])
+    db.community_posts.insert_many([{
+        'user_id': ObjectId(),
+        'user_username': f'user{i}',
+        'mood': 'happy',
+        'mood_intensity': 7,
+        'activity_title': 'Evening playlist',
+        'activity_description': 'A mix of lo-fi tracks that helped me unwind after a long day at work. ' * 3,
+        'activity_type': 'music',
+        'description': 'Shared from a recommendation',
+        'note': '',
+        'is_public': True,
+        'likes': i % 40,
+        'stars': i % 15,
+        'comments_count': i % 5,
+        'created_at': now - timedelta(minutes=i),
+        'updated_at': now - timedelta(minutes=i)
+    } for i in range(posts)])
+    db.mood_entries.create_index([('user_id', 1), ('created_at', -1), ('_id', -1)])
+    CommunityPost.ensure_indexes(db)
+    return str(user_id)
+
+def measure(query):
+    """Median query time, BSON bytes read, JSON bytes sent and client decode time for one page"""
+    query_times, decode_times = [], []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        docs = query()
+        query_times.append(time.perf_counter() - started)
+        body = dumps({'items': docs})
+        started = time.perf_counter()
+        json.loads(body)
+        decode_times.append(time.perf_counter() - started)
+    return {
+        'bson': sum(len(bson.encode(doc)) for doc in docs),
+        'json': len(body),
+        'query_ms': statistics.median(query_times) * 1000,
+        'decode_ms': statistics.median(decode_times) * 1000
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare full documents with sparse fieldsets")
+    parser.add_argument("--moods", type=int, default=2000)
+    parser.add_argument("--posts", type=int, default=2000)
+    args = parser.parse_args()
+
+    client = MongoClient(config.MONGO_URI)
+    client.drop_database(BENCH_DB_NAME)
+    db = client[BENCH_DB_NAME]
+    app = Flask(__name__)
+
+    try:
+        print(f"🧪 Seeding {args.moods} mood entries and {args.posts} posts...")
+        user_id = seed(db, args.moods, args.posts)
+        cases = [
+            ('mood history', ['mood', 'intensity', 'day'],
+             lambda fields: MoodEntry.get_user_moods_page(user_id, PAGE_SIZE, fields=fields)[0]),
+            ('community feed', ['user_username', 'mood', 'activity_title', 'likes', 'stars'],
+             lambda fields: CommunityPost.get_posts_page(PAGE_SIZE, fields=fields)[0])
+        ]
+
+        print(f"\n📦 {PAGE_SIZE}-item pages, median of {REPEATS} runs")
+        with app.app_context():
+            g.db = db
+            for name, fields, query in cases:
+                print(f"   {name} (fields={','.join(fields)})")
+                results = {}
+                for label, selected in (('full', None), ('fields', fields)):
+                    results[label] = measure(lambda: query(selected))
+                    r = results[label]
+                    print(f"      {label:6s}: {r['bson']:8d} BSON bytes, {r['json']:8d} JSON bytes, "
+                          f"query {r['query_ms']:6.2f} ms, decode {r['decode_ms']:6.3f} ms")
+                print(f"      saved : {1 - results['fields']['json'] / results['full']['json']:.0%} of response bytes")
+    finally:
+        client.drop_database(BENCH_DB_NAME)
+        client.close()
+
+if __name__ == "__main__":
+    main()
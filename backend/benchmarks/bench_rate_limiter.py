@@ -0,0 +1,62 @@
+"""
+Benchmark: per-request overhead of the rate limiter
+Times the raw GCRA check for both backends, then a Flask request with and
+without the limiter hook. Run from the backend directory:
+python benchmarks/bench_rate_limiter.py
+"""
+
+import sys
+import os
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, Blueprint, jsonify
+from services.rate_limiter import RateLimiter, MemoryBackend, SharedMemoryBackend
+
+ITERATIONS = 20000
+
+def bench_backends():
+    shm_path = os.path.join(tempfile.gettempdir(), 'mood_journal_ratelimit_bench')
+    backends = {
+        'memory': MemoryBackend(),
+        'shared': SharedMemoryBackend(path=shm_path, slots=4096)
+    }
+    print(f"⏱️  GCRA check over {ITERATIONS} calls (1000 distinct clients)")
+    for name, backend in backends.items():
+        limiter = RateLimiter({}, backend)
+        counter = iter(range(10 ** 9))
+        seconds = timeit.timeit(
+            lambda: limiter.hit('community', f"user:{next(counter) % 1000}", 10 ** 6, 60.0),
+            number=ITERATIONS
+        )
+        print(f"   {name:7s} backend: {seconds / ITERATIONS * 1e6:8.2f} µs/check")
+    os.remove(shm_path)
+
+def make_app(rules):
+    app = Flask(__name__)
+    bp = Blueprint('community', __name__)
+
+    @bp.route('/ping')
+    def ping():
+        return jsonify({'ok': True})
+
+    app.register_blueprint(bp, url_prefix='/api/v1/community')
+    if rules is not None:
+        app.before_request(RateLimiter(rules, MemoryBackend()).before_request)
+    return app.test_client()
+
+def bench_requests():
+    print(f"\n⏱️  Flask request round trip over {ITERATIONS} calls")
+    results = {}
+    for name, rules in [('without limiter', None), ('with limiter', {'community': '1000000/minute'})]:
+        client = make_app(rules)
+        seconds = timeit.timeit(lambda: client.get('/api/v1/community/ping'), number=ITERATIONS)
+        results[name] = seconds / ITERATIONS * 1e6
+        print(f"   {name:16s}: {results[name]:8.2f} µs/request")
+    print(f"   overhead:         {results['with limiter'] - results['without limiter']:8.2f} µs/request")
+
+if __name__ == "__main__":
+    bench_backends()
+    bench_requests()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+bcrypt cost calibration
+Benchmarks bcrypt on this host and proposes the highest BCRYPT_ROUNDS whose
+hash time stays under the target latency. Run it on the deployment host:
+
+    python calibrate_bcrypt.py --target-ms 250
+"""
+
+import argparse
+import statistics
+import time
+
+import bcrypt
+
+MIN_COST = 4
+MAX_COST = 16
+
+def measure_cost(cost: int, samples: int) -> float:
+    """Median seconds to hash one password at the given cost"""
+    timings = []
+    for _ in range(samples):
+        salt = bcrypt.gensalt(cost)
+        started = time.perf_counter()
+        bcrypt.hashpw(b"calibration-password", salt)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+def propose_cost(target_seconds: float, samples: int, verbose: bool = True) -> int:
+    """Highest cost whose median hash time is within target_seconds"""
+    chosen = MIN_COST
+    for cost in range(MIN_COST, MAX_COST + 1):
+        seconds = measure_cost(cost, samples)
+        within = seconds <= target_seconds
+        if verbose:
+            print(f"   cost {cost:2d}: {seconds * 1000:9.1f} ms {'✅' if within else '❌'}")
+        if not within:
+            break
+        chosen = cost
+    return chosen
+
+def main():
+    parser = argparse.ArgumentParser(description="Propose a BCRYPT_ROUNDS value for this host")
+    parser.add_argument('--target-ms', type=float, default=250, help="maximum hash latency per login (default 250)")
+    parser.add_argument('--samples', type=int, default=3, help="hashes timed per cost (default 3)")
+    args = parser.parse_args()
+
+    print(f"⏱️  Benchmarking bcrypt against a {args.target_ms:.0f} ms target...")
+    cost = propose_cost(args.target_ms / 1000, args.samples)
+    print("=" * 50)
+    print(f"📋 Proposed setting: BCRYPT_ROUNDS={cost}")
+    print("   Existing password hashes are rehashed to this cost on the next successful login.")
+
+if __name__ == '__main__':
+    main()
@@ -13,9 +13,15 @@ logging.getLogger('pymongo').setLevel(logging.WARNING)
 class Config:
     # Database Configuration
     MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/mood_journal_db')
+    # Seconds a worker waits before retrying index creation after a failure
+    INDEX_RETRY_SECONDS = float(os.getenv('INDEX_RETRY_SECONDS', 300))
     
     # JWT Configuration
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'your-secret-key-change-in-production')
+    # Embed recommendation-relevant profile fields in issued tokens (opt-in)
+    JWT_PROFILE_CLAIMS = os.getenv('JWT_PROFILE_CLAIMS', 'False').lower() == 'true'
+    # Number of verified tokens each worker remembers (0 disables the cache)
+    JWT_CACHE_SIZE = int(os.getenv('JWT_CACHE_SIZE', 4096))
     
     # AI Service Configuration
     OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY', '')
@@ -25,6 +31,8 @@ class Config:
     PORT = int(os.getenv('PORT', 8080))
     HOST = os.getenv('HOST', '0.0.0.0')
     DEBUG = os.getenv('DEBUG', 'True').lower() == 'true'
+    # Threads asgi.py lends to the Flask routes it has no async handler for
+    ASGI_WSGI_THREADS = int(os.getenv('ASGI_WSGI_THREADS', 16))
     
     # CORS Configuration
     FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:3003')
@@ -37,8 +45,97 @@ class Config:
         'exp://192.168.0.116:8081'
     ]
     
+    # User Profile Cache Configuration (per worker; Redis URL enables cross-worker invalidation)
+    PROFILE_CACHE_SIZE = int(os.getenv('PROFILE_CACHE_SIZE', 10000))
+    PROFILE_CACHE_TTL_SECONDS = float(os.getenv('PROFILE_CACHE_TTL_SECONDS', 60))
+    PROFILE_CACHE_REDIS_URL = os.getenv('PROFILE_CACHE_REDIS_URL', '')
+    
     # Security Configuration
     BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))
+    # bcrypt runs on a per-worker process pool; 0 workers hashes inline.
+    # The default splits the host's cores between the WEB_CONCURRENCY gunicorn workers.
+    BCRYPT_POOL_WORKERS = int(os.getenv('BCRYPT_POOL_WORKERS', max(1, (os.cpu_count() or 1) // int(os.getenv('WEB_CONCURRENCY', 1)))))
+    BCRYPT_POOL_MAX_PENDING = int(os.getenv('BCRYPT_POOL_MAX_PENDING', 32))
+    BCRYPT_POOL_TIMEOUT_SECONDS = float(os.getenv('BCRYPT_POOL_TIMEOUT_SECONDS', 10))
+    
+    # OpenRouter calls run on a per-worker bulkhead; keep concurrent + pending below gunicorn's --threads.
+    # 'degrade' answers overflow from local templates, 'reject' with a 503. 0 concurrent calls inline.
+    AI_POOL_MAX_CONCURRENT = int(os.getenv('AI_POOL_MAX_CONCURRENT', 4))
+    AI_POOL_MAX_PENDING = int(os.getenv('AI_POOL_MAX_PENDING', 2))
+    AI_POOL_TIMEOUT_SECONDS = float(os.getenv('AI_POOL_TIMEOUT_SECONDS', 25))
+    AI_POOL_SATURATED = os.getenv('AI_POOL_SATURATED', 'degrade')
+    
+    # Load shedding (per worker): under pressure, low-priority endpoints get a fast 503 and
+    # /recommend skips the model. Pressure = in-flight requests at the threshold, or default-class
+    # requests completed in the last window averaging the latency threshold or more.
+    LOAD_SHEDDING_ENABLED = os.getenv('LOAD_SHEDDING_ENABLED', 'True').lower() == 'true'
+    SHED_IN_FLIGHT_THRESHOLD = int(os.getenv('SHED_IN_FLIGHT_THRESHOLD', 6))
+    SHED_LATENCY_THRESHOLD_MS = float(os.getenv('SHED_LATENCY_THRESHOLD_MS', 1000))
+    SHED_WINDOW_SECONDS = float(os.getenv('SHED_WINDOW_SECONDS', 10))
+    SHED_RETRY_AFTER_SECONDS = int(os.getenv('SHED_RETRY_AFTER_SECONDS', 5))
+    SHED_LOW_PRIORITY = [
+        name.strip() for name in os.getenv(
+            'SHED_LOW_PRIORITY',
+            'mood_journal.get_user_insights,'
+            'mood_journal.get_feedback_history,'
+            'community.get_my_liked_posts,'
+            'community.get_my_starred_posts'
+        ).split(',') if name.strip()
+    ]
+    
+    # Prometheus metrics at /metrics (needs prometheus_client). Set PROMETHEUS_MULTIPROC_DIR, as
+    # gunicorn.conf.py does, to aggregate all gunicorn workers. A token makes /metrics require it as a bearer token.
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'
+    METRICS_AUTH_TOKEN = os.getenv('METRICS_AUTH_TOKEN', '')
+    # Seconds between copies of the /health counters into Prometheus, done by a thread in each worker
+    METRICS_SYNC_INTERVAL_SECONDS = float(os.getenv('METRICS_SYNC_INTERVAL_SECONDS', 1))
+    
+    # Community Feed Cache Configuration
+    FEED_CACHE_ENABLED = os.getenv('FEED_CACHE_ENABLED', 'True').lower() == 'true'
+    FEED_CACHE_TTL_SECONDS = float(os.getenv('FEED_CACHE_TTL_SECONDS', 10))
+    FEED_CACHE_PAGES = int(os.getenv('FEED_CACHE_PAGES', 3))
+    FEED_CACHE_MAX_ENTRIES = int(os.getenv('FEED_CACHE_MAX_ENTRIES', 512))
+    
+    # Mood entry storage: 'documents' (one per entry) or 'buckets' (one per user per month)
+    # Switch only after running migrate_mood_storage.py
+    MOOD_STORAGE_LAYOUT = os.getenv('MOOD_STORAGE_LAYOUT', 'documents')
+    
+    # Delta sync (/api/v1/sync)
+    SYNC_PAGE_SIZE = int(os.getenv('SYNC_PAGE_SIZE', 200))  # documents per stream per response
+    SYNC_OVERLAP_SECONDS = float(os.getenv('SYNC_OVERLAP_SECONDS', 5))  # re-read window for clock skew
+    SYNC_TOMBSTONE_DAYS = int(os.getenv('SYNC_TOMBSTONE_DAYS', 30))  # older tokens get a full resync
+    
+    # Response compression and ETags for GET requests
+    COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'True').lower() == 'true'
+    COMPRESSION_MIN_BYTES = int(os.getenv('COMPRESSION_MIN_BYTES', 1024))  # smaller bodies are sent as is
+    COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', 6))
+    COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', 5))  # used when Brotli is installed
+    ETAGS_ENABLED = os.getenv('ETAGS_ENABLED', 'True').lower() == 'true'
+    
+    # Idempotency-Key handling for POST requests
+    IDEMPOTENCY_ENABLED = os.getenv('IDEMPOTENCY_ENABLED', 'True').lower() == 'true'
+    IDEMPOTENCY_TTL_SECONDS = int(os.getenv('IDEMPOTENCY_TTL_SECONDS', 86400))
+    IDEMPOTENCY_LOCK_SECONDS = int(os.getenv('IDEMPOTENCY_LOCK_SECONDS', 120))  # after this a stuck request's key is freed
+    IDEMPOTENCY_CACHE_SIZE = int(os.getenv('IDEMPOTENCY_CACHE_SIZE', 2048))
+    
+    # Rate Limiting Configuration
+    # Rules are "<endpoint or blueprint>=<count>/<second|minute|hour|day>", comma separated
+    RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'True').lower() == 'true'
+    RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'shared')  # 'shared' across workers or 'memory'
+    RATE_LIMIT_SHM_PATH = os.getenv('RATE_LIMIT_SHM_PATH', '')
+    RATE_LIMIT_SHM_SLOTS = int(os.getenv('RATE_LIMIT_SHM_SLOTS', 65536))
+    RATE_LIMIT_TRUST_FORWARDED = os.getenv('RATE_LIMIT_TRUST_FORWARDED', 'False').lower() == 'true'
+    RATE_LIMITS = dict(
+        rule.strip().split('=', 1) for rule in os.getenv(
+            'RATE_LIMITS',
+            'auth_bp.login=10/minute,'
+            'auth_bp.register=5/minute,'
+            'mood_journal.get_recommendation=6/minute,'
+            'mood_journal=120/minute,'
+            'community=240/minute,'
+            'sync=60/minute'
+        ).split(',') if rule.strip()
+    )
     
     # Logging Configuration
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
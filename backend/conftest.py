@@ -0,0 +1,99 @@
+"""
+Shared pytest fixtures
+`client` is the real application (create_app) running against an
+in-memory mongomock database, for tests that drive the API end to end.
+Tests using it are skipped when mongomock is not installed.
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Read by config.py at import: cheap hashes, hashing in-process, no shared-memory rate limit
+# table and no rate limits (test_rate_limiter.py covers those)
+os.environ.setdefault('BCRYPT_ROUNDS', '4')
+os.environ.setdefault('BCRYPT_POOL_WORKERS', '0')
+os.environ.setdefault('RATE_LIMIT_BACKEND', 'memory')
+os.environ.setdefault('RATE_LIMIT_ENABLED', 'False')
+
+import pytest
+
+TEST_DB_URI = 'mongodb://localhost/mood_journal_test'
+
+def _patch_bulk_write(monkeypatch, mongomock):
+    """mongomock's bulk_write lags behind pymongo's operation classes; apply them one by one instead"""
+    import pymongo
+    from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+    probe = mongomock.MongoClient().probe.probe
+    try:
+        probe.bulk_write([pymongo.UpdateOne({'_id': 1}, {'$set': {'a': 1}}, upsert=True)])
+        return
+    except TypeError:
+        pass
+
+    def bulk_write(self, requests, ordered=True, **kwargs):
+        errors = []
+        for index, op in enumerate(requests):
+            try:
+                if isinstance(op, pymongo.InsertOne):
+                    self.insert_one(op._doc)
+                elif isinstance(op, pymongo.UpdateOne):
+                    self.update_one(op._filter, op._doc, upsert=op._upsert)
+                elif isinstance(op, pymongo.UpdateMany):
+                    self.update_many(op._filter, op._doc, upsert=op._upsert)
+                elif isinstance(op, pymongo.ReplaceOne):
+                    self.replace_one(op._filter, op._doc, upsert=op._upsert)
+                elif isinstance(op, pymongo.DeleteOne):
+                    self.delete_one(op._filter)
+                else:
+                    raise TypeError(f"Unsupported bulk operation {op!r}")
+            except DuplicateKeyError as e:
+                errors.append({'index': index, 'code': 11000, 'errmsg': str(e), 'op': getattr(op, '_doc', None)})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({'writeErrors': errors, 'nInserted': 0})
+
+    monkeypatch.setattr(mongomock.collection.Collection, 'bulk_write', bulk_write)
+
+@pytest.fixture
+def mongo_db(monkeypatch):
+    """A fresh mongomock database, also handed to every request of `client`"""
+    mongomock = pytest.importorskip('mongomock')
+    _patch_bulk_write(monkeypatch, mongomock)
+    return mongomock.MongoClient(TEST_DB_URI).get_default_database()
+
+@pytest.fixture
+def flask_app(monkeypatch, mongo_db):
+    """create_app() with MongoClient pointed at mongo_db and the per-worker caches emptied"""
+    from backend import app as app_module
+    from auth.profile_cache import profile_cache
+    from services.feed_cache import FeedCache
+
+    monkeypatch.setattr(app_module, 'MongoClient', lambda uri: mongo_db.client)
+    profile_cache.clear()
+    FeedCache.invalidate()
+    flask_app = app_module.create_app()
+    flask_app.config['TESTING'] = True
+    yield flask_app
+    profile_cache.clear()
+    FeedCache.invalidate()
+
+@pytest.fixture
+def client(flask_app):
+    return flask_app.test_client()
+
+@pytest.fixture
+def register(client):
+    """register(name) -> (user_id, headers) for a new user with password 'secret123'"""
+    def register(name, **profile):
+        response = client.post('/api/v1/auth/register', json={
+            'username': name, 'email': f"{name}@example.com", 'password': 'secret123', **profile
+        })
+        assert response.status_code == 201, response.get_json()
+        body = response.get_json()
+        return str(body['user']['id']), {'Authorization': f"Bearer {body['token']}"}
+    return register
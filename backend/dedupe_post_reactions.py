@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Post reaction dedupe
+Removes duplicate (post_id, user_id) rows from post_likes and post_stars,
+keeping the oldest, and recounts the affected posts. The unique indexes
+on those collections can't be built while duplicates exist; run this once
+before deploying them, or if the app logs that they could not be created:
+
+    python dedupe_post_reactions.py
+"""
+
+import time
+
+from pymongo import MongoClient
+
+from config import config
+from models.community_posts import CommunityPost
+
+def main():
+    client = MongoClient(config.MONGO_URI)
+    db = client.get_default_database()
+    try:
+        print("🔄 Removing duplicate likes and stars...")
+        started = time.perf_counter()
+        removed = CommunityPost.dedupe_reactions(db)
+        for collection, count in removed.items():
+            print(f"   {collection}: {count}")
+        CommunityPost.ensure_indexes(db)
+        print(f"✅ Done in {time.perf_counter() - started:.1f}s; unique indexes are in place")
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+"""
+Gunicorn settings
+Gives the workers a shared PROMETHEUS_MULTIPROC_DIR so /metrics, whichever
+worker answers it, reports the sum over all of them. The directory is
+emptied when the master starts, and the live gauges of exited workers are
+dropped. Used by the Procfile: gunicorn backend.app:app -c backend/gunicorn.conf.py
+"""
+
+import os
+import shutil
+import tempfile
+
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'mood-journal-metrics'))
+
+def on_starting(server):
+    path = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+def child_exit(server, worker):
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Mood entry storage migration
+Copies mood entries between the one-document-per-entry layout (mood_entries)
+and the monthly bucket layout (mood_entry_buckets). Stop writes or run during
+a quiet window, migrate, check the counts, then set MOOD_STORAGE_LAYOUT and
+restart the app:
+
+    python migrate_mood_storage.py --to buckets
+    python migrate_mood_storage.py --to documents --drop-source
+"""
+
+import argparse
+import sys
+import time
+
+from pymongo import MongoClient
+
+from config import config
+from models.mood_buckets import MoodBucketStore
+
+def count_entries(db, layout: str) -> int:
+    """Number of mood entries stored in the given layout"""
+    if layout == 'documents':
+        return db.mood_entries.count_documents({})
+    totals = list(db.mood_entry_buckets.aggregate([{'$group': {'_id': None, 'entries': {'$sum': '$count'}}}]))
+    return totals[0]['entries'] if totals else 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate mood entries between storage layouts")
+    parser.add_argument("--to", choices=["buckets", "documents"], required=True, help="target layout")
+    parser.add_argument("--batch-size", type=int, default=1000, help="entries per insert_many")
+    parser.add_argument("--force", action="store_true", help="empty the target collection first")
+    parser.add_argument("--drop-source", action="store_true", help="drop the source collection once counts match")
+    args = parser.parse_args()
+
+    source = 'documents' if args.to == 'buckets' else 'buckets'
+    source_collection = 'mood_entries' if source == 'documents' else 'mood_entry_buckets'
+    target_collection = 'mood_entry_buckets' if args.to == 'buckets' else 'mood_entries'
+
+    client = MongoClient(config.MONGO_URI)
+    db = client.get_default_database()
+    try:
+        if db[target_collection].estimated_document_count() and not args.force:
+            print(f"❌ {target_collection} is not empty; re-run with --force to replace it")
+            return 1
+        db[target_collection].drop()
+
+        expected = count_entries(db, source)
+        print(f"🔄 Migrating {expected} mood entries from {source} to {args.to}...")
+        started = time.perf_counter()
+        if args.to == 'buckets':
+            MoodBucketStore.ensure_indexes(db)
+            copied = MoodBucketStore.migrate_to_buckets(db, args.batch_size)
+        else:
+            db.mood_entries.create_index([('user_id', 1), ('created_at', -1), ('_id', -1)])
+            copied = MoodBucketStore.migrate_to_documents(db, args.batch_size)
+        stored = count_entries(db, args.to)
+        print(f"✅ Copied {copied} entries in {time.perf_counter() - started:.1f}s ({stored} now stored as {args.to})")
+
+        if stored != expected:
+            print(f"❌ Count mismatch: expected {expected}, found {stored}. Source left untouched.")
+            return 1
+        if args.drop_source:
+            db[source_collection].drop()
+            print(f"🗑️  Dropped {source_collection}")
+        print(f"👉 Set MOOD_STORAGE_LAYOUT={args.to} and restart the app")
+        return 0
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,19 @@
 from datetime import datetime
 from bson import ObjectId
 from flask import g
+from auth.models import User
+from pymongo.errors import DuplicateKeyError
+from models.pagination import keyset_filter, split_page
+from models.projection import build_projection
+from services.feed_cache import FeedCache
+from models.sync import Tombstone, utcnow
 
 class CommunityPost:
+    # Fields clients may ask for with fields=; _id is always returned
+    FIELDS = ('user_id', 'user_username', 'mood', 'mood_intensity', 'activity_title', 'activity_description',
+              'activity_type', 'description', 'note', 'is_public', 'likes', 'stars', 'comments_count',
+              'created_at', 'updated_at')
+
     @staticmethod
     def create(user_id: str, mood: str, activity_title: str, activity_description: str, 
                activity_type: str, mood_intensity: int, description: str = None, note: str = None, is_public: bool = True):
@@ -23,16 +34,20 @@ class CommunityPost:
             'comments_count': 0,
             'user_username': None  
         }
+        post_data['updated_at'] = post_data['created_at']
         
-        user = g.db.users.find_one({'_id': ObjectId(user_id)})
+        user = User.get_profile(user_id)
         if user:
             post_data['user_username'] = user.get('username', 'Anonymous')
         
         result = g.db.community_posts.insert_one(post_data)
+        if is_public:
+            FeedCache.invalidate()
         return str(result.inserted_id)
 
     @staticmethod
-    def get_posts(limit: int = 20, skip: int = 0, mood_filter: str = None, activity_type_filter: str = None):
+    def get_posts(limit: int = 20, skip: int = 0, mood_filter: str = None, activity_type_filter: str = None,
+                  fields: list = None):
         """Get community posts with optional filters"""
         query = {'is_public': True}
         
@@ -42,138 +57,259 @@ class CommunityPost:
         if activity_type_filter:
             query['activity_type'] = activity_type_filter
         
-        cursor = g.db.community_posts.find(query).sort('created_at', -1).skip(skip).limit(limit)
+        cursor = g.db.community_posts.find(query, build_projection(fields)).sort('created_at', -1).skip(skip).limit(limit)
         return list(cursor)
 
     @staticmethod
-    def get_user_posts(user_id: str, limit: int = 20):
+    def get_posts_page(limit: int = 20, cursor: str = None, mood_filter: str = None,
+                       activity_type_filter: str = None, skip: int = 0, fields: list = None):
+        """Get one page of community posts in (created_at, _id) order.
+
+        Returns (posts, next_cursor); next_cursor is None on the last page.
+        With a cursor the query seeks straight to the page through the feed
+        indexes; skip is only honoured for legacy clients without one.
+        fields limits the returned fields (created_at is kept for the cursor).
+        """
+        query = {'is_public': True}
+        
+        if mood_filter:
+            query['mood'] = mood_filter.lower()
+        
+        if activity_type_filter:
+            query['activity_type'] = activity_type_filter
+        
+        if cursor:
+            query.update(keyset_filter(cursor))
+            skip = 0
+        
+        docs = g.db.community_posts.find(query, build_projection(fields, required=('created_at',))).sort(
+            [('created_at', -1), ('_id', -1)]
+        ).skip(skip).limit(limit + 1)
+        return split_page(list(docs), limit)
+
+    @staticmethod
+    def get_user_posts(user_id: str, limit: int = 20, fields: list = None):
         """Get posts by a specific user"""
         cursor = g.db.community_posts.find({
             'user_id': ObjectId(user_id)
-        }).sort('created_at', -1).limit(limit)
+        }, build_projection(fields)).sort('created_at', -1).limit(limit)
         return list(cursor)
 
     @staticmethod
-    def get_post_by_id(post_id: str):
+    def get_post_by_id(post_id: str, fields: list = None):
         """Get a specific post by ID"""
-        return g.db.community_posts.find_one({'_id': ObjectId(post_id)})
+        return g.db.community_posts.find_one({'_id': ObjectId(post_id)}, build_projection(fields))
 
     @staticmethod
-    def like_post(post_id: str, user_id: str):
-        """Like a post"""
-        
-        existing_like = g.db.post_likes.find_one({
-            'post_id': ObjectId(post_id),
-            'user_id': ObjectId(user_id)
-        })
-        
-        if existing_like:
-            return False  
-        
-        
-        g.db.post_likes.insert_one({
-            'post_id': ObjectId(post_id),
-            'user_id': ObjectId(user_id),
-            'created_at': datetime.utcnow()
-        })
-        
-        
-        g.db.community_posts.update_one(
-            {'_id': ObjectId(post_id)},
-            {'$inc': {'likes': 1}}
+    def delete(post_id: str, user_id: str):
+        """Delete one of the user's posts with its comments and reactions. Returns False if not found."""
+        post = g.db.community_posts.find_one_and_delete(
+            {'_id': ObjectId(post_id), 'user_id': ObjectId(user_id)},
+            projection={'is_public': 1}
         )
-        
+        if post is None:
+            return False
+
+        deleted_at = utcnow()
+        comments = list(g.db.post_comments.find({'post_id': ObjectId(post_id)}, {'user_id': 1}))
+        g.db.post_comments.delete_many({'post_id': ObjectId(post_id)})
+        g.db.post_likes.delete_many({'post_id': ObjectId(post_id)})
+        g.db.post_stars.delete_many({'post_id': ObjectId(post_id)})
+
+        # Comment authors sync their own comments, so each gets a tombstone too
+        Tombstone.record_many(
+            [(user_id, 'posts', post_id)] +
+            [(comment['user_id'], 'comments', comment['_id']) for comment in comments],
+            deleted_at
+        )
+        if post.get('is_public', True):
+            FeedCache.invalidate()
         return True
 
     @staticmethod
-    def unlike_post(post_id: str, user_id: str):
-        """Unlike a post"""
-        result = g.db.post_likes.delete_one({
-            'post_id': ObjectId(post_id),
-            'user_id': ObjectId(user_id)
-        })
-        
-        if result.deleted_count > 0:
-            g.db.community_posts.update_one(
-                {'_id': ObjectId(post_id)},
-                {'$inc': {'likes': -1}}
+    def ensure_indexes(db):
+        """Create the indexes the feed and like/star toggles depend on"""
+        db.post_likes.create_index([('post_id', 1), ('user_id', 1)], unique=True)
+        db.post_stars.create_index([('post_id', 1), ('user_id', 1)], unique=True)
+        db.post_likes.create_index([('user_id', 1), ('created_at', -1), ('_id', -1)])
+        db.post_stars.create_index([('user_id', 1), ('created_at', -1), ('_id', -1)])
+
+        # One feed index per filter combination, all ending in the keyset sort order
+        feed_order = [('created_at', -1), ('_id', -1)]
+        db.community_posts.create_index([('is_public', 1)] + feed_order)
+        db.community_posts.create_index([('is_public', 1), ('mood', 1)] + feed_order)
+        db.community_posts.create_index([('is_public', 1), ('activity_type', 1)] + feed_order)
+        db.community_posts.create_index([('is_public', 1), ('mood', 1), ('activity_type', 1)] + feed_order)
+
+    @staticmethod
+    def dedupe_reactions(db):
+        """Remove duplicate likes/stars so the unique (post_id, user_id) indexes can be built.
+
+        Keeps the oldest reaction of each pair and recounts the affected
+        posts' likes/stars counters. Returns the number removed per collection.
+        """
+        removed = {}
+        for collection, counter in (('post_likes', 'likes'), ('post_stars', 'stars')):
+            removed[collection] = 0
+            affected = set()
+            duplicates = db[collection].aggregate([
+                {'$group': {'_id': {'post_id': '$post_id', 'user_id': '$user_id'},
+                            'ids': {'$push': '$_id'}, 'count': {'$sum': 1}}},
+                {'$match': {'count': {'$gt': 1}}}
+            ], allowDiskUse=True)
+            for duplicate in duplicates:
+                extra = sorted(duplicate['ids'])[1:]
+                removed[collection] += db[collection].delete_many({'_id': {'$in': extra}}).deleted_count
+                affected.add(duplicate['_id']['post_id'])
+            for post_id in affected:
+                db.community_posts.update_one(
+                    {'_id': post_id},
+                    {'$set': {counter: db[collection].count_documents({'post_id': post_id}), 'updated_at': utcnow()}}
+                )
+        if any(removed.values()):
+            FeedCache.invalidate()
+        return removed
+
+    @staticmethod
+    def _add_reaction(collection, counter: str, post_id: str, user_id: str):
+        """Upsert a (post, user) reaction and bump the post counter if it is new.
+
+        The unique (post_id, user_id) index makes concurrent double-taps
+        collapse into a single document, so only the request that actually
+        inserted it increments the counter.
+        """
+        try:
+            result = collection.update_one(
+                {'post_id': ObjectId(post_id), 'user_id': ObjectId(user_id)},
+                {'$setOnInsert': {'created_at': datetime.utcnow()}},
+                upsert=True
             )
-            return True
-        
-        return False
+        except DuplicateKeyError:
+            return False
+
+        if result.upserted_id is None:
+            return False
+
+        g.db.community_posts.update_one(
+            {'_id': ObjectId(post_id)},
+            {'$inc': {counter: 1}, '$set': {'updated_at': utcnow()}}
+        )
+        FeedCache.invalidate()
+        return True
 
     @staticmethod
-    def star_post(post_id: str, user_id: str):
-        """Star a post (bookmark/favorite)"""
-        
-        existing_star = g.db.post_stars.find_one({
+    def _remove_reaction(collection, counter: str, post_id: str, user_id: str):
+        """Delete a (post, user) reaction and decrement the counter if one existed"""
+        result = collection.delete_one({
             'post_id': ObjectId(post_id),
             'user_id': ObjectId(user_id)
         })
-        
-        if existing_star:
-            return False 
-        
-        
-        g.db.post_stars.insert_one({
-            'post_id': ObjectId(post_id),
-            'user_id': ObjectId(user_id),
-            'created_at': datetime.utcnow()
-        })
-        
-        
+
+        if result.deleted_count == 0:
+            return False
+
         g.db.community_posts.update_one(
             {'_id': ObjectId(post_id)},
-            {'$inc': {'stars': 1}}
+            {'$inc': {counter: -1}, '$set': {'updated_at': utcnow()}}
         )
-        
+        FeedCache.invalidate()
         return True
 
+    @staticmethod
+    def like_post(post_id: str, user_id: str):
+        """Like a post, returns True if the like was newly recorded"""
+        return CommunityPost._add_reaction(g.db.post_likes, 'likes', post_id, user_id)
+
+    @staticmethod
+    def unlike_post(post_id: str, user_id: str):
+        """Unlike a post, returns True if an existing like was removed"""
+        return CommunityPost._remove_reaction(g.db.post_likes, 'likes', post_id, user_id)
+
+    @staticmethod
+    def star_post(post_id: str, user_id: str):
+        """Star a post (bookmark/favorite), returns True if newly starred"""
+        return CommunityPost._add_reaction(g.db.post_stars, 'stars', post_id, user_id)
+
     @staticmethod
     def unstar_post(post_id: str, user_id: str):
-        """Unstar a post"""
-        result = g.db.post_stars.delete_one({
-            'post_id': ObjectId(post_id),
-            'user_id': ObjectId(user_id)
-        })
-        
-        if result.deleted_count > 0:
-            g.db.community_posts.update_one(
-                {'_id': ObjectId(post_id)},
-                {'$inc': {'stars': -1}}
-            )
-            return True
-        
-        return False
+        """Unstar a post, returns True if an existing star was removed"""
+        return CommunityPost._remove_reaction(g.db.post_stars, 'stars', post_id, user_id)
 
     @staticmethod
-    def get_user_liked_posts(user_id: str, limit: int = 20):
-        """Get posts that a user has liked"""
-        liked_post_ids = g.db.post_likes.find({'user_id': ObjectId(user_id)}).distinct('post_id')
-        
-        if not liked_post_ids:
-            return []
-        
-        cursor = g.db.community_posts.find({
-            '_id': {'$in': liked_post_ids}
-        }).sort('created_at', -1).limit(limit)
-        
-        return list(cursor)
+    def _get_reacted_posts_page(collection, user_id: str, limit: int, cursor: str, reacted_at_field: str,
+                                fields: list = None):
+        """Walk a user's reactions newest first and join in the posts.
+
+        Pages over the reaction documents by (created_at, _id), so only limit+1
+        reactions are read no matter how many the user has. Posts deleted since
+        the reaction are dropped from the page but still advance the cursor.
+        """
+        match = {'user_id': ObjectId(user_id)}
+        if cursor:
+            match.update(keyset_filter(cursor))
+
+        pipeline = [
+            {'$match': match},
+            {'$sort': {'created_at': -1, '_id': -1}},
+            {'$limit': limit + 1},
+            {'$lookup': {
+                'from': 'community_posts',
+                'localField': 'post_id',
+                'foreignField': '_id',
+                'as': 'post'
+            }},
+            {'$unwind': {'path': '$post', 'preserveNullAndEmptyArrays': True}}
+        ]
+        if fields:
+            projection = {'created_at': 1, 'post._id': 1}
+            projection.update((f'post.{field}', 1) for field in fields)
+            pipeline.append({'$project': projection})
+        reactions, next_cursor = split_page(list(collection.aggregate(pipeline)), limit)
+
+        posts = []
+        for reaction in reactions:
+            post = reaction.get('post')
+            if post:
+                post[reacted_at_field] = reaction['created_at']
+                posts.append(post)
+        return posts, next_cursor
 
     @staticmethod
-    def get_user_starred_posts(user_id: str, limit: int = 20):
-        """Get posts that a user has starred"""
-        starred_post_ids = g.db.post_stars.find({'user_id': ObjectId(user_id)}).distinct('post_id')
-        
-        if not starred_post_ids:
-            return []
-        
+    def get_user_liked_posts(user_id: str, limit: int = 20, cursor: str = None, fields: list = None):
+        """Get posts that a user has liked, most recently liked first. Returns (posts, next_cursor)."""
+        return CommunityPost._get_reacted_posts_page(g.db.post_likes, user_id, limit, cursor, 'liked_at', fields)
+
+    @staticmethod
+    def get_user_starred_posts(user_id: str, limit: int = 20, cursor: str = None, fields: list = None):
+        """Get posts that a user has starred, most recently starred first. Returns (posts, next_cursor)."""
+        return CommunityPost._get_reacted_posts_page(g.db.post_stars, user_id, limit, cursor, 'starred_at', fields)
+
+    @staticmethod
+    def get_posts_by_ids(post_ids: list, fields: list = None):
+        """Get several posts by ID with a single query"""
         cursor = g.db.community_posts.find({
-            '_id': {'$in': starred_post_ids}
-        }).sort('created_at', -1).limit(limit)
-        
+            '_id': {'$in': [ObjectId(post_id) for post_id in post_ids]}
+        }, build_projection(fields))
         return list(cursor)
 
+    @staticmethod
+    def get_user_reactions(post_ids: list, user_id: str):
+        """Return the (liked, starred) sets of post id strings for a user.
+
+        Costs two indexed $in queries regardless of how many posts are asked for.
+        """
+        if not post_ids:
+            return set(), set()
+
+        query = {
+            'post_id': {'$in': [ObjectId(post_id) for post_id in post_ids]},
+            'user_id': ObjectId(user_id)
+        }
+        projection = {'post_id': 1, '_id': 0}
+        liked = {str(doc['post_id']) for doc in g.db.post_likes.find(query, projection)}
+        starred = {str(doc['post_id']) for doc in g.db.post_stars.find(query, projection)}
+        return liked, starred
+
     @staticmethod
     def is_post_liked_by_user(post_id: str, user_id: str):
         """Check if a user has liked a specific post"""
@@ -193,6 +329,9 @@ class CommunityPost:
         return star is not None
 
 class PostComment:
+    # Fields clients may ask for with fields=; _id is always returned
+    FIELDS = ('post_id', 'user_id', 'user_username', 'comment', 'created_at', 'updated_at')
+
     @staticmethod
     def create(post_id: str, user_id: str, comment: str):
         """Create a comment on a post"""
@@ -203,9 +342,10 @@ class PostComment:
             'created_at': datetime.utcnow(),
             'user_username': None
         }
+        comment_data['updated_at'] = comment_data['created_at']
         
         
-        user = g.db.users.find_one({'_id': ObjectId(user_id)})
+        user = User.get_profile(user_id)
         if user:
             comment_data['user_username'] = user.get('username', 'Anonymous')
         
@@ -213,16 +353,40 @@ class PostComment:
         
         g.db.community_posts.update_one(
             {'_id': ObjectId(post_id)},
-            {'$inc': {'comments_count': 1}}
+            {'$inc': {'comments_count': 1}, '$set': {'updated_at': comment_data['created_at']}}
         )
+        FeedCache.invalidate()
         
         return str(result.inserted_id)
 
     @staticmethod
-    def get_post_comments(post_id: str, limit: int = 50):
+    def delete(post_id: str, comment_id: str, user_id: str):
+        """Delete a comment; its author or the post's owner may do so. Returns False if not found or not allowed."""
+        comment = g.db.post_comments.find_one({'_id': ObjectId(comment_id), 'post_id': ObjectId(post_id)})
+        if comment is None:
+            return False
+        if str(comment['user_id']) != user_id:
+            post = g.db.community_posts.find_one({'_id': ObjectId(post_id)}, {'user_id': 1})
+            if post is None or str(post['user_id']) != user_id:
+                return False
+
+        if g.db.post_comments.delete_one({'_id': comment['_id']}).deleted_count == 0:
+            return False
+
+        deleted_at = utcnow()
+        g.db.community_posts.update_one(
+            {'_id': ObjectId(post_id)},
+            {'$inc': {'comments_count': -1}, '$set': {'updated_at': deleted_at}}
+        )
+        Tombstone.record(comment['user_id'], 'comments', comment_id, deleted_at)
+        FeedCache.invalidate()
+        return True
+
+    @staticmethod
+    def get_post_comments(post_id: str, limit: int = 50, fields: list = None):
         """Get comments for a specific post"""
         cursor = g.db.post_comments.find({
             'post_id': ObjectId(post_id)
-        }).sort('created_at', -1).limit(limit)
+        }, build_projection(fields)).sort('created_at', -1).limit(limit)
         
         return list(cursor) 
\ No newline at end of file
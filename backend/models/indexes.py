@@ -0,0 +1,21 @@
+import logging
+from models.community_posts import CommunityPost
+from models.mood_journal import MoodEntry, MoodRollup, UserFeedback
+from models.sync import ChangeFeed
+from services.idempotency import IdempotencyStore
+
+def ensure_indexes(db):
+    """Create the indexes the models rely on. Safe to call repeatedly.
+
+    Each model's indexes are attempted even if another's fail; returns
+    False if any failed. A unique index on post_likes/post_stars fails
+    while duplicate rows exist, see dedupe_post_reactions.py.
+    """
+    ok = True
+    for model in (CommunityPost, MoodEntry, MoodRollup, UserFeedback, ChangeFeed, IdempotencyStore):
+        try:
+            model.ensure_indexes(db)
+        except Exception as e:
+            logging.warning(f"Could not create MongoDB indexes for {model.__name__}: {e}")
+            ok = False
+    return ok
@@ -0,0 +1,364 @@
+from datetime import datetime, timedelta, timezone
+from itertools import groupby
+from bson.objectid import ObjectId
+from pymongo import UpdateOne
+from models.pagination import decode_cursor, split_page
+from models.projection import apply_projection
+
+# Entries per bucket document; a busy month simply spills into a second bucket
+BUCKET_SIZE = 500
+
+def month_key(moment: datetime) -> str:
+    """Calendar month of a timestamp as 'YYYY-MM' in UTC; naive datetimes are taken as UTC"""
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc)
+    return moment.strftime('%Y-%m')
+
+def _entry_order(entry):
+    return entry['created_at'], entry['_id']
+
+class MoodBucketStore:
+    """Bucketed layout for mood entries: one mood_entry_buckets document per user per month.
+
+    Each bucket holds up to BUCKET_SIZE entries in an `entries` array, with
+    its month, entry count and first/last timestamps. Entries keep their own
+    ObjectIds and are unpacked into the same shape as mood_entries documents
+    (including user_id and the `date` alias of created_at), so callers can't
+    tell which layout is in use. History reads walk buckets newest month
+    first and stop as soon as a page is full.
+    """
+
+    @staticmethod
+    def insert(db, mood_data: dict) -> ObjectId:
+        """Append one mood entry (mood_entries shape) to its month's bucket"""
+        entry = MoodBucketStore.pack(mood_data)
+        db.mood_entry_buckets.update_one(
+            {'user_id': mood_data['user_id'], 'month': month_key(entry['created_at']), 'count': {'$lt': BUCKET_SIZE}},
+            {
+                '$push': {'entries': entry},
+                '$inc': {'count': 1},
+                '$min': {'first': entry['created_at']},
+                '$max': {'last': entry['created_at'], 'updated_at': entry['updated_at']}
+            },
+            upsert=True
+        )
+        return entry['_id']
+
+    @staticmethod
+    def insert_many(db, user_id: ObjectId, docs: list) -> dict:
+        """Append a batch of entries (mood_entries shape, with client_id) in one bulk_write per call.
+
+        Entries whose client_id is already stored for the user are skipped.
+        Returns {client_id: existing entry _id} for those. Two concurrent
+        replays of the same batch are not deduplicated by an index in this
+        layout.
+        """
+        client_ids = [doc['client_id'] for doc in docs]
+        duplicates = {}
+        for bucket in db.mood_entry_buckets.find(
+            {'user_id': user_id, 'entries.client_id': {'$in': client_ids}}, {'entries._id': 1, 'entries.client_id': 1}
+        ):
+            for entry in bucket['entries']:
+                if entry.get('client_id') in client_ids:
+                    duplicates[entry['client_id']] = entry['_id']
+
+        by_month = {}
+        for doc in docs:
+            if doc['client_id'] not in duplicates:
+                by_month.setdefault(month_key(doc['created_at']), []).append(MoodBucketStore.pack(doc))
+
+        operations = []
+        for month, entries in by_month.items():
+            for start in range(0, len(entries), BUCKET_SIZE):
+                chunk = entries[start:start + BUCKET_SIZE]
+                operations.append(UpdateOne(
+                    {'user_id': user_id, 'month': month, 'count': {'$lte': BUCKET_SIZE - len(chunk)}},
+                    {
+                        '$push': {'entries': {'$each': chunk}},
+                        '$inc': {'count': len(chunk)},
+                        '$min': {'first': min(entry['created_at'] for entry in chunk)},
+                        '$max': {
+                            'last': max(entry['created_at'] for entry in chunk),
+                            'updated_at': max(entry['updated_at'] for entry in chunk)
+                        }
+                    },
+                    upsert=True
+                ))
+        if operations:
+            db.mood_entry_buckets.bulk_write(operations, ordered=True)
+        return duplicates
+
+    @staticmethod
+    def pack(mood_data: dict) -> dict:
+        """Strip the fields the bucket already stores (user_id, the duplicated date)"""
+        entry = {key: value for key, value in mood_data.items() if key not in ('user_id', 'date')}
+        entry.setdefault('_id', ObjectId())
+        return entry
+
+    @staticmethod
+    def unpack(user_id: ObjectId, entry: dict) -> dict:
+        """Rebuild a mood_entries-shaped document from a bucket entry"""
+        doc = {'_id': entry['_id'], 'user_id': user_id}
+        doc.update((key, value) for key, value in entry.items() if key != '_id')
+        doc['date'] = entry['created_at']
+        return doc
+
+    @staticmethod
+    def entries_projection(projection: dict = None) -> dict:
+        """Bucket projection reading only the entry fields an inclusion projection asks for"""
+        if projection is None:
+            return {'month': 1, 'entries': 1}
+        fields = {'month': 1, 'entries._id': 1, 'entries.created_at': 1}
+        fields.update((f'entries.{field}', 1) for field in projection if field not in ('_id', 'user_id', 'date'))
+        return fields
+
+    @staticmethod
+    def iter_user_moods(db, user_id: str, before=None, batch_size: int = 50, projection: dict = None):
+        """Yield a user's entries newest first, optionally only those strictly before a (created_at, _id) position"""
+        user_oid = ObjectId(user_id)
+        query = {'user_id': user_oid}
+        if before is not None:
+            query['first'] = {'$lte': before[0]}
+
+        buckets = db.mood_entry_buckets.find(query, MoodBucketStore.entries_projection(projection)).sort(
+            [('month', -1), ('_id', -1)]
+        ).batch_size(batch_size)
+
+        # Concurrent first writes (or a full bucket) can leave several buckets for one month
+        for _, month_buckets in groupby(buckets, key=lambda bucket: bucket['month']):
+            entries = [entry for bucket in month_buckets for entry in bucket.get('entries', [])]
+            entries.sort(key=_entry_order, reverse=True)
+            for entry in entries:
+                if before is not None and _entry_order(entry) >= before:
+                    continue
+                yield apply_projection(MoodBucketStore.unpack(user_oid, entry), projection)
+
+    @staticmethod
+    def get_user_moods_page(db, user_id: str, limit: int = 30, cursor: str = None, projection: dict = None):
+        """One page of a user's entries, newest first; same contract as MoodEntry.get_user_moods_page"""
+        before = decode_cursor(cursor) if cursor else None
+        docs = []
+        for doc in MoodBucketStore.iter_user_moods(db, user_id, before, projection=projection):
+            docs.append(doc)
+            if len(docs) > limit:
+                break
+        return split_page(docs, limit)
+
+    @staticmethod
+    def find_in_range(db, user_id: str, start: datetime, end: datetime):
+        """Entries with start <= created_at < end, newest first"""
+        user_oid = ObjectId(user_id)
+        buckets = db.mood_entry_buckets.find({
+            'user_id': user_oid,
+            'first': {'$lt': end},
+            'last': {'$gte': start}
+        }, {'entries': 1})
+        entries = [
+            entry for bucket in buckets for entry in bucket.get('entries', [])
+            if start <= entry['created_at'] < end
+        ]
+        entries.sort(key=_entry_order, reverse=True)
+        return [MoodBucketStore.unpack(user_oid, entry) for entry in entries]
+
+    @staticmethod
+    def find_days(db, user_id: str, first_day: str, last_day: str):
+        """Entries whose day key is within [first_day, last_day], oldest first"""
+        # Day keys are local dates, so widen the UTC window by a day on each side
+        start = datetime.strptime(first_day, '%Y-%m-%d') - timedelta(days=1)
+        end = datetime.strptime(last_day, '%Y-%m-%d') + timedelta(days=2)
+        entries = [
+            entry for entry in MoodBucketStore.find_in_range(db, user_id, start, end)
+            if first_day <= entry.get('day', '') <= last_day
+        ]
+        entries.sort(key=lambda entry: (entry['day'], entry['created_at']))
+        return entries
+
+    @staticmethod
+    def upsert_daily(db, user_id: str, day: str, fields: dict, attempts: int = 5):
+        """Create or replace the user's "one entry per day" mood for a day.
+
+        The replace is a compare-and-set on the previous entry's values, so two
+        concurrent replaces can't both adjust rollups for the same old entry.
+        Creating the first entry of a day is not covered by a unique index in
+        this layout; readers take the newest entry if two ever race in.
+        Returns (entry_id, previous entry or None).
+        """
+        user_oid = ObjectId(user_id)
+        daily = {'day': day, 'daily': True}
+        for _ in range(attempts):
+            bucket = db.mood_entry_buckets.find_one(
+                {'user_id': user_oid, 'entries': {'$elemMatch': daily}},
+                {'entries': {'$elemMatch': daily}}
+            )
+            if bucket is None:
+                entry_id = MoodBucketStore.insert(db, dict(fields, user_id=user_oid, **daily))
+                return entry_id, None
+
+            previous = dict(bucket['entries'][0])
+            expected = {key: previous.get(key) for key in ('_id', 'mood', 'intensity', 'created_at')}
+            result = db.mood_entry_buckets.update_one(
+                {'_id': bucket['_id'], 'entries': {'$elemMatch': expected}},
+                {
+                    '$set': {f'entries.$.{key}': value for key, value in fields.items() if key != 'date'},
+                    '$min': {'first': fields['created_at']},
+                    '$max': {'last': fields['created_at'], 'updated_at': fields['updated_at']}
+                }
+            )
+            if result.matched_count:
+                return previous['_id'], previous
+        raise RuntimeError(f"Could not update the daily mood for {day}: too much contention")
+
+    @staticmethod
+    def delete(db, user_id: str, entry_id: str, deleted_at: datetime):
+        """Remove one entry from its bucket. Returns the removed entry (unpacked) or None."""
+        user_oid = ObjectId(user_id)
+        bucket = db.mood_entry_buckets.find_one_and_update(
+            {'user_id': user_oid, 'entries._id': ObjectId(entry_id)},
+            {
+                '$pull': {'entries': {'_id': ObjectId(entry_id)}},
+                '$inc': {'count': -1},
+                '$max': {'updated_at': deleted_at}
+            },
+            projection={'entries': {'$elemMatch': {'_id': ObjectId(entry_id)}}}
+        )
+        if not bucket or not bucket.get('entries'):
+            return None
+        return MoodBucketStore.unpack(user_oid, dict(bucket['entries'][0]))
+
+    @staticmethod
+    def changed_since(db, user_id: str, after_time, after_id, limit: int):
+        """Entries changed after (updated_at, _id), oldest change first, for delta sync"""
+        user_oid = ObjectId(user_id)
+        query = {'user_id': user_oid}
+        if after_time is not None:
+            query['updated_at'] = {'$gte': after_time}
+        entries = []
+        for bucket in db.mood_entry_buckets.find(query, {'entries': 1}):
+            for entry in bucket.get('entries', []):
+                updated_at = entry.get('updated_at')
+                if updated_at is None:
+                    continue
+                if after_time is not None:
+                    if after_id is None and updated_at <= after_time:
+                        continue
+                    if after_id is not None and (updated_at, entry['_id']) <= (after_time, after_id):
+                        continue
+                entries.append(entry)
+        entries.sort(key=lambda entry: (entry['updated_at'], entry['_id']))
+        return [MoodBucketStore.unpack(user_oid, entry) for entry in entries[:limit]]
+
+    @staticmethod
+    def backfill_updated_at(db) -> int:
+        """Stamp updated_at = created_at on bucketed entries (and their buckets) that predate change tracking"""
+        updated = 0
+        for bucket in db.mood_entry_buckets.find({'entries': {'$elemMatch': {'updated_at': {'$exists': False}}}}):
+            entries = bucket['entries']
+            for entry in entries:
+                if 'updated_at' not in entry:
+                    entry['updated_at'] = entry['created_at']
+                    updated += 1
+            db.mood_entry_buckets.update_one(
+                {'_id': bucket['_id'], 'count': bucket['count']},
+                {'$set': {
+                    'entries': entries,
+                    'updated_at': max(entry['updated_at'] for entry in entries)
+                }}
+            )
+        return updated
+
+    @staticmethod
+    def backfill_day_keys(db) -> int:
+        """Add the day key (UTC date of created_at) to bucketed entries that predate it"""
+        updated = 0
+        for bucket in db.mood_entry_buckets.find({'entries': {'$elemMatch': {'day': {'$exists': False}}}}):
+            entries = bucket['entries']
+            for entry in entries:
+                if 'day' not in entry:
+                    created_at = entry['created_at']
+                    if created_at.tzinfo is not None:
+                        created_at = created_at.astimezone(timezone.utc)
+                    entry['day'] = created_at.strftime('%Y-%m-%d')
+                    updated += 1
+            # Only write back if no entry was added to the bucket meanwhile
+            db.mood_entry_buckets.update_one(
+                {'_id': bucket['_id'], 'count': bucket['count']},
+                {'$set': {'entries': entries}}
+            )
+        return updated
+
+    @staticmethod
+    def unwind_pipeline(fields=('mood', 'intensity')) -> list:
+        """Aggregation stages that turn buckets back into one document per entry.
+
+        Each output document has user_id, date and the given entry fields.
+        """
+        projection = {'_id': '$entries._id', 'user_id': 1, 'date': '$entries.created_at'}
+        projection.update({field: f'$entries.{field}' for field in fields})
+        return [{'$unwind': '$entries'}, {'$project': projection}]
+
+    @staticmethod
+    def migrate_to_buckets(db, batch_size: int = 1000) -> int:
+        """Copy every mood_entries document into mood_entry_buckets. Returns the number of entries copied.
+
+        Reads entries in index order (user, newest first) so each user's months
+        arrive contiguously and buckets can be assembled in a single pass.
+        """
+        def make_bucket(user_id, month, entries):
+            return {
+                'user_id': user_id,
+                'month': month,
+                'count': len(entries),
+                'first': min(entry['created_at'] for entry in entries),
+                'last': max(entry['created_at'] for entry in entries),
+                'updated_at': max(entry.get('updated_at') or entry['created_at'] for entry in entries),
+                'entries': entries
+            }
+
+        copied = 0
+        pending, pending_entries = [], 0
+        current_key, entries = None, []
+        docs = db.mood_entries.find({'created_at': {'$type': 'date'}}).sort(
+            [('user_id', 1), ('created_at', -1), ('_id', -1)]
+        ).batch_size(batch_size)
+
+        for doc in docs:
+            key = (doc['user_id'], month_key(doc['created_at']))
+            if key != current_key or len(entries) >= BUCKET_SIZE:
+                if entries:
+                    pending.append(make_bucket(current_key[0], current_key[1], entries))
+                    pending_entries += len(entries)
+                current_key, entries = key, []
+            entries.append(MoodBucketStore.pack(doc))
+            copied += 1
+            if pending_entries >= batch_size:
+                db.mood_entry_buckets.insert_many(pending, ordered=False)
+                pending, pending_entries = [], 0
+
+        if entries:
+            pending.append(make_bucket(current_key[0], current_key[1], entries))
+        if pending:
+            db.mood_entry_buckets.insert_many(pending, ordered=False)
+        return copied
+
+    @staticmethod
+    def migrate_to_documents(db, batch_size: int = 1000) -> int:
+        """Copy every bucketed entry back into mood_entries. Returns the number of entries copied."""
+        copied = 0
+        pending = []
+        for bucket in db.mood_entry_buckets.find().batch_size(max(1, batch_size // BUCKET_SIZE)):
+            for entry in bucket.get('entries', []):
+                pending.append(MoodBucketStore.unpack(bucket['user_id'], entry))
+            if len(pending) >= batch_size:
+                db.mood_entries.insert_many(pending, ordered=False)
+                copied += len(pending)
+                pending = []
+        if pending:
+            db.mood_entries.insert_many(pending, ordered=False)
+            copied += len(pending)
+        return copied
+
+    @staticmethod
+    def ensure_indexes(db):
+        """Bucket lookup by user and month, and by time range for date queries"""
+        db.mood_entry_buckets.create_index([('user_id', 1), ('month', -1), ('_id', -1)])
+        db.mood_entry_buckets.create_index([('user_id', 1), ('first', 1), ('last', 1)])
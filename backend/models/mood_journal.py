@@ -1,11 +1,56 @@
-from datetime import datetime, timezone
+import logging
+import os
+from datetime import datetime, timedelta, timezone
 from bson.objectid import ObjectId
 from flask import g
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from models.pagination import keyset_filter, split_page
+from models.projection import apply_projection, build_projection
+from models.mood_buckets import MoodBucketStore
+from models.sync import Tombstone, utcnow
+
+try:
+    from config import config
+    MOOD_STORAGE_LAYOUT = config.MOOD_STORAGE_LAYOUT
+except ModuleNotFoundError:
+    MOOD_STORAGE_LAYOUT = os.getenv("MOOD_STORAGE_LAYOUT", "documents")
+
+MAX_STATS_DAYS = 365
+
+def day_key(moment: datetime) -> str:
+    """Calendar day of a timestamp as 'YYYY-MM-DD' in UTC; naive datetimes are taken as UTC"""
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc)
+    return moment.strftime('%Y-%m-%d')
+
+def local_day(moment: datetime) -> str:
+    """Calendar day of a timestamp as 'YYYY-MM-DD' in its own UTC offset, i.e. the user's local date"""
+    return moment.strftime('%Y-%m-%d')
+
+def month_days(month: str):
+    """First and last day keys of a 'YYYY-MM' month. Raises ValueError if malformed."""
+    first = datetime.strptime(month, '%Y-%m')
+    following = (first + timedelta(days=32)).replace(day=1)
+    return local_day(first), local_day(following - timedelta(days=1))
+
+def _mood_field(mood: str) -> str:
+    """Mood names become field names in rollup documents, so strip what MongoDB can't store"""
+    return mood.replace('.', '_').lstrip('$') or '_'
+
+def _bucketed() -> bool:
+    """True when mood entries live in monthly buckets (MOOD_STORAGE_LAYOUT=buckets)"""
+    return MOOD_STORAGE_LAYOUT == 'buckets'
 
 class MoodEntry:
+    # Fields clients may ask for with fields=; _id is always returned
+    FIELDS = ('user_id', 'mood', 'intensity', 'description', 'note', 'created_at', 'date', 'day',
+              'updated_at', 'client_id', 'daily')
+
     @staticmethod
-    def create(user_id: str, mood: str, intensity: int, description: str = None, note: str = None, mood_date: datetime = None):
-        """Create a new mood entry"""
+    def create(user_id: str, mood: str, intensity: int, description: str = None, note: str = None,
+               mood_date: datetime = None, day: str = None):
+        """Create a new mood entry. day defaults to the local date of mood_date."""
         # Use provided date or UTC time to ensure consistent date handling across timezones
         if mood_date is None:
             now = datetime.now(timezone.utc)
@@ -19,62 +64,434 @@ class MoodEntry:
             'description': description, 
             'note': note,
             'created_at': now,
-            'date': now
+            'date': now,
+            'day': day or local_day(now),
+            'updated_at': utcnow()
         }
-        result = g.db.mood_entries.insert_one(mood_data)
-        return str(result.inserted_id)
+        if _bucketed():
+            entry_id = MoodBucketStore.insert(g.db, mood_data)
+        else:
+            entry_id = g.db.mood_entries.insert_one(mood_data).inserted_id
+        MoodRollup.record(user_id, mood_data['day'], mood_data['mood'], intensity)
+        return str(entry_id)
+
+    @staticmethod
+    def create_many(user_id: str, entries: list):
+        """Insert a batch of validated entries, each carrying a client-generated client_id.
+
+        Entries whose client_id this user already stored are reported as
+        duplicates instead of being written again, so a client can safely
+        replay a batch. Returns [(client_id, status, mood_id)] in input order,
+        with status 'created', 'duplicate' or 'failed'.
+        """
+        user_oid = ObjectId(user_id)
+        docs = []
+        for entry in entries:
+            moment = entry.get('mood_date') or datetime.now(timezone.utc)
+            docs.append({
+                '_id': ObjectId(),
+                'user_id': user_oid,
+                'client_id': entry['client_id'],
+                'mood': entry['mood'].lower(),
+                'intensity': entry['intensity'],
+                'description': entry.get('description'),
+                'note': entry.get('note'),
+                'created_at': moment,
+                'date': moment,
+                'day': entry.get('day') or local_day(moment),
+                'updated_at': utcnow()
+            })
+
+        if _bucketed():
+            failed, duplicates = set(), MoodBucketStore.insert_many(g.db, user_oid, docs)
+        else:
+            failed, duplicates = set(), {}
+            try:
+                g.db.mood_entries.insert_many(docs, ordered=False)
+            except BulkWriteError as e:
+                rejected = [docs[error['index']]['client_id'] for error in e.details.get('writeErrors', [])
+                            if error.get('code') == 11000]
+                failed = {docs[error['index']]['client_id'] for error in e.details.get('writeErrors', [])
+                          if error.get('code') != 11000}
+                if rejected:
+                    existing = g.db.mood_entries.find(
+                        {'user_id': user_oid, 'client_id': {'$in': rejected}}, {'client_id': 1}
+                    )
+                    duplicates = {doc['client_id']: doc['_id'] for doc in existing}
+                    # A duplicate key on some other unique index: nothing was stored for it
+                    failed.update(client_id for client_id in rejected if client_id not in duplicates)
+
+        results = []
+        created = []
+        for doc in docs:
+            client_id = doc['client_id']
+            if client_id in duplicates:
+                results.append((client_id, 'duplicate', str(duplicates[client_id])))
+            elif client_id in failed:
+                results.append((client_id, 'failed', None))
+            else:
+                results.append((client_id, 'created', str(doc['_id'])))
+                created.append(doc)
+
+        try:
+            MoodRollup.record_many(user_id, created)
+        except Exception as e:
+            # The entries are stored and a retry would report them as duplicates, so answer anyway
+            logging.error(f"Could not count {len(created)} bulk entries in the rollups of user {user_id}, "
+                          f"run backfill_mood_rollups.py --user-id {user_id}: {e}")
+        return results
+
+    @staticmethod
+    def upsert_daily(user_id: str, mood: str, intensity: int, description: str = None, note: str = None,
+                     mood_date: datetime = None, day: str = None):
+        """Create or replace the user's single "one entry per day" mood for a day.
+
+        Entries written this way are unique per (user_id, day); ordinary
+        entries logged through create() on the same day are left alone.
+        Returns (mood_id, created).
+        """
+        now = mood_date or datetime.now(timezone.utc)
+        day = day or local_day(now)
+        fields = {
+            'mood': mood.lower(),
+            'intensity': intensity,
+            'description': description,
+            'note': note,
+            'created_at': now,
+            'date': now,
+            'updated_at': utcnow()
+        }
+
+        if _bucketed():
+            entry_id, previous = MoodBucketStore.upsert_daily(g.db, user_id, day, fields)
+        else:
+            query = {'user_id': ObjectId(user_id), 'day': day, 'daily': True}
+            update = {'$set': fields, '$setOnInsert': {'_id': ObjectId()}}
+            try:
+                previous = g.db.mood_entries.find_one_and_update(
+                    query, update, upsert=True, return_document=ReturnDocument.BEFORE
+                )
+            except DuplicateKeyError:
+                # A concurrent request inserted the day's entry first; replace it instead
+                previous = g.db.mood_entries.find_one_and_update(
+                    query, {'$set': fields}, return_document=ReturnDocument.BEFORE
+                )
+            entry_id = previous['_id'] if previous else update['$setOnInsert']['_id']
+
+        if previous:
+            MoodRollup.record(user_id, day, previous['mood'], previous['intensity'], count=-1)
+        MoodRollup.record(user_id, day, fields['mood'], intensity)
+        return str(entry_id), previous is None
 
     @staticmethod
-    def get_user_moods(user_id: str, limit: int = 30):
+    def delete(user_id: str, mood_id: str):
+        """Delete one of the user's mood entries. Returns False if it doesn't exist."""
+        deleted_at = utcnow()
+        if _bucketed():
+            entry = MoodBucketStore.delete(g.db, user_id, mood_id, deleted_at)
+        else:
+            entry = g.db.mood_entries.find_one_and_delete(
+                {'_id': ObjectId(mood_id), 'user_id': ObjectId(user_id)},
+                projection={'mood': 1, 'intensity': 1, 'day': 1, 'created_at': 1}
+            )
+        if entry is None:
+            return False
+
+        MoodRollup.record(user_id, entry.get('day') or day_key(entry['created_at']),
+                          entry['mood'], entry['intensity'], count=-1)
+        Tombstone.record(user_id, 'moods', mood_id, deleted_at)
+        return True
+
+    @staticmethod
+    def get_user_moods(user_id: str, limit: int = 30, fields: list = None):
         """Get user's mood history"""
+        if _bucketed():
+            return MoodEntry.get_user_moods_page(user_id, limit, fields=fields)[0]
         cursor = g.db.mood_entries.find(
-            {'user_id': ObjectId(user_id)}
+            {'user_id': ObjectId(user_id)}, build_projection(fields)
         ).sort('created_at', -1).limit(limit)
         return list(cursor)
 
     @staticmethod
-    def get_mood_by_date(user_id: str, date):
-        """Get mood entry for a specific date"""
-        if hasattr(date, 'date'):
-            date_to_find = date.replace(hour=0, minute=0, second=0, microsecond=0)
-        else:
-            date_to_find = datetime.combine(date, datetime.min.time())
+    def get_user_moods_page(user_id: str, limit: int = 30, cursor: str = None, fields: list = None):
+        """Get one page of a user's mood history, newest first.
+
+        Returns (moods, next_cursor); next_cursor is None on the last page.
+        fields limits the returned fields (created_at is kept for the cursor).
+        """
+        projection = build_projection(fields, required=('created_at',))
+        if _bucketed():
+            return MoodBucketStore.get_user_moods_page(g.db, user_id, limit, cursor, projection)
         
-        return g.db.mood_entries.find_one({
-            'user_id': ObjectId(user_id),
-            'date': date_to_find
-        })
+        query = {'user_id': ObjectId(user_id)}
+        if cursor:
+            query.update(keyset_filter(cursor))
+        
+        docs = g.db.mood_entries.find(query, projection).sort(
+            [('created_at', -1), ('_id', -1)]
+        ).limit(limit + 1)
+        return split_page(list(docs), limit)
 
     @staticmethod
-    def get_mood_stats(user_id: str, days: int = 7):
-        """Get mood statistics for the last N days"""
-        from datetime import timedelta
-        start_date = datetime.now(timezone.utc) - timedelta(days=days)
-        
-        pipeline = [
-            {
-                '$match': {
-                    'user_id': ObjectId(user_id),
-                    'date': {'$gte': start_date}
-                }
-            },
-            {
-                '$group': {
-                    '_id': '$mood',
-                    'count': {'$sum': 1},
-                    'avg_intensity': {'$avg': '$intensity'}
-                }
+    def iter_user_moods(user_id: str, batch_size: int = 500, fields: list = None):
+        """Iterate over a user's whole mood history, newest first, without loading it into memory"""
+        projection = build_projection(fields)
+        if _bucketed():
+            return MoodBucketStore.iter_user_moods(g.db, user_id, projection=projection)
+        return g.db.mood_entries.find(
+            {'user_id': ObjectId(user_id)}, projection
+        ).sort([('created_at', -1), ('_id', -1)]).batch_size(batch_size)
+
+    @staticmethod
+    def ensure_indexes(db):
+        """Create the indexes used by mood history, by-day and calendar queries"""
+        if _bucketed():
+            MoodBucketStore.ensure_indexes(db)
+        else:
+            db.mood_entries.create_index([('user_id', 1), ('created_at', -1), ('_id', -1)])
+            db.mood_entries.create_index([('user_id', 1), ('day', 1), ('created_at', 1)])
+            # Replayed offline batches are recognised by their client-generated ids
+            db.mood_entries.create_index(
+                [('user_id', 1), ('client_id', 1)], unique=True,
+                partialFilterExpression={'client_id': {'$exists': True}}
+            )
+            # At most one "one entry per day" mood per user and day
+            db.mood_entries.create_index(
+                [('user_id', 1), ('day', 1)], unique=True,
+                partialFilterExpression={'daily': True}
+            )
+
+    @staticmethod
+    def get_mood_by_date(user_id: str, date, fields: list = None):
+        """Get the latest mood entry for a day (a date, datetime or 'YYYY-MM-DD' day key)"""
+        day = date if isinstance(date, str) else local_day(date)
+        projection = build_projection(fields)
+        if _bucketed():
+            entries = MoodBucketStore.find_days(g.db, user_id, day, day)
+            return apply_projection(entries[-1], projection) if entries else None
+        return g.db.mood_entries.find_one(
+            {'user_id': ObjectId(user_id), 'day': day},
+            projection,
+            sort=[('created_at', -1)]
+        )
+
+    @staticmethod
+    def get_calendar(user_id: str, month: str):
+        """Map each day of a 'YYYY-MM' month to the user's latest mood that day, with one range query"""
+        first_day, last_day = month_days(month)
+        if _bucketed():
+            entries = MoodBucketStore.find_days(g.db, user_id, first_day, last_day)
+        else:
+            entries = g.db.mood_entries.find(
+                {'user_id': ObjectId(user_id), 'day': {'$gte': first_day, '$lte': last_day}},
+                {'day': 1, 'mood': 1, 'intensity': 1, 'created_at': 1}
+            ).sort([('day', 1), ('created_at', 1)])
+
+        calendar = {}
+        for entry in entries:
+            day = calendar.get(entry['day'])
+            calendar[entry['day']] = {
+                'mood_id': str(entry['_id']),
+                'mood': entry['mood'],
+                'intensity': entry['intensity'],
+                'entries': day['entries'] + 1 if day else 1
             }
+        return calendar
+
+    @staticmethod
+    def backfill_day_keys(db, batch_size: int = 1000) -> int:
+        """Add the day key to entries written before it existed (UTC date of created_at). Returns entries updated."""
+        if _bucketed():
+            return MoodBucketStore.backfill_day_keys(db)
+
+        updated = 0
+        operations = []
+        for doc in db.mood_entries.find({'day': {'$exists': False}, 'created_at': {'$type': 'date'}},
+                                        {'created_at': 1}).batch_size(batch_size):
+            operations.append(UpdateOne({'_id': doc['_id']}, {'$set': {'day': day_key(doc['created_at'])}}))
+            if len(operations) >= batch_size:
+                db.mood_entries.bulk_write(operations, ordered=False)
+                updated += len(operations)
+                operations = []
+        if operations:
+            db.mood_entries.bulk_write(operations, ordered=False)
+            updated += len(operations)
+        return updated
+
+    @staticmethod
+    def get_mood_stats(user_id: str, days: int = 7):
+        """Get mood statistics for the last N days (read from the daily rollups)"""
+        return MoodRollup.get_stats(user_id, days)
+
+class MoodRollup:
+    """Per-user, per-day mood counters kept in step with mood_entries.
+
+    One mood_daily_rollups document per (user_id, day) holds the entry count
+    and intensity sum for each mood logged that day, so stats over any period
+    read at most one small document per day instead of every raw entry. Days
+    are the entries' own (user-local) day keys.
+    """
+
+    @staticmethod
+    def record(user_id: str, day: str, mood: str, intensity: int, count: int = 1):
+        """Count a mood entry in its day's rollup (count=-1 takes a replaced entry back out)"""
+        field = _mood_field(mood)
+        query = {'user_id': ObjectId(user_id), 'day': day}
+        update = {'$inc': {
+            'total': count,
+            f'moods.{field}.count': count,
+            f'moods.{field}.intensity_sum': intensity * count
+        }}
+        if count < 0:
+            # Never upsert a decrement: entries logged before the rollup backfill were never counted
+            query[f'moods.{field}.count'] = {'$gte': -count}
+            g.db.mood_daily_rollups.update_one(query, update)
+            return
+        try:
+            g.db.mood_daily_rollups.update_one(query, update, upsert=True)
+        except DuplicateKeyError:
+            # Another request created the day's document first; it exists now
+            g.db.mood_daily_rollups.update_one(query, update)
+
+    @staticmethod
+    def record_many(user_id: str, entries: list):
+        """Count a batch of new entries with one bulk_write, one update per day touched"""
+        per_day = {}
+        for entry in entries:
+            increments = per_day.setdefault(entry['day'], {'total': 0})
+            field = _mood_field(entry['mood'])
+            increments['total'] += 1
+            increments[f'moods.{field}.count'] = increments.get(f'moods.{field}.count', 0) + 1
+            increments[f'moods.{field}.intensity_sum'] = (
+                increments.get(f'moods.{field}.intensity_sum', 0) + entry['intensity']
+            )
+        if not per_day:
+            return
+
+        user_oid = ObjectId(user_id)
+        operations = [
+            UpdateOne({'user_id': user_oid, 'day': day}, {'$inc': increments}, upsert=True)
+            for day, increments in per_day.items()
         ]
-        
-        return list(g.db.mood_entries.aggregate(pipeline))
+        try:
+            g.db.mood_daily_rollups.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            # Upserts that raced with another request's first write of the day: apply them again
+            retry = [operations[error['index']] for error in e.details.get('writeErrors', [])
+                     if error.get('code') == 11000]
+            if len(retry) != len(e.details.get('writeErrors', [])):
+                raise
+            g.db.mood_daily_rollups.bulk_write(retry, ordered=False)
+
+    @staticmethod
+    def get_range(user_id: str, days: int):
+        """Rollup documents for the last N calendar days (today included), oldest first"""
+        start_day = day_key(datetime.now(timezone.utc) - timedelta(days=days - 1))
+        return list(g.db.mood_daily_rollups.find(
+            {'user_id': ObjectId(user_id), 'day': {'$gte': start_day}},
+            {'_id': 0, 'day': 1, 'total': 1, 'moods': 1}
+        ).sort('day', 1))
+
+    @staticmethod
+    def get_stats(user_id: str, days: int = 7):
+        """Count and average intensity per mood over the last N days, most frequent first"""
+        totals = {}
+        for rollup in MoodRollup.get_range(user_id, days):
+            for mood, counters in rollup.get('moods', {}).items():
+                total = totals.setdefault(mood, [0, 0])
+                total[0] += counters.get('count', 0)
+                total[1] += counters.get('intensity_sum', 0)
+
+        stats = [
+            {'_id': mood, 'count': count, 'avg_intensity': intensity_sum / count}
+            for mood, (count, intensity_sum) in totals.items() if count
+        ]
+        return sorted(stats, key=lambda stat: stat['count'], reverse=True)
+
+    @staticmethod
+    def get_daily(user_id: str, days: int = 7):
+        """Per-day entry count and average intensity over the last N days, oldest first"""
+        daily = []
+        for rollup in MoodRollup.get_range(user_id, days):
+            moods = rollup.get('moods', {})
+            intensity_sum = sum(counters.get('intensity_sum', 0) for counters in moods.values())
+            total = rollup.get('total', 0)
+            daily.append({
+                'day': rollup['day'],
+                'count': total,
+                'avg_intensity': intensity_sum / total if total else None,
+                'moods': {mood: counters['count'] for mood, counters in moods.items() if counters.get('count')}
+            })
+        return daily
+
+    @staticmethod
+    def rebuild(db, user_id: str = None, batch_size: int = 1000):
+        """Recompute rollups from mood_entries, for every user or just one.
+
+        Replaces whole day documents, so it is safe to re-run. Returns the
+        number of day documents written.
+        """
+        match = {'date': {'$type': 'date'}}
+        if user_id:
+            match['user_id'] = ObjectId(user_id)
+        if _bucketed():
+            source = db.mood_entry_buckets
+            pipeline = [{'$match': {'user_id': match['user_id']}}] if user_id else []
+            pipeline += MoodBucketStore.unwind_pipeline(('mood', 'intensity', 'day'))
+        else:
+            source = db.mood_entries
+            pipeline = []
+        pipeline += [
+            {'$match': match},
+            {'$group': {
+                '_id': {
+                    'user_id': '$user_id',
+                    'day': {'$ifNull': ['$day', {'$dateToString': {'format': '%Y-%m-%d', 'date': '$date'}}]},
+                    'mood': '$mood'
+                },
+                'count': {'$sum': 1},
+                'intensity_sum': {'$sum': '$intensity'}
+            }},
+            {'$group': {
+                '_id': {'user_id': '$_id.user_id', 'day': '$_id.day'},
+                'total': {'$sum': '$count'},
+                'moods': {'$push': {'mood': '$_id.mood', 'count': '$count', 'intensity_sum': '$intensity_sum'}}
+            }}
+        ]
+
+        written = 0
+        operations = []
+        for group in source.aggregate(pipeline, allowDiskUse=True):
+            moods = {}
+            for counters in group['moods']:
+                merged = moods.setdefault(_mood_field(counters['mood'] or ''), {'count': 0, 'intensity_sum': 0})
+                merged['count'] += counters['count']
+                merged['intensity_sum'] += counters['intensity_sum']
+            operations.append(UpdateOne(
+                {'user_id': group['_id']['user_id'], 'day': group['_id']['day']},
+                {'$set': {'total': group['total'], 'moods': moods}},
+                upsert=True
+            ))
+            if len(operations) >= batch_size:
+                db.mood_daily_rollups.bulk_write(operations, ordered=False)
+                written += len(operations)
+                operations = []
+        if operations:
+            db.mood_daily_rollups.bulk_write(operations, ordered=False)
+            written += len(operations)
+        return written
+
+    @staticmethod
+    def ensure_indexes(db):
+        """One rollup document per user per day, range-scanned by day"""
+        db.mood_daily_rollups.create_index([('user_id', 1), ('day', 1)], unique=True)
 
 class Recommendation:
     @staticmethod
-    def create(user_id: str, mood: str, activity_type: str, title: str, description: str, 
-               url: str = None, category: str = None):
-        """Create a new recommendation"""
-        recommendation_data = {
+    def build(user_id: str, mood: str, activity_type: str, title: str, description: str,
+              url: str = None, category: str = None) -> dict:
+        """The document create() inserts; shared with the async handler in asgi.py"""
+        return {
             'user_id': ObjectId(user_id),
             'mood': mood.lower(),
             'activity_type': activity_type,  
@@ -87,24 +504,30 @@ class Recommendation:
             'dislikes': 0,
             'feedback_count': 0
         }
+
+    @staticmethod
+    def create(user_id: str, mood: str, activity_type: str, title: str, description: str, 
+               url: str = None, category: str = None):
+        """Create a new recommendation"""
+        recommendation_data = Recommendation.build(user_id, mood, activity_type, title, description, url, category)
         result = g.db.recommendations.insert_one(recommendation_data)
         return str(result.inserted_id)
 
     @staticmethod
-    def get_recommendations_for_mood(mood: str, activity_type: str = None, limit: int = 5):
+    def get_recommendations_for_mood(mood: str, activity_type: str = None, limit: int = 5, fields: list = None):
         """Get recommendations for a specific mood"""
         query = {'mood': mood.lower()}
         if activity_type:
             query['activity_type'] = activity_type
             
-        cursor = g.db.recommendations.find(query).sort('likes', -1).limit(limit)
+        cursor = g.db.recommendations.find(query, build_projection(fields)).sort('likes', -1).limit(limit)
         return list(cursor)
 
     @staticmethod
-    def get_by_id(recommendation_id: str):
+    def get_by_id(recommendation_id: str, fields: list = None):
         """Get a recommendation by ID"""
         try:
-            return g.db.recommendations.find_one({'_id': ObjectId(recommendation_id)})
+            return g.db.recommendations.find_one({'_id': ObjectId(recommendation_id)}, build_projection(fields))
         except:
             return None
 
@@ -128,11 +551,37 @@ class Recommendation:
         )
 
     @staticmethod
-    def get_user_feedback_history(user_id: str):
+    def get_user_feedback_history(user_id: str, fields: list = None):
         """Get user's feedback history"""
-        return list(g.db.user_feedback.find({'user_id': ObjectId(user_id)}))
+        return list(g.db.user_feedback.find({'user_id': ObjectId(user_id)}, build_projection(fields)))
+
+    @staticmethod
+    def get_user_feedback_history_page(user_id: str, limit: int = 50, cursor: str = None, fields: list = None):
+        """Get one page of a user's feedback history, newest first.
+
+        Returns (feedback, next_cursor); next_cursor is None on the last page.
+        fields limits the returned fields (created_at is kept for the cursor).
+        """
+        query = {'user_id': ObjectId(user_id)}
+        if cursor:
+            query.update(keyset_filter(cursor))
+        
+        docs = g.db.user_feedback.find(query, build_projection(fields, required=('created_at',))).sort(
+            [('created_at', -1), ('_id', -1)]
+        ).limit(limit + 1)
+        return split_page(list(docs), limit)
+
+    @staticmethod
+    def iter_user_feedback_history(user_id: str, batch_size: int = 500, fields: list = None):
+        """Iterate over a user's whole feedback history, newest first, without loading it into memory"""
+        return g.db.user_feedback.find(
+            {'user_id': ObjectId(user_id)}, build_projection(fields)
+        ).sort([('created_at', -1), ('_id', -1)]).batch_size(batch_size)
 
 class UserFeedback:
+    # Fields clients may ask for with fields=; _id is always returned
+    FIELDS = ('user_id', 'recommendation_id', 'liked', 'mood', 'created_at', 'updated_at')
+
     @staticmethod
     def create(user_id: str, recommendation_id: str, liked: bool, mood: str):
         """Create user feedback record"""
@@ -141,7 +590,13 @@ class UserFeedback:
             'recommendation_id': ObjectId(recommendation_id),
             'liked': liked,
             'mood': mood.lower(),
-            'created_at': datetime.now(timezone.utc)
+            'created_at': datetime.now(timezone.utc),
+            'updated_at': utcnow()
         }
         result = g.db.user_feedback.insert_one(feedback_data)
-        return str(result.inserted_id) 
\ No newline at end of file
+        return str(result.inserted_id)
+
+    @staticmethod
+    def ensure_indexes(db):
+        """Create the indexes used by feedback history queries"""
+        db.user_feedback.create_index([('user_id', 1), ('created_at', -1), ('_id', -1)]) 
\ No newline at end of file
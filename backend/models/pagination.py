@@ -0,0 +1,37 @@
+import base64
+import json
+from datetime import datetime
+from bson import ObjectId
+from bson.errors import InvalidId
+
+def encode_cursor(sort_value: datetime, doc_id) -> str:
+    """Encode the (sort_value, _id) position of the last document on a page as an opaque token"""
+    payload = json.dumps({'t': sort_value.isoformat(), 'id': str(doc_id)}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str):
+    """Decode a token from encode_cursor into (sort_value, ObjectId). Raises ValueError if malformed."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return datetime.fromisoformat(payload['t']), ObjectId(payload['id'])
+    except (ValueError, TypeError, KeyError, InvalidId, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def keyset_filter(cursor: str, sort_field: str = 'created_at', id_field: str = '_id') -> dict:
+    """Build the filter selecting documents strictly after the cursor in (sort_field, id_field) descending order"""
+    sort_value, doc_id = decode_cursor(cursor)
+    return {
+        '$or': [
+            {sort_field: {'$lt': sort_value}},
+            {sort_field: sort_value, id_field: {'$lt': doc_id}}
+        ]
+    }
+
+def split_page(docs: list, limit: int, sort_field: str = 'created_at', id_field: str = '_id'):
+    """Trim a limit+1 result to one page and return (page, next_cursor or None)"""
+    if len(docs) <= limit:
+        return docs, None
+    page = docs[:limit]
+    last = page[-1]
+    return page, encode_cursor(last[sort_field], last[id_field])
@@ -0,0 +1,25 @@
+def build_projection(fields, required=()) -> dict:
+    """Inclusion projection for the given top-level fields, plus any the query itself needs.
+
+    Returns None for an empty field list, meaning the whole document. _id is
+    always returned, as with any MongoDB inclusion projection.
+    """
+    if not fields:
+        return None
+    projection = dict.fromkeys(fields, 1)
+    projection.update(dict.fromkeys(required, 1))
+    return projection
+
+def apply_projection(doc: dict, projection: dict) -> dict:
+    """Apply an inclusion projection to a document assembled in Python"""
+    if projection is None:
+        return doc
+    return {key: value for key, value in doc.items() if key == '_id' or projection.get(key)}
+
+def parse_fields(value: str, allowed) -> list:
+    """Parse a comma-separated fields= parameter. Raises ValueError on fields not in allowed."""
+    fields = [field.strip() for field in (value or '').split(',') if field.strip()]
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(allowed)}")
+    return fields
@@ -0,0 +1,193 @@
+import base64
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from bson.errors import InvalidId
+from flask import g
+from pymongo import UpdateOne
+from models.mood_buckets import MoodBucketStore
+
+try:
+    from config import config
+    SYNC_PAGE_SIZE = config.SYNC_PAGE_SIZE
+    SYNC_OVERLAP_SECONDS = config.SYNC_OVERLAP_SECONDS
+    SYNC_TOMBSTONE_DAYS = config.SYNC_TOMBSTONE_DAYS
+except ModuleNotFoundError:
+    SYNC_PAGE_SIZE = int(os.getenv("SYNC_PAGE_SIZE", "200"))
+    SYNC_OVERLAP_SECONDS = float(os.getenv("SYNC_OVERLAP_SECONDS", "5"))
+    SYNC_TOMBSTONE_DAYS = int(os.getenv("SYNC_TOMBSTONE_DAYS", "30"))
+
+# Sync stream name -> collection holding the user's documents (user_id = owner)
+STREAMS = {
+    'moods': 'mood_entries',
+    'posts': 'community_posts',
+    'comments': 'post_comments',
+    'feedback': 'user_feedback',
+    'deleted': 'sync_tombstones'
+}
+
+def utcnow() -> datetime:
+    """Naive UTC now, the form MongoDB hands datetimes back in"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+class Tombstone:
+    """Records of deleted documents, kept SYNC_TOMBSTONE_DAYS so delta sync can report deletions"""
+
+    @staticmethod
+    def record(user_id, stream: str, doc_id, deleted_at: datetime = None):
+        """Note that a document in a sync stream was deleted, for the owning user"""
+        Tombstone.record_many([(user_id, stream, doc_id)], deleted_at)
+
+    @staticmethod
+    def record_many(deletions, deleted_at: datetime = None):
+        """Record (user_id, stream, doc_id) deletions with one bulk write"""
+        deleted_at = deleted_at or utcnow()
+        operations = [
+            UpdateOne(
+                {'user_id': ObjectId(user_id), 'type': stream, 'doc_id': ObjectId(doc_id)},
+                {'$set': {'updated_at': deleted_at}},
+                upsert=True
+            )
+            for user_id, stream, doc_id in deletions
+        ]
+        if operations:
+            g.db.sync_tombstones.bulk_write(operations, ordered=False)
+
+    @staticmethod
+    def ensure_indexes(db):
+        db.sync_tombstones.create_index([('user_id', 1), ('type', 1), ('doc_id', 1)], unique=True)
+        db.sync_tombstones.create_index([('user_id', 1), ('updated_at', 1), ('_id', 1)])
+        db.sync_tombstones.create_index('updated_at', expireAfterSeconds=SYNC_TOMBSTONE_DAYS * 86400)
+
+def encode_sync_token(state: dict) -> str:
+    """Opaque token for a sync position"""
+    payload = json.dumps(state, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_sync_token(token: str) -> dict:
+    """Decode a token from encode_sync_token. Raises ValueError if malformed."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        since = datetime.fromisoformat(state['since']) if state.get('since') else None
+        positions = {
+            stream: (datetime.fromisoformat(pos[0]), ObjectId(pos[1])) if pos else None
+            for stream, pos in state.get('pos', {}).items() if stream in STREAMS
+        }
+        round_start = datetime.fromisoformat(state['next']) if state.get('next') else None
+        return {'since': since, 'next': round_start, 'pos': positions if 'pos' in state else None}
+    except (ValueError, TypeError, KeyError, InvalidId, UnicodeError, AttributeError) as e:
+        raise ValueError(f"Invalid sync token: {token}") from e
+
+class ChangeFeed:
+    """Per-user delta sync over moods, posts, comments, feedback and deletions.
+
+    Every synced document carries updated_at (app server time of its last
+    change) and an index on (user_id, updated_at, _id), so "what changed
+    since T" is an index range scan per stream. A sync round pages each
+    stream in (updated_at, _id) order; once every stream is drained the
+    client gets a token for the round's start time. New rounds start
+    SYNC_OVERLAP_SECONDS early to absorb clock skew between app servers,
+    so clients should upsert by _id and expect occasional repeats.
+    """
+
+    @staticmethod
+    def changes(user_id: str, token: str = None, limit: int = None):
+        """Return ({stream: docs}, next_token, has_more, reset). Raises ValueError on a bad token."""
+        limit = limit or SYNC_PAGE_SIZE
+        state = decode_sync_token(token) if token else {'since': None, 'next': None, 'pos': None}
+        since = state['since']
+        reset = False
+        if since is not None and since < utcnow() - timedelta(days=SYNC_TOMBSTONE_DAYS):
+            # Deletions older than this are gone, so the client must start over
+            since, reset = None, True
+            state['pos'] = None
+
+        if state['pos'] is None:
+            round_start = utcnow()
+            lower = since - timedelta(seconds=SYNC_OVERLAP_SECONDS) if since else None
+            positions = {stream: (lower, None) for stream in STREAMS}
+            if since is None:
+                # A full download has nothing to delete on the client
+                positions.pop('deleted')
+        else:
+            round_start = state['next']
+            positions = {stream: pos for stream, pos in state['pos'].items() if pos is not None}
+
+        results = {stream: [] for stream in STREAMS}
+        pending = {}
+        for stream, position in positions.items():
+            docs = ChangeFeed._fetch(stream, user_id, position, limit + 1)
+            if len(docs) > limit:
+                docs = docs[:limit]
+                pending[stream] = [docs[-1]['updated_at'].isoformat(), str(docs[-1]['_id'])]
+            results[stream] = docs
+
+        if pending:
+            next_state = {
+                'since': since.isoformat() if since else None,
+                'next': round_start.isoformat(),
+                'pos': {stream: pending.get(stream) for stream in STREAMS}
+            }
+        else:
+            next_state = {'since': round_start.isoformat()}
+        return results, encode_sync_token(next_state), bool(pending), reset
+
+    @staticmethod
+    def _fetch(stream: str, user_id: str, position, limit: int):
+        """Documents of one stream strictly after (updated_at, _id), oldest change first"""
+        after_time, after_id = position
+        if stream == 'moods':
+            from models.mood_journal import _bucketed
+            if _bucketed():
+                return MoodBucketStore.changed_since(g.db, user_id, after_time, after_id, limit)
+
+        query = {'user_id': ObjectId(user_id)}
+        if after_time is not None and after_id is not None:
+            query['$or'] = [
+                {'updated_at': {'$gt': after_time}},
+                {'updated_at': after_time, '_id': {'$gt': after_id}}
+            ]
+        elif after_time is not None:
+            query['updated_at'] = {'$gt': after_time}
+        else:
+            query['updated_at'] = {'$type': 'date'}
+
+        return list(g.db[STREAMS[stream]].find(query).sort(
+            [('updated_at', 1), ('_id', 1)]
+        ).limit(limit))
+
+    @staticmethod
+    def backfill_updated_at(db) -> dict:
+        """Stamp updated_at = created_at on documents written before change tracking. Returns counts per collection."""
+        counts = {}
+        for stream, collection in STREAMS.items():
+            if stream == 'deleted':
+                continue
+            updated = 0
+            operations = []
+            for doc in db[collection].find({'updated_at': {'$exists': False}}, {'created_at': 1}):
+                operations.append(UpdateOne(
+                    {'_id': doc['_id']},
+                    {'$set': {'updated_at': doc.get('created_at') or utcnow()}}
+                ))
+                if len(operations) >= 1000:
+                    db[collection].bulk_write(operations, ordered=False)
+                    updated += len(operations)
+                    operations = []
+            if operations:
+                db[collection].bulk_write(operations, ordered=False)
+                updated += len(operations)
+            counts[collection] = updated
+        counts['mood_entry_buckets'] = MoodBucketStore.backfill_updated_at(db)
+        return counts
+
+    @staticmethod
+    def ensure_indexes(db):
+        """(user_id, updated_at, _id) on every synced collection, plus the tombstones"""
+        for stream, collection in STREAMS.items():
+            if stream != 'deleted':
+                db[collection].create_index([('user_id', 1), ('updated_at', 1), ('_id', 1)])
+        db.mood_entry_buckets.create_index([('user_id', 1), ('updated_at', 1)])
+        Tombstone.ensure_indexes(db)
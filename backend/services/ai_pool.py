@@ -0,0 +1,181 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from services.mood_ai_service import MoodAIService
+
+try:
+    from config import config
+    AI_POOL_MAX_CONCURRENT = config.AI_POOL_MAX_CONCURRENT
+    AI_POOL_MAX_PENDING = config.AI_POOL_MAX_PENDING
+    AI_POOL_TIMEOUT_SECONDS = config.AI_POOL_TIMEOUT_SECONDS
+    AI_POOL_SATURATED = config.AI_POOL_SATURATED
+except ModuleNotFoundError:
+    AI_POOL_MAX_CONCURRENT = int(os.getenv("AI_POOL_MAX_CONCURRENT", "4"))
+    AI_POOL_MAX_PENDING = int(os.getenv("AI_POOL_MAX_PENDING", "2"))
+    AI_POOL_TIMEOUT_SECONDS = float(os.getenv("AI_POOL_TIMEOUT_SECONDS", "25"))
+    AI_POOL_SATURATED = os.getenv("AI_POOL_SATURATED", "degrade")
+
+class AIBusyError(Exception):
+    """Raised when the AI pool is saturated or too slow and the caller should retry later"""
+
+class AIExecutor:
+    """Bulkhead for LLM calls.
+
+    A /recommend request holds its worker thread for as long as OpenRouter
+    takes to answer, so a slow model could otherwise tie up every thread and
+    leave the feed and /health queueing behind it. Calls run on one event
+    loop thread per process, at most max_concurrent at a time; up to
+    max_pending more wait for a slot, and anything beyond that (or waiting
+    longer than timeout) raises AIBusyError straight away. That bounds the
+    threads AI traffic can hold to max_concurrent + max_pending. With
+    max_concurrent set to 0, calls run inline without limits.
+    """
+
+    def __init__(self, max_concurrent: int = AI_POOL_MAX_CONCURRENT, max_pending: int = AI_POOL_MAX_PENDING,
+                 timeout: float = AI_POOL_TIMEOUT_SECONDS):
+        self.max_concurrent = max_concurrent
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max(1, max_concurrent + max_pending))
+        self._loop = None
+        self._loop_pid = None
+        self._running = None
+        self._lock = threading.Lock()
+        self._stats = {
+            'completed': 0,
+            'failed': 0,
+            'rejected': 0,
+            'timed_out': 0,
+            'degraded': 0,
+            'queue_wait_seconds_total': 0.0,
+            'queue_wait_seconds_max': 0.0,
+            'call_seconds_total': 0.0,
+            'call_seconds_max': 0.0
+        }
+
+    def submit(self, coro_fn, *args):
+        """Schedule coro_fn(*args) on the AI loop; returns a concurrent.futures.Future"""
+        if not self._slots.acquire(blocking=False):
+            self.count('rejected')
+            raise AIBusyError("AI recommendation queue is full")
+
+        try:
+            future = asyncio.run_coroutine_threadsafe(self._call(coro_fn, args, time.time()), self._get_loop())
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def run(self, coro_fn, *args):
+        """Run coro_fn(*args) on the AI loop and wait for the result, from a request thread"""
+        if self.max_concurrent <= 0:
+            return asyncio.run(coro_fn(*args))
+
+        future = self.submit(coro_fn, *args)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            self.count('timed_out')
+            raise AIBusyError("AI recommendation timed out")
+
+    async def run_async(self, coro_fn, *args):
+        """run() for async handlers: awaits the result without blocking the caller's loop"""
+        if self.max_concurrent <= 0:
+            return await coro_fn(*args)
+
+        future = self.submit(coro_fn, *args)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            self.count('timed_out')
+            raise AIBusyError("AI recommendation timed out")
+
+    async def _call(self, coro_fn, args, submitted_at: float):
+        # Created on first use so it belongs to this loop
+        if self._running is None:
+            self._running = asyncio.Semaphore(self.max_concurrent)
+        async with self._running:
+            started_at = time.time()
+            try:
+                result = await coro_fn(*args)
+            except Exception:
+                self.count('failed')
+                raise
+            self._record(started_at - submitted_at, time.time() - started_at)
+            return result
+
+    def count(self, outcome: str):
+        with self._lock:
+            self._stats[outcome] += 1
+
+    def _record(self, queue_wait: float, call_seconds: float):
+        with self._lock:
+            self._stats['completed'] += 1
+            self._stats['queue_wait_seconds_total'] += queue_wait
+            self._stats['queue_wait_seconds_max'] = max(self._stats['queue_wait_seconds_max'], queue_wait)
+            self._stats['call_seconds_total'] += call_seconds
+            self._stats['call_seconds_max'] = max(self._stats['call_seconds_max'], call_seconds)
+
+    def stats(self):
+        """Queue wait, call time and rejection counters for this worker"""
+        with self._lock:
+            stats = dict(self._stats)
+        completed = stats['completed']
+        stats['max_concurrent'] = self.max_concurrent
+        stats['queue_wait_seconds_avg'] = stats['queue_wait_seconds_total'] / completed if completed else 0
+        stats['call_seconds_avg'] = stats['call_seconds_total'] / completed if completed else 0
+        return stats
+
+    def _get_loop(self):
+        # Started lazily and per process, so each forked gunicorn worker gets its own loop thread
+        with self._lock:
+            if self._loop is None or self._loop_pid != os.getpid():
+                self._loop = asyncio.new_event_loop()
+                self._loop_pid = os.getpid()
+                self._running = None
+                threading.Thread(target=self._loop.run_forever, name='ai-pool', daemon=True).start()
+            return self._loop
+
+ai_executor = AIExecutor()
+
+def _local_fallback(mood: str, user_profile: dict, description: str = None, activity_type: str = None):
+    """Local template recommendation for when the pool can't take the call"""
+    ai_executor.count('degraded')
+    return MoodAIService._generate_local_recommendation(mood, user_profile, description=description,
+                                                        activity_type=activity_type)
+
+def generate_recommendation(mood: str, user_profile: dict, description: str = None, activity_type: str = None,
+                            local_only: bool = False):
+    """MoodAIService.generate_mood_recommendation behind the bulkhead.
+
+    When the pool is saturated or the call outlasts AI_POOL_TIMEOUT_SECONDS
+    the recommendation comes from local templates instead; with
+    AI_POOL_SATURATED=reject, AIBusyError is raised for a 503. local_only
+    skips the model altogether (the load shedder sets it under pressure).
+    """
+    if local_only:
+        return MoodAIService._generate_local_recommendation(mood, user_profile, description=description,
+                                                            activity_type=activity_type)
+    try:
+        return ai_executor.run(MoodAIService.generate_mood_recommendation, mood, user_profile, description, activity_type)
+    except AIBusyError:
+        if AI_POOL_SATURATED == 'reject':
+            raise
+        return _local_fallback(mood, user_profile, description, activity_type)
+
+async def generate_recommendation_async(mood: str, user_profile: dict, description: str = None, activity_type: str = None,
+                                        local_only: bool = False):
+    """generate_recommendation for async handlers"""
+    if local_only:
+        return MoodAIService._generate_local_recommendation(mood, user_profile, description=description,
+                                                            activity_type=activity_type)
+    try:
+        return await ai_executor.run_async(MoodAIService.generate_mood_recommendation, mood, user_profile, description, activity_type)
+    except AIBusyError:
+        if AI_POOL_SATURATED == 'reject':
+            raise
+        return _local_fallback(mood, user_profile, description, activity_type)
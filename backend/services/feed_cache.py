@@ -0,0 +1,178 @@
+import hashlib
+import os
+import threading
+import time
+from collections import namedtuple
+from typing import Callable, Optional
+
+from services.json_provider import dumps
+
+try:
+    from config import config
+    FEED_CACHE_ENABLED = config.FEED_CACHE_ENABLED
+    FEED_CACHE_TTL_SECONDS = config.FEED_CACHE_TTL_SECONDS
+    FEED_CACHE_PAGES = config.FEED_CACHE_PAGES
+    FEED_CACHE_MAX_ENTRIES = config.FEED_CACHE_MAX_ENTRIES
+except ModuleNotFoundError:
+    FEED_CACHE_ENABLED = os.getenv("FEED_CACHE_ENABLED", "True").lower() == "true"
+    FEED_CACHE_TTL_SECONDS = float(os.getenv("FEED_CACHE_TTL_SECONDS", "10"))
+    FEED_CACHE_PAGES = int(os.getenv("FEED_CACHE_PAGES", "3"))
+    FEED_CACHE_MAX_ENTRIES = int(os.getenv("FEED_CACHE_MAX_ENTRIES", "512"))
+
+# post_ids: post id strings in page order
+# fragments: each post serialised to JSON bytes with its closing brace removed,
+#            so per-user flags can be appended without re-encoding the post
+# digest: hash of the fragments and next_cursor, the shared part of the page's ETag
+FeedPage = namedtuple('FeedPage', ['post_ids', 'fragments', 'next_cursor', 'digest'])
+
+# Longer filter values are served uncached, so arbitrary query strings can't fill the cache
+MAX_FILTER_LENGTH = 32
+
+class FeedCache:
+    """Per-worker cache of the first few public feed pages for each filter.
+
+    Pages are stored pre-serialised and shared by every viewer; the caller
+    overlays the viewer's like/star flags when rendering. Any write that can
+    change a public page (new post, like/star, comment) invalidates the whole
+    cache. Other workers converge within FEED_CACHE_TTL_SECONDS.
+    """
+    _entries = {}        # key -> (expires_at, FeedPage)
+    _cursor_depth = {}   # next_cursor handed out by a cached page -> page index it leads to
+    _build_locks = {}    # key -> [lock held while one request rebuilds that page, requests using it]
+    _lock = threading.Lock()
+    _generation = 0
+    _hits = 0
+    _misses = 0
+
+    @staticmethod
+    def get_page(mood: Optional[str], activity_type: Optional[str], limit: int, cursor: Optional[str],
+                 build: Callable, fields: tuple = ()) -> Optional[FeedPage]:
+        """Return the cached page for this filter, building it at most once when it is missing.
+
+        build() must return (posts, next_cursor) with posts as raw documents.
+        Pages built for a sparse fieldset are cached under their own key. Returns None when
+        the page is not eligible for caching (cache disabled, deeper than
+        FEED_CACHE_PAGES, or a filter longer than MAX_FILTER_LENGTH) and the
+        caller should query directly.
+        """
+        if not FEED_CACHE_ENABLED:
+            return None
+        mood = (mood or '').strip().lower()
+        activity_type = (activity_type or '').strip()
+        if len(mood) > MAX_FILTER_LENGTH or len(activity_type) > MAX_FILTER_LENGTH:
+            return None
+
+        depth = 0 if not cursor else FeedCache._cursor_depth.get(cursor)
+        if depth is None or depth >= FEED_CACHE_PAGES:
+            return None
+
+        key = (mood, activity_type, limit, cursor or '', tuple(sorted(fields)))
+        page = FeedCache._lookup(key)
+        if page is not None:
+            return page
+
+        # Only one request per key rebuilds; the rest wait and reuse its result.
+        # The lock is dropped once no request is using it.
+        with FeedCache._lock:
+            build_lock = FeedCache._build_locks.setdefault(key, [threading.Lock(), 0])
+            build_lock[1] += 1
+
+        try:
+            with build_lock[0]:
+                page = FeedCache._lookup(key)
+                if page is not None:
+                    return page
+
+                generation = FeedCache._generation
+                page = FeedCache.build_page(build)
+
+                with FeedCache._lock:
+                    FeedCache._misses += 1
+                    # A write landed while we were querying: serve the page but don't cache it
+                    if generation == FeedCache._generation:
+                        if len(FeedCache._entries) >= FEED_CACHE_MAX_ENTRIES:
+                            FeedCache._evict_locked()
+                        FeedCache._entries[key] = (time.monotonic() + FEED_CACHE_TTL_SECONDS, page)
+                        if page.next_cursor:
+                            FeedCache._cursor_depth[page.next_cursor] = depth + 1
+            return page
+        finally:
+            with FeedCache._lock:
+                build_lock[1] -= 1
+                if not build_lock[1] and FeedCache._build_locks.get(key) is build_lock:
+                    del FeedCache._build_locks[key]
+
+    @staticmethod
+    def build_page(build: Callable) -> FeedPage:
+        """Run build() and serialise its posts into a FeedPage without caching it"""
+        posts, next_cursor = build()
+        fragments = [dumps(post)[:-1] for post in posts]
+        digest = hashlib.blake2b(digest_size=16)
+        for fragment in fragments:
+            digest.update(fragment)
+        digest.update((next_cursor or '').encode('utf-8'))
+        return FeedPage([str(post['_id']) for post in posts], fragments, next_cursor, digest.hexdigest())
+
+    @staticmethod
+    def etag(page: FeedPage, liked: set = frozenset(), starred: set = frozenset()) -> str:
+        """Strong ETag of the body render() would produce, without rendering it"""
+        flags = ''.join(
+            ('l' if post_id in liked else '-') + ('s' if post_id in starred else '-')
+            for post_id in page.post_ids
+        )
+        return f"{page.digest}.{hashlib.blake2b(flags.encode('ascii'), digest_size=4).hexdigest()}"
+
+    @staticmethod
+    def render(page: FeedPage, liked: set = frozenset(), starred: set = frozenset()) -> bytes:
+        """Assemble the feed response body, overlaying the viewer's isLiked/isStarred flags"""
+        posts = []
+        for post_id, fragment in zip(page.post_ids, page.fragments):
+            flags = b',"isLiked":%s,"isStarred":%s}' % (
+                b'true' if post_id in liked else b'false',
+                b'true' if post_id in starred else b'false'
+            )
+            posts.append(fragment + flags)
+
+        tail = dumps({
+            'count': len(posts),
+            'has_more': page.next_cursor is not None,
+            'next_cursor': page.next_cursor
+        })
+        return b'{"posts":[' + b','.join(posts) + b'],' + tail[1:]
+
+    @staticmethod
+    def invalidate():
+        """Drop every cached page; pages being rebuilt concurrently are not stored"""
+        with FeedCache._lock:
+            FeedCache._generation += 1
+            FeedCache._entries.clear()
+            FeedCache._cursor_depth.clear()
+
+    @staticmethod
+    def stats():
+        """Hit/miss counters for this worker"""
+        with FeedCache._lock:
+            return {
+                'hits': FeedCache._hits,
+                'misses': FeedCache._misses,
+                'entries': len(FeedCache._entries)
+            }
+
+    @staticmethod
+    def _lookup(key) -> Optional[FeedPage]:
+        entry = FeedCache._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        with FeedCache._lock:
+            FeedCache._hits += 1
+        return entry[1]
+
+    @staticmethod
+    def _evict_locked():
+        """Make room for a new entry. Caller holds FeedCache._lock."""
+        now = time.monotonic()
+        for key in [key for key, (expires_at, _) in FeedCache._entries.items() if expires_at < now]:
+            del FeedCache._entries[key]
+        if len(FeedCache._entries) >= FEED_CACHE_MAX_ENTRIES:
+            FeedCache._entries.clear()
+            FeedCache._cursor_depth.clear()
@@ -9,7 +9,7 @@ class FeedbackAnalysisService:
         """Get insights about user's feedback patterns"""
         try:
             # Get user's feedback history
-            feedback_history = Recommendation.get_user_feedback_history(user_id)
+            feedback_history = Recommendation.get_user_feedback_history(user_id, fields=['mood', 'liked', 'recommendation_id'])
             
             if not feedback_history:
                 return {
@@ -42,7 +42,7 @@ class FeedbackAnalysisService:
                     mood_feedback[mood]['disliked'] += 1
                 
                 # Track recommendation type preferences
-                rec = Recommendation.get_by_id(str(feedback.get('recommendation_id')))
+                rec = Recommendation.get_by_id(str(feedback.get('recommendation_id')), fields=['activity_type'])
                 if rec:
                     rec_type = rec.get('activity_type', '')
                     if rec_type not in type_feedback:
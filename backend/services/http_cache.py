@@ -0,0 +1,104 @@
+import gzip
+import hashlib
+import os
+
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    from config import config
+    COMPRESSION_ENABLED = config.COMPRESSION_ENABLED
+    COMPRESSION_MIN_BYTES = config.COMPRESSION_MIN_BYTES
+    COMPRESSION_GZIP_LEVEL = config.COMPRESSION_GZIP_LEVEL
+    COMPRESSION_BROTLI_QUALITY = config.COMPRESSION_BROTLI_QUALITY
+    ETAGS_ENABLED = config.ETAGS_ENABLED
+except ModuleNotFoundError:
+    COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "True").lower() == "true"
+    COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+    COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+    COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "5"))
+    ETAGS_ENABLED = os.getenv("ETAGS_ENABLED", "True").lower() == "true"
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/x-ndjson', 'text/plain', 'text/html'}
+
+def payload_etag(*parts: bytes) -> str:
+    """Strong validator for a response body (or the parts it is built from)"""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(part)
+    return digest.hexdigest()
+
+def etag_matches(etag: str) -> bool:
+    """True if the request's If-None-Match names this ETag, in any of its encoded variants"""
+    if not ETAGS_ENABLED or request.method not in ('GET', 'HEAD'):
+        return False
+    if_none_match = request.if_none_match
+    if if_none_match.star_tag:
+        return True
+    return any(if_none_match.contains(variant) for variant in (etag, f'{etag}-br', f'{etag}-gzip'))
+
+def not_modified(etag: str) -> Response:
+    """Empty 304 carrying the ETag; handlers return this before building a body the client already has"""
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.vary.add('Accept-Encoding')
+    return response
+
+def _negotiate_encoding():
+    """Best content coding the client accepts, or None"""
+    offered = ['br', 'gzip'] if brotli is not None else ['gzip']
+    return request.accept_encodings.best_match(offered)
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=COMPRESSION_GZIP_LEVEL)
+
+def http_cache_after_request(response):
+    """Tag GET responses with a strong ETag, answer If-None-Match with 304 and compress large bodies.
+
+    Handlers that can tell a page is unchanged without rendering it (see
+    etag_matches/not_modified) set their own ETag; every other response is
+    tagged with a hash of its body. Encoded bodies get the encoding appended
+    to the ETag, since a strong validator names one exact representation.
+    Streamed responses are left as they are.
+    """
+    if request.method not in ('GET', 'HEAD') or response.status_code != 200 \
+            or response.is_streamed or response.direct_passthrough \
+            or 'Content-Encoding' in response.headers:
+        return response
+
+    body = response.get_data()
+    encoding = None
+    if COMPRESSION_ENABLED and response.mimetype in COMPRESSIBLE_MIMETYPES:
+        response.vary.add('Accept-Encoding')
+        if len(body) >= COMPRESSION_MIN_BYTES:
+            encoding = _negotiate_encoding()
+
+    etag, weak = response.get_etag()
+    if ETAGS_ENABLED and etag is None:
+        etag = payload_etag(body)
+    if etag is not None and encoding is not None:
+        response.set_etag(f'{etag}-{encoding}', weak)
+    elif etag is not None:
+        response.set_etag(etag, weak)
+
+    if ETAGS_ENABLED and etag is not None and not weak and etag_matches(etag):
+        # Turn this response into the 304 so headers set by other hooks are kept
+        response.status_code = 304
+        response.set_data(b'')
+        return response
+
+    if encoding is not None:
+        response.set_data(_compress(body, encoding))
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+def init_http_cache(app):
+    """Register the ETag/compression hook. Register it before other after_request hooks so it runs last."""
+    if COMPRESSION_ENABLED or ETAGS_ENABLED:
+        app.after_request(http_cache_after_request)
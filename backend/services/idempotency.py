@@ -0,0 +1,204 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from flask import Response, g, jsonify, request
+from pymongo.errors import DuplicateKeyError
+
+try:
+    from config import config
+    IDEMPOTENCY_ENABLED = config.IDEMPOTENCY_ENABLED
+    IDEMPOTENCY_TTL_SECONDS = config.IDEMPOTENCY_TTL_SECONDS
+    IDEMPOTENCY_LOCK_SECONDS = config.IDEMPOTENCY_LOCK_SECONDS
+    IDEMPOTENCY_CACHE_SIZE = config.IDEMPOTENCY_CACHE_SIZE
+except ModuleNotFoundError:
+    IDEMPOTENCY_ENABLED = os.getenv("IDEMPOTENCY_ENABLED", "True").lower() == "true"
+    IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+    IDEMPOTENCY_LOCK_SECONDS = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "120"))
+    IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "2048"))
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+# Response headers saved with the body and sent again on replay
+REPLAYED_HEADERS = ('Location', 'Retry-After', 'X-Refreshed-Token')
+
+class IdempotencyStore:
+    """Stored responses for POST requests sent with an Idempotency-Key header.
+
+    The first request with a key runs normally and its response (status,
+    body, content type and the REPLAYED_HEADERS it carries) is saved in the idempotency_keys collection, which
+    a TTL index expires after IDEMPOTENCY_TTL_SECONDS, and in a small
+    per-worker LRU. Retries with the same key get the saved response back
+    without the handler running again. Keys are scoped to the caller (user
+    id, or client IP when anonymous) and bound to the method, path and body
+    of the first request. 5xx responses are not saved, so a failed request
+    can be retried for real.
+    """
+
+    def __init__(self, max_size: int = IDEMPOTENCY_CACHE_SIZE, ttl: int = IDEMPOTENCY_TTL_SECONDS,
+                 lock_seconds: int = IDEMPOTENCY_LOCK_SECONDS):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.lock_seconds = lock_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.replayed = 0
+        self.conflicts = 0
+
+    def before_request(self):
+        """Replay a stored response, or claim the key for this request"""
+        key = request.headers.get(HEADER)
+        if request.method != 'POST' or key is None:
+            return None
+        key = key.strip()
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return jsonify({"error": f"{HEADER} must be 1-{MAX_KEY_LENGTH} characters"}), 400
+
+        user_id = g.get('user_id')
+        scope_key = f"{'user:' + user_id if user_id else 'ip:' + (request.remote_addr or 'unknown')}|{key}"
+        fingerprint = hashlib.sha256(
+            request.method.encode() + b' ' + request.path.encode() + b'\n' + request.get_data()
+        ).hexdigest()
+
+        record = self._cached(scope_key)
+        if record is None and g.get('db') is not None:
+            record = self._claim(scope_key, fingerprint)
+        if record is None:
+            # This request owns the key; after_request stores its response
+            g.idempotency_key = scope_key
+            g.idempotency_fingerprint = fingerprint
+            return None
+
+        if record['fingerprint'] != fingerprint:
+            return jsonify({"error": f"{HEADER} was already used for a different request"}), 422
+        if record.get('status') != 'done':
+            with self._lock:
+                self.conflicts += 1
+            response = jsonify({"error": "A request with this Idempotency-Key is still being processed"})
+            response.headers['Retry-After'] = '1'
+            return response, 409
+
+        with self._lock:
+            self.replayed += 1
+        response = Response(record['body'], status=record['status_code'], mimetype=record['mimetype'],
+                            headers=record.get('headers'))
+        response.headers['Idempotent-Replayed'] = 'true'
+        return response
+
+    def after_request(self, response):
+        """Save the response of a request that claimed a key"""
+        scope_key = g.pop('idempotency_key', None)
+        if scope_key is None:
+            return response
+        fingerprint = g.pop('idempotency_fingerprint')
+
+        if response.status_code >= 500 or response.is_streamed:
+            self._release(scope_key)
+            return response
+
+        record = {
+            'fingerprint': fingerprint,
+            'status': 'done',
+            'status_code': response.status_code,
+            'mimetype': response.mimetype,
+            'body': response.get_data(),
+            'headers': {name: response.headers[name] for name in REPLAYED_HEADERS if name in response.headers}
+        }
+        if g.get('db') is not None:
+            try:
+                g.db.idempotency_keys.update_one(
+                    {'_id': scope_key},
+                    {'$set': dict(record, created_at=datetime.now(timezone.utc))},
+                    upsert=True
+                )
+            except Exception as e:
+                logging.warning(f"Could not store idempotent response for {scope_key}: {e}")
+        self._remember(scope_key, record)
+        return response
+
+    def teardown_request(self, exception):
+        """Free a claimed key when the handler raised, so the client can retry"""
+        scope_key = g.pop('idempotency_key', None)
+        if scope_key is not None:
+            self._release(scope_key)
+
+    def stats(self):
+        with self._lock:
+            return {'replayed': self.replayed, 'conflicts': self.conflicts, 'entries': len(self._entries)}
+
+    def _claim(self, scope_key: str, fingerprint: str):
+        """Insert a pending record for the key. Returns None if claimed, else the existing record."""
+        now = datetime.now(timezone.utc)
+        pending = {
+            '_id': scope_key,
+            'fingerprint': fingerprint,
+            'status': 'pending',
+            'created_at': now
+        }
+        try:
+            g.db.idempotency_keys.insert_one(pending)
+            return None
+        except DuplicateKeyError:
+            pass
+
+        record = g.db.idempotency_keys.find_one({'_id': scope_key})
+        if record is None:
+            return self._claim(scope_key, fingerprint)
+        if record.get('status') == 'done':
+            self._remember(scope_key, record)
+            return record
+
+        # A pending record whose worker died mid-request is taken over once its lock expires
+        stale_before = now - timedelta(seconds=self.lock_seconds)
+        taken = g.db.idempotency_keys.update_one(
+            {'_id': scope_key, 'status': 'pending', 'created_at': {'$lt': stale_before}},
+            {'$set': {'fingerprint': fingerprint, 'created_at': now}}
+        )
+        return None if taken.modified_count else record
+
+    def _release(self, scope_key: str):
+        if g.get('db') is None:
+            return
+        try:
+            g.db.idempotency_keys.delete_one({'_id': scope_key, 'status': 'pending'})
+        except Exception as e:
+            logging.warning(f"Could not release idempotency key {scope_key}: {e}")
+
+    def _cached(self, scope_key: str):
+        with self._lock:
+            entry = self._entries.get(scope_key)
+            if entry is None or entry[0] <= time.monotonic():
+                return None
+            self._entries.move_to_end(scope_key)
+            return entry[1]
+
+    def _remember(self, scope_key: str, record: dict):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[scope_key] = (time.monotonic() + self.ttl, record)
+            self._entries.move_to_end(scope_key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    @staticmethod
+    def ensure_indexes(db):
+        """Expire stored responses after IDEMPOTENCY_TTL_SECONDS"""
+        db.idempotency_keys.create_index('created_at', expireAfterSeconds=IDEMPOTENCY_TTL_SECONDS)
+
+idempotency_store = IdempotencyStore()
+
+def init_idempotency(app):
+    """Register the Idempotency-Key hooks; they need g.db, so call this after the database hook"""
+    if not IDEMPOTENCY_ENABLED:
+        return None
+    app.before_request(idempotency_store.before_request)
+    # after_request hooks run in reverse order; go first in the list so the response is
+    # saved after every other hook has added its headers (e.g. X-Refreshed-Token)
+    app.after_request_funcs.setdefault(None, []).insert(0, idempotency_store.after_request)
+    app.teardown_request(idempotency_store.teardown_request)
+    return idempotency_store
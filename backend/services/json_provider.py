@@ -0,0 +1,104 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from bson import Decimal128, ObjectId
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from flask.json.provider import DefaultJSONProvider
+except ImportError:
+    # Flask < 2.2 has no JSON providers; init_json falls back to app.json_encoder
+    DefaultJSONProvider = None
+
+def _default(o):
+    """Encode the non-JSON types documents and handlers hand back"""
+    if isinstance(o, ObjectId):
+        return str(o)
+    if isinstance(o, (datetime, date)):
+        return o.isoformat()
+    if isinstance(o, Decimal128):
+        return str(o.to_decimal())
+    if isinstance(o, Decimal):
+        return str(o)
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+def dumps(obj, sort_keys: bool = False, indent: bool = False) -> bytes:
+    """Serialise to compact UTF-8 JSON bytes, handling ObjectId, datetime and Decimal.
+
+    Uses orjson when it is installed and the standard library otherwise;
+    both produce the same output for the types above (datetimes as
+    isoformat(), ObjectIds and Decimals as strings).
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=_default, option=option)
+    return json.dumps(
+        obj,
+        default=_default,
+        sort_keys=sort_keys,
+        indent=2 if indent else None,
+        separators=(',', ': ') if indent else (',', ':'),
+        ensure_ascii=False
+    ).encode('utf-8')
+
+def loads(s):
+    """Parse JSON from str or bytes"""
+    if orjson is not None:
+        return orjson.loads(s)
+    return json.loads(s)
+
+class FastJSONEncoder(json.JSONEncoder):
+    """json.JSONEncoder that hands the whole document to dumps(), for Flask < 2.2's app.json_encoder"""
+
+    def default(self, o):
+        return _default(o)
+
+    def encode(self, o):
+        return dumps(o, sort_keys=self.sort_keys, indent=bool(self.indent)).decode('utf-8')
+
+class FastJSONDecoder(json.JSONDecoder):
+    """json.JSONDecoder backed by loads(), for Flask < 2.2's app.json_decoder"""
+
+    def decode(self, s, *args, **kwargs):
+        return loads(s)
+
+if DefaultJSONProvider is not None:
+    class FastJSONProvider(DefaultJSONProvider):
+        """Flask JSON provider backed by dumps()/loads()"""
+
+        def dumps(self, obj, **kwargs):
+            return dumps(
+                obj,
+                sort_keys=kwargs.get('sort_keys', self.sort_keys),
+                indent=bool(kwargs.get('indent'))
+            ).decode('utf-8')
+
+        def loads(self, s, **kwargs):
+            return loads(s)
+
+        def response(self, *args, **kwargs):
+            obj = self._prepare_response_obj(args, kwargs)
+            indent = self.compact is False or (self.compact is None and self._app.debug)
+            body = dumps(obj, sort_keys=self.sort_keys, indent=indent)
+            return self._app.response_class(body + b'\n', mimetype=self.mimetype)
+else:
+    FastJSONProvider = None
+
+def init_json(app):
+    """Make jsonify and request.get_json use the fast JSON layer"""
+    if FastJSONProvider is not None:
+        app.json_provider_class = FastJSONProvider
+        app.json = FastJSONProvider(app)
+    else:
+        app.json_encoder = FastJSONEncoder
+        app.json_decoder = FastJSONDecoder
+    return app
@@ -0,0 +1,147 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Iterable
+
+from flask import request, jsonify, g
+
+try:
+    from config import config
+    LOAD_SHEDDING_ENABLED = config.LOAD_SHEDDING_ENABLED
+    SHED_IN_FLIGHT_THRESHOLD = config.SHED_IN_FLIGHT_THRESHOLD
+    SHED_LATENCY_THRESHOLD_MS = config.SHED_LATENCY_THRESHOLD_MS
+    SHED_WINDOW_SECONDS = config.SHED_WINDOW_SECONDS
+    SHED_RETRY_AFTER_SECONDS = config.SHED_RETRY_AFTER_SECONDS
+    SHED_LOW_PRIORITY = config.SHED_LOW_PRIORITY
+except ModuleNotFoundError:
+    LOAD_SHEDDING_ENABLED = os.getenv("LOAD_SHEDDING_ENABLED", "True").lower() == "true"
+    SHED_IN_FLIGHT_THRESHOLD = int(os.getenv("SHED_IN_FLIGHT_THRESHOLD", "6"))
+    SHED_LATENCY_THRESHOLD_MS = float(os.getenv("SHED_LATENCY_THRESHOLD_MS", "1000"))
+    SHED_WINDOW_SECONDS = float(os.getenv("SHED_WINDOW_SECONDS", "10"))
+    SHED_RETRY_AFTER_SECONDS = int(os.getenv("SHED_RETRY_AFTER_SECONDS", "5"))
+    SHED_LOW_PRIORITY = [name for name in os.getenv("SHED_LOW_PRIORITY", "").split(',') if name.strip()]
+
+# Route classes, from first to last to give up under pressure
+ROUTE_CLASSES = ('critical', 'default', 'ai', 'low')
+CRITICAL_ENDPOINTS = {'health_check', 'metrics'}
+AI_ENDPOINTS = {'mood_journal.get_recommendation'}
+
+class LoadShedder:
+    """Admission control for one worker process.
+
+    Tracks requests in flight and the mean latency of recently completed
+    requests per route class. The worker is under pressure when
+    in_flight_threshold or more requests are already being handled, or when
+    default-class requests finished in the last window_seconds averaged
+    latency_threshold_ms or more. Under pressure, low-priority endpoints get
+    an immediate 503 with Retry-After and /recommend is answered from local
+    templates instead of the model; everything else is still served.
+    """
+
+    def __init__(self, low_priority: Iterable[str] = (), in_flight_threshold: int = SHED_IN_FLIGHT_THRESHOLD,
+                 latency_threshold_ms: float = SHED_LATENCY_THRESHOLD_MS, window_seconds: float = SHED_WINDOW_SECONDS):
+        self.low_priority = {name.strip() for name in low_priority}
+        self.in_flight_threshold = in_flight_threshold
+        self.latency_threshold = latency_threshold_ms / 1000
+        self.window_seconds = window_seconds
+        self._lock = threading.Lock()
+        self._in_flight = dict.fromkeys(ROUTE_CLASSES, 0)
+        self._samples = {name: deque() for name in ROUTE_CLASSES}
+        self._latency_total = dict.fromkeys(ROUTE_CLASSES, 0.0)
+        self.shed = dict.fromkeys(ROUTE_CLASSES, 0)
+        self.ai_local_only = 0
+
+    def route_class(self, endpoint) -> str:
+        if endpoint in CRITICAL_ENDPOINTS:
+            return 'critical'
+        if endpoint in AI_ENDPOINTS:
+            return 'ai'
+        if endpoint in self.low_priority:
+            return 'low'
+        return 'default'
+
+    def _expire(self, route_class: str, now: float):
+        """Drop the class's samples older than the window; call with the lock held"""
+        samples = self._samples[route_class]
+        while samples and samples[0][0] < now - self.window_seconds:
+            self._latency_total[route_class] -= samples.popleft()[1]
+
+    def _recent_latency(self, route_class: str, now: float) -> float:
+        """Mean seconds of the class's requests completed within the window; call with the lock held"""
+        self._expire(route_class, now)
+        samples = self._samples[route_class]
+        return self._latency_total[route_class] / len(samples) if samples else 0.0
+
+    def _under_pressure(self, now: float) -> bool:
+        return (sum(self._in_flight.values()) >= self.in_flight_threshold
+                or self._recent_latency('default', now) >= self.latency_threshold)
+
+    def under_pressure(self) -> bool:
+        with self._lock:
+            return self._under_pressure(time.monotonic())
+
+    def degrade_ai(self) -> bool:
+        """True, and counted, when a recommendation should skip the model right now"""
+        with self._lock:
+            if not self._under_pressure(time.monotonic()):
+                return False
+            self.ai_local_only += 1
+            return True
+
+    def before_request(self):
+        """before_request hook: shed low-priority requests under pressure, otherwise start tracking this one"""
+        route_class = self.route_class(request.endpoint)
+        now = time.monotonic()
+        with self._lock:
+            pressure = route_class in ('ai', 'low') and self._under_pressure(now)
+            if pressure and route_class == 'low':
+                self.shed['low'] += 1
+            else:
+                self._in_flight[route_class] += 1
+                if pressure:
+                    self.ai_local_only += 1
+        if pressure and route_class == 'low':
+            response = jsonify({"error": "Server is busy, please retry shortly"})
+            response.headers['Retry-After'] = str(SHED_RETRY_AFTER_SECONDS)
+            return response, 503
+
+        g.load_class = route_class
+        g.load_started = now
+        g.ai_local_only = pressure
+
+    def teardown_request(self, exception):
+        route_class = g.pop('load_class', None)
+        if route_class is None:
+            return
+        now = time.monotonic()
+        duration = now - g.pop('load_started')
+        with self._lock:
+            self._in_flight[route_class] -= 1
+            self._samples[route_class].append((now, duration))
+            self._latency_total[route_class] += duration
+            # Keeps each deque to one window's worth even when nothing reads it
+            self._expire(route_class, now)
+
+    def stats(self):
+        """In-flight requests, recent mean latency and shed counts per route class for this worker"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                'under_pressure': self._under_pressure(now),
+                'in_flight': dict(self._in_flight),
+                'recent_latency_ms': {name: round(self._recent_latency(name, now) * 1000, 1)
+                                      for name in ROUTE_CLASSES},
+                'shed': dict(self.shed),
+                'ai_local_only': self.ai_local_only
+            }
+
+def init_load_shedding(app):
+    """Register the load shedder; register it before the other before_request hooks so shed requests cost nothing"""
+    if not LOAD_SHEDDING_ENABLED:
+        return None
+    shedder = LoadShedder(SHED_LOW_PRIORITY)
+    app.before_request(shedder.before_request)
+    app.teardown_request(shedder.teardown_request)
+    app.extensions['load_shedder'] = shedder
+    return shedder
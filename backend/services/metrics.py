@@ -0,0 +1,235 @@
+import hmac
+import logging
+import os
+import threading
+import time
+
+from flask import Response, current_app, request, jsonify, g
+
+try:
+    from prometheus_client import (CollectorRegistry, Counter, Gauge, Histogram, REGISTRY,
+                                   CONTENT_TYPE_LATEST, generate_latest, multiprocess)
+except ImportError:
+    # /metrics is only served when prometheus_client is installed
+    Counter = None
+
+try:
+    from config import config
+    METRICS_ENABLED = config.METRICS_ENABLED
+    METRICS_AUTH_TOKEN = config.METRICS_AUTH_TOKEN
+    METRICS_SYNC_INTERVAL_SECONDS = config.METRICS_SYNC_INTERVAL_SECONDS
+except ModuleNotFoundError:
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True").lower() == "true"
+    METRICS_AUTH_TOKEN = os.getenv("METRICS_AUTH_TOKEN", "")
+    METRICS_SYNC_INTERVAL_SECONDS = float(os.getenv("METRICS_SYNC_INTERVAL_SECONDS", "1"))
+
+# Set (before workers start) to aggregate every gunicorn worker's metrics, see gunicorn.conf.py
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+LLM_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 15, 20, 30)
+
+if Counter is not None and METRICS_ENABLED:
+    HTTP_REQUEST_DURATION = Histogram(
+        'http_request_duration_seconds', 'Request latency by endpoint',
+        ['endpoint', 'method'], buckets=HTTP_BUCKETS)
+    HTTP_REQUESTS = Counter(
+        'http_requests_total', 'Responses by endpoint and status code',
+        ['endpoint', 'method', 'status'])
+    HTTP_IN_FLIGHT = Gauge(
+        'http_requests_in_flight', 'Requests being handled',
+        ['endpoint'], multiprocess_mode='livesum')
+    LLM_CALL_DURATION = Histogram(
+        'llm_call_duration_seconds', 'OpenRouter call latency by outcome',
+        ['outcome'], buckets=LLM_BUCKETS)
+    LLM_CALLS = Counter(
+        'llm_calls_total', 'Recommendation generations by outcome (model calls and local fallbacks)',
+        ['outcome'])
+    CACHE_REQUESTS = Counter(
+        'cache_requests_total', 'Cache lookups by cache and result; hit ratio = hit / (hit + miss)',
+        ['cache', 'result'])
+    POOL_JOBS = Counter(
+        'pool_jobs_total', 'bcrypt and AI pool jobs by outcome',
+        ['pool', 'outcome'])
+    RATE_LIMITED = Counter(
+        'rate_limit_rejected_total', 'Requests answered 429 by the rate limiter')
+    LOAD_SHED = Counter(
+        'load_shed_total', 'Requests answered 503 by the load shedder',
+        ['route_class'])
+    RECOMMENDATIONS_LOCAL_ONLY = Counter(
+        'recommendations_local_only_total', 'Recommendations served from templates because the worker was under pressure')
+    IDEMPOTENCY = Counter(
+        'idempotency_requests_total', 'Idempotency-Key requests replayed or refused as conflicting',
+        ['result'])
+    WORKERS_UNDER_PRESSURE = Gauge(
+        'workers_under_pressure', 'Workers currently shedding load',
+        multiprocess_mode='livesum')
+else:
+    HTTP_REQUEST_DURATION = None
+
+def enabled() -> bool:
+    return HTTP_REQUEST_DURATION is not None
+
+def request_started(endpoint: str) -> float:
+    """Count a request in flight; pass the returned start time to request_finished"""
+    if enabled():
+        HTTP_IN_FLIGHT.labels(endpoint).inc()
+    return time.perf_counter()
+
+def request_finished(endpoint: str, method: str, status: int, started: float):
+    if enabled():
+        HTTP_IN_FLIGHT.labels(endpoint).dec()
+        HTTP_REQUEST_DURATION.labels(endpoint, method).observe(time.perf_counter() - started)
+        HTTP_REQUESTS.labels(endpoint, method, str(status)).inc()
+
+def record_llm_call(outcome: str, seconds: float = None):
+    """Count one recommendation generation; seconds is given when the model was actually called"""
+    if enabled():
+        LLM_CALLS.labels(outcome).inc()
+        if seconds is not None:
+            LLM_CALL_DURATION.labels(outcome).observe(seconds)
+
+class StatsBridge:
+    """Mirrors the counters components keep for /health into Prometheus counters.
+
+    Caches, pools and limiters count per worker in their stats(); sync()
+    adds each counter's growth since the previous sync to a Prometheus
+    counter, which multiprocess mode then sums across workers. A background
+    thread syncs every interval seconds, so requests don't pay for it;
+    /metrics syncs the answering worker once more before rendering.
+    """
+
+    def __init__(self, interval: float = METRICS_SYNC_INTERVAL_SECONDS):
+        self.sources = []
+        self.gauges = []
+        self.interval = interval
+        self._thread_pid = None
+        self._lock = threading.Lock()
+
+    def add(self, stats_fn, counters):
+        """stats_fn() returns a dict; counters is [(stats_key, prometheus_counter)]"""
+        self.sources.append((stats_fn, counters, {}))
+
+    def add_gauge(self, read_fn, gauge):
+        self.gauges.append((read_fn, gauge))
+
+    def sync(self):
+        with self._lock:
+            for stats_fn, counters, last in self.sources:
+                stats = stats_fn()
+                for key, counter in counters:
+                    value = stats.get(key, 0)
+                    if value > last.get(key, 0):
+                        counter.inc(value - last.get(key, 0))
+                    last[key] = value
+            for read_fn, gauge in self.gauges:
+                gauge.set(read_fn())
+
+    def start(self):
+        """Start this process's sync thread if it isn't running; cheap enough to call on every request"""
+        if self._thread_pid == os.getpid():
+            return
+        # Started lazily and per process, so each forked gunicorn worker gets its own thread
+        with self._lock:
+            if self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+            threading.Thread(target=self._run, name='metrics-sync', daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.sync()
+            except Exception as e:
+                logging.warning(f"Could not sync stats into metrics: {e}")
+
+def _stats_bridge(app) -> StatsBridge:
+    from auth.bcrypt_pool import bcrypt_executor
+    from auth.profile_cache import profile_cache
+    from auth.token_cache import token_cache
+    from services.ai_pool import ai_executor
+    from services.feed_cache import FeedCache
+    from services.idempotency import idempotency_store
+    from services.load_shedding import ROUTE_CLASSES
+
+    bridge = StatsBridge()
+    for name, stats_fn in (('profile', profile_cache.stats), ('jwt', token_cache.stats), ('feed', FeedCache.stats)):
+        bridge.add(stats_fn, [('hits', CACHE_REQUESTS.labels(name, 'hit')),
+                              ('misses', CACHE_REQUESTS.labels(name, 'miss'))])
+    bridge.add(bcrypt_executor.stats, [(outcome, POOL_JOBS.labels('bcrypt', outcome))
+                                       for outcome in ('completed', 'rejected', 'timed_out')])
+    bridge.add(ai_executor.stats, [(outcome, POOL_JOBS.labels('ai', outcome))
+                                   for outcome in ('completed', 'failed', 'rejected', 'timed_out', 'degraded')])
+    bridge.add(idempotency_store.stats, [('replayed', IDEMPOTENCY.labels('replayed')),
+                                         ('conflicts', IDEMPOTENCY.labels('conflict'))])
+
+    # The rate limiter and load shedder are registered after init_metrics, so look them up on each sync
+    def limiter_stats():
+        limiter = app.extensions.get('rate_limiter')
+        return {'rejected': limiter.rejected} if limiter is not None else {}
+
+    def shedder_stats():
+        shedder = app.extensions.get('load_shedder')
+        if shedder is None:
+            return {}
+        return dict(shedder.shed, ai_local_only=shedder.ai_local_only)
+
+    def under_pressure():
+        shedder = app.extensions.get('load_shedder')
+        return 1 if shedder is not None and shedder.under_pressure() else 0
+
+    bridge.add(limiter_stats, [('rejected', RATE_LIMITED)])
+    bridge.add(shedder_stats, [(route_class, LOAD_SHED.labels(route_class)) for route_class in ROUTE_CLASSES]
+               + [('ai_local_only', RECOMMENDATIONS_LOCAL_ONLY)])
+    bridge.add_gauge(under_pressure, WORKERS_UNDER_PRESSURE)
+    return bridge
+
+def metrics_before_request():
+    g.metrics_endpoint = request.endpoint or 'unmatched'
+    g.metrics_started = request_started(g.metrics_endpoint)
+
+def metrics_after_request(response):
+    g.metrics_status = response.status_code
+    return response
+
+def metrics_teardown_request(exception):
+    endpoint = g.pop('metrics_endpoint', None)
+    if endpoint is None:
+        return
+    request_finished(endpoint, request.method, g.pop('metrics_status', 500), g.pop('metrics_started'))
+    current_app.extensions['metrics'].start()
+
+def metrics_view():
+    """Prometheus text exposition; covers every worker when PROMETHEUS_MULTIPROC_DIR is set"""
+    if METRICS_AUTH_TOKEN:
+        auth_header = request.headers.get('Authorization', '')
+        supplied = auth_header[len('Bearer '):] if auth_header.startswith('Bearer ') else ''
+        if not hmac.compare_digest(supplied.encode(), METRICS_AUTH_TOKEN.encode()):
+            return jsonify({"error": "Invalid metrics token"}), 401
+    current_app.extensions['metrics'].sync()
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+
+def init_metrics(app):
+    """Instrument every request and serve /metrics.
+
+    Register before the other hooks: the before_request hook then runs first
+    and the after_request hook last, so shed, rate-limited and 304 responses
+    are all counted with their final status.
+    """
+    if not enabled():
+        if METRICS_ENABLED:
+            app.logger.info("prometheus_client is not installed; /metrics is disabled")
+        return None
+    bridge = _stats_bridge(app)
+    app.before_request(metrics_before_request)
+    app.after_request(metrics_after_request)
+    app.teardown_request(metrics_teardown_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view, methods=['GET'])
+    app.extensions['metrics'] = bridge
+    return bridge
@@ -1,3 +1,4 @@
+import asyncio
 import os
 import httpx
 import json
@@ -6,10 +7,22 @@ import time
 from typing import Dict, Any, List
 from datetime import datetime
 from services.resource_service import ResourceService
+from services.metrics import record_llm_call
 
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 MODEL_NAME = os.getenv("AI_MODEL_NAME", "deepseek/deepseek-r1-0528:free")
 
+class AIRateLimitedError(Exception):
+    """OpenRouter answered 429"""
+
+def _call_outcome(error: Exception) -> str:
+    """Metrics label for a failed model call"""
+    if isinstance(error, AIRateLimitedError):
+        return 'rate_limited'
+    if isinstance(error, httpx.TimeoutException):
+        return 'timeout'
+    return 'error'
+
 class MoodAIService:
     _recommendation_cache = {}
     _last_api_call = 0
@@ -177,22 +190,31 @@ class MoodAIService:
             logging.info(f"Time since last API call: {time_since_last_call}s, cooldown: {MoodAIService._api_cooldown}s")
             
             if time_since_last_call >= MoodAIService._api_cooldown:
+                started = time.perf_counter()
                 try:
                     logging.info(f"Attempting fresh AI recommendation for mood: {mood}")
                     recommendation = await MoodAIService._generate_ai_recommendation(mood, user_profile, description, activity_type)
                     MoodAIService._last_api_call = current_time
+                    record_llm_call('success', time.perf_counter() - started)
                     logging.info(f"Successfully generated fresh AI recommendation for {mood}")
                     return recommendation
+                except asyncio.CancelledError:
+                    # The AI pool gave up waiting on this call
+                    record_llm_call('cancelled', time.perf_counter() - started)
+                    raise
                 except Exception as e:
+                    record_llm_call(_call_outcome(e), time.perf_counter() - started)
                     logging.warning(f"AI service failed for {mood}: {e}")
                     logging.info(f"Falling back to local generation for {mood}")
-                    return MoodAIService._generate_local_recommendation(mood, user_profile, activity_type)
+                    return MoodAIService._generate_local_recommendation(mood, user_profile, description=description, activity_type=activity_type)
             else:
+                record_llm_call('cooldown')
                 logging.info(f"API cooldown active ({time_since_last_call}s < {MoodAIService._api_cooldown}s), using local generation for {mood}")
-                return MoodAIService._generate_local_recommendation(mood, user_profile, activity_type)
+                return MoodAIService._generate_local_recommendation(mood, user_profile, description=description, activity_type=activity_type)
         
+        record_llm_call('not_configured')
         logging.info(f"No API key available, using local generation for {mood}")
-        return MoodAIService._generate_local_recommendation(mood, user_profile, activity_type)
+        return MoodAIService._generate_local_recommendation(mood, user_profile, description=description, activity_type=activity_type)
     
     @staticmethod
     async def _generate_ai_recommendation(mood: str, user_profile: Dict[str, Any], description: str = None, activity_type: str = None) -> Dict[str, Any]:
@@ -266,7 +288,7 @@ Make it personal and contextual. Consider what happened to them, their age, inte
                     # Rate limited - increase cooldown temporarily
                     MoodAIService._api_cooldown = min(60, MoodAIService._api_cooldown * 2)  # Double cooldown, max 60s
                     logging.warning(f"Rate limited by AI service. Increasing cooldown to {MoodAIService._api_cooldown}s")
-                    raise Exception("Rate limited by AI service")
+                    raise AIRateLimitedError("Rate limited by AI service")
                 
                 response.raise_for_status()
                 response_data = response.json()
@@ -462,7 +484,7 @@ Make it personal and contextual. Consider what happened to them, their age, inte
                 liked_patterns[mood]['count'] += 1
                 
                 # Get recommendation details
-                rec = Recommendation.get_by_id(str(feedback.get('recommendation_id')))
+                rec = Recommendation.get_by_id(str(feedback.get('recommendation_id')), fields=['activity_type'])
                 if rec:
                     rec_type = rec.get('activity_type', '')
                     if rec_type not in liked_patterns[mood]['types']:
@@ -477,7 +499,7 @@ Make it personal and contextual. Consider what happened to them, their age, inte
                 disliked_patterns[mood]['count'] += 1
                 
                 # Get recommendation details
-                rec = Recommendation.get_by_id(str(feedback.get('recommendation_id')))
+                rec = Recommendation.get_by_id(str(feedback.get('recommendation_id')), fields=['activity_type'])
                 if rec:
                     rec_type = rec.get('activity_type', '')
                     if rec_type not in disliked_patterns[mood]['types']:
@@ -0,0 +1,183 @@
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from flask import request, jsonify, g
+
+try:
+    from config import config
+    RATE_LIMIT_ENABLED = config.RATE_LIMIT_ENABLED
+    RATE_LIMIT_BACKEND = config.RATE_LIMIT_BACKEND
+    RATE_LIMIT_SHM_PATH = config.RATE_LIMIT_SHM_PATH
+    RATE_LIMIT_SHM_SLOTS = config.RATE_LIMIT_SHM_SLOTS
+    RATE_LIMIT_TRUST_FORWARDED = config.RATE_LIMIT_TRUST_FORWARDED
+    RATE_LIMITS = config.RATE_LIMITS
+except ModuleNotFoundError:
+    RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "True").lower() == "true"
+    RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "shared")
+    RATE_LIMIT_SHM_PATH = os.getenv("RATE_LIMIT_SHM_PATH", "")
+    RATE_LIMIT_SHM_SLOTS = int(os.getenv("RATE_LIMIT_SHM_SLOTS", "65536"))
+    RATE_LIMIT_TRUST_FORWARDED = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "False").lower() == "true"
+    RATE_LIMITS = {}
+
+TOO_MANY_REQUESTS = "Too many requests, please slow down"
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+def parse_rate(rate: str) -> Tuple[int, float]:
+    """Parse "10/minute" into (10, 60.0)"""
+    count, _, period = rate.partition('/')
+    period = period.strip().lower().rstrip('s')
+    if period not in PERIODS:
+        raise ValueError(f"Unknown rate limit period in {rate!r}")
+    return int(count), float(PERIODS[period])
+
+def client_ip() -> str:
+    """Client address, taken from X-Forwarded-For only when running behind a trusted proxy"""
+    if RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.headers.get('X-Forwarded-For', '')
+        if forwarded:
+            return forwarded.split(',')[0].strip()
+    return request.remote_addr or 'unknown'
+
+class MemoryBackend:
+    """GCRA state in a dict. Limits are enforced per worker process only."""
+
+    def __init__(self):
+        self._tats = {}
+        self._lock = threading.Lock()
+
+    def update(self, key: str, now: float, emission_interval: float, tolerance: float) -> float:
+        with self._lock:
+            allowed, value = _gcra(self._tats.get(key, 0.0), now, emission_interval, tolerance)
+            if allowed:
+                self._tats[key] = value
+                if len(self._tats) > 100000:
+                    self._tats = {k: tat for k, tat in self._tats.items() if tat > now}
+                return 0.0
+            return value
+
+class SharedMemoryBackend:
+    """GCRA state in a memory-mapped file shared by every worker on the host.
+
+    The table is direct-mapped: each key hashes to one 16-byte slot holding
+    (key fingerprint, theoretical arrival time). A colliding key simply
+    takes the slot over, which can only ever reset a limit, never tighten
+    it. Updates are serialised with flock across processes and a thread
+    lock within one.
+    """
+    SLOT = struct.Struct('<Qd')
+
+    def __init__(self, path: str = RATE_LIMIT_SHM_PATH, slots: int = RATE_LIMIT_SHM_SLOTS):
+        if not path:
+            shm_dir = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+            path = os.path.join(shm_dir, 'mood_journal_ratelimit')
+        self.slots = slots
+        size = slots * self.SLOT.size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+        self._lock = threading.Lock()
+
+    def update(self, key: str, now: float, emission_interval: float, tolerance: float) -> float:
+        fingerprint = int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little')
+        offset = (fingerprint % self.slots) * self.SLOT.size
+
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                stored_fingerprint, tat = self.SLOT.unpack_from(self._map, offset)
+                if stored_fingerprint != fingerprint:
+                    tat = 0.0
+                allowed, value = _gcra(tat, now, emission_interval, tolerance)
+                if allowed:
+                    self.SLOT.pack_into(self._map, offset, fingerprint, value)
+                    return 0.0
+                return value
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+def _gcra(tat: float, now: float, emission_interval: float, tolerance: float):
+    """One GCRA step. Returns (True, new_tat) if allowed, else (False, retry_after_seconds)."""
+    tat = max(tat, now)
+    if tat - now > tolerance:
+        return False, tat - now - tolerance
+    return True, tat + emission_interval
+
+class RateLimiter:
+    """Per-user / per-IP request rate limiting using GCRA.
+
+    Rules map an endpoint ("auth_bp.login") or a whole blueprint
+    ("community") to a rate such as "10/minute"; the most specific rule
+    wins. Authenticated requests are keyed by user id, anonymous ones by
+    client IP. A rate of N per period allows bursts of up to N requests.
+    """
+
+    def __init__(self, rules: Dict[str, str] = None, backend=None):
+        self.rules = {name: parse_rate(rate) for name, rate in (rules or {}).items()}
+        self.backend = backend or MemoryBackend()
+        self.rejected = 0
+
+    def rule_for(self, endpoint: Optional[str], blueprint: Optional[str]):
+        if endpoint and endpoint in self.rules:
+            return endpoint, self.rules[endpoint]
+        if blueprint and blueprint in self.rules:
+            return blueprint, self.rules[blueprint]
+        return None, None
+
+    def hit(self, scope: str, identity: str, limit: int, period: float, now: float = None) -> float:
+        """Record a request; returns 0 if allowed, else seconds until it would be"""
+        emission_interval = period / limit
+        tolerance = period - emission_interval
+        return self.backend.update(f"{scope}|{identity}", now if now is not None else time.time(),
+                                   emission_interval, tolerance)
+
+    def check(self, endpoint: Optional[str], blueprint: Optional[str], identity: str) -> Optional[Dict[str, str]]:
+        """Count a request against its rule; returns None if allowed, else the headers for the 429"""
+        scope, rule = self.rule_for(endpoint, blueprint)
+        if rule is None:
+            return None
+
+        limit, period = rule
+        retry_after = self.hit(scope, identity, limit, period)
+        if retry_after <= 0:
+            return None
+
+        self.rejected += 1
+        return {
+            'Retry-After': str(max(1, math.ceil(retry_after))),
+            'X-RateLimit-Limit': f"{limit};w={int(period)}"
+        }
+
+    def before_request(self):
+        """before_request hook: answer 429 with Retry-After once a client exceeds its limit"""
+        # CORS preflights carry no credentials or work; only the request they announce counts
+        if request.method == 'OPTIONS':
+            return None
+        user_id = g.get('user_id')
+        identity = f"user:{user_id}" if user_id else f"ip:{client_ip()}"
+        headers = self.check(request.endpoint, request.blueprint, identity)
+        if headers is None:
+            return None
+
+        response = jsonify({"error": TOO_MANY_REQUESTS})
+        response.headers.update(headers)
+        return response, 429
+
+def init_rate_limiting(app):
+    """Register the rate limiter on the app according to the RATE_LIMIT_* settings"""
+    if not RATE_LIMIT_ENABLED or not RATE_LIMITS:
+        return None
+    backend = SharedMemoryBackend() if RATE_LIMIT_BACKEND == 'shared' else MemoryBackend()
+    limiter = RateLimiter(RATE_LIMITS, backend)
+    app.before_request(limiter.before_request)
+    app.extensions['rate_limiter'] = limiter
+    return limiter
@@ -0,0 +1,126 @@
+"""
+AI bulkhead tests
+Checks services/ai_pool.py bounds concurrent model calls: a full pool or a
+call past the timeout either degrades to local templates or, with
+AI_POOL_SATURATED=reject, becomes a 503 from /recommend.
+Requires mongomock (pip install mongomock) for the API test.
+"""
+
+import asyncio
+import threading
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+import services.ai_pool as ai_pool
+from services.ai_pool import AIBusyError, AIExecutor, generate_recommendation, generate_recommendation_async
+from services.mood_ai_service import MoodAIService
+
+PROFILE = {'age': 30, 'gender': 'female', 'nationality': 'US', 'hobbies': ['music']}
+
+@pytest.fixture
+def release():
+    """Set to let held model calls finish"""
+    event = threading.Event()
+    yield event
+    event.set()
+
+@pytest.fixture
+def model(monkeypatch, release):
+    """Replaces the OpenRouter call with one that holds its slot until `release` is set"""
+    calls = []
+
+    async def held(mood, user_profile, description=None, activity_type=None):
+        calls.append(mood)
+        while not release.is_set():
+            await asyncio.sleep(0.005)
+        return {'recommendation': {'type': 'model', 'title': mood, 'description': 'from the model'}, 'alternatives': []}
+
+    monkeypatch.setattr(MoodAIService, 'generate_mood_recommendation', staticmethod(held))
+    return calls
+
+@pytest.fixture
+def executor(monkeypatch):
+    """One running slot, no waiting room"""
+    executor = AIExecutor(max_concurrent=1, max_pending=0, timeout=5)
+    monkeypatch.setattr(ai_pool, 'ai_executor', executor)
+    return executor
+
+def _hold_slot(executor):
+    """Occupy the executor's only slot with a held model call"""
+    return executor.submit(MoodAIService.generate_mood_recommendation, 'busy', PROFILE)
+
+def test_completed_calls_are_counted(executor, model, release):
+    release.set()
+    assert generate_recommendation('happy', PROFILE)['recommendation']['type'] == 'model'
+    stats = executor.stats()
+    assert (stats['completed'], stats['rejected'], stats['degraded']) == (1, 0, 0)
+    assert stats['max_concurrent'] == 1
+    assert stats['call_seconds_avg'] >= 0
+
+def test_saturated_pool_degrades_to_local_templates(executor, model, release, monkeypatch):
+    """Test that a call finding the pool full is answered locally, keeping the requested activity type"""
+    monkeypatch.setattr(ai_pool, 'AI_POOL_SATURATED', 'degrade')
+    held = _hold_slot(executor)
+
+    result = generate_recommendation('sad', PROFILE, 'rainy day', 'music')
+    assert result['recommendation']['type'] == 'music'
+    assert result['alternatives']
+    result = asyncio.run(generate_recommendation_async('sad', PROFILE, None, 'books'))
+    assert result['recommendation']['type'] == 'books'
+
+    release.set()
+    held.result(timeout=5)
+    stats = executor.stats()
+    assert (stats['rejected'], stats['degraded'], stats['completed']) == (2, 2, 1)
+    assert model == ['busy']
+
+def test_saturated_pool_rejects_when_configured(executor, model, release, monkeypatch):
+    monkeypatch.setattr(ai_pool, 'AI_POOL_SATURATED', 'reject')
+    _hold_slot(executor)
+
+    with pytest.raises(AIBusyError):
+        generate_recommendation('sad', PROFILE)
+    with pytest.raises(AIBusyError):
+        asyncio.run(generate_recommendation_async('sad', PROFILE))
+    assert executor.stats()['rejected'] == 2
+    assert executor.stats()['degraded'] == 0
+
+def test_slow_call_times_out(executor, model, monkeypatch):
+    """Test that a call past the timeout stops waiting and frees the request thread"""
+    monkeypatch.setattr(ai_pool, 'AI_POOL_SATURATED', 'degrade')
+    executor.timeout = 0.05
+
+    assert generate_recommendation('calm', PROFILE, None, 'movies')['recommendation']['type'] == 'movies'
+    stats = executor.stats()
+    assert (stats['timed_out'], stats['degraded']) == (1, 1)
+
+def test_local_only_and_inline_skip_the_pool(monkeypatch, model, release):
+    """Test that local_only never calls the model and max_concurrent=0 calls it inline"""
+    executor = AIExecutor(max_concurrent=0, max_pending=0)
+    monkeypatch.setattr(ai_pool, 'ai_executor', executor)
+
+    assert generate_recommendation('happy', PROFILE, None, 'activities', local_only=True)['recommendation']['type'] == 'activities'
+    assert model == []
+
+    release.set()
+    assert generate_recommendation('happy', PROFILE)['recommendation']['type'] == 'model'
+    assert executor._loop is None
+
+def test_recommend_endpoint_answers_503_when_rejecting(client, register, executor, model, monkeypatch):
+    monkeypatch.setattr(ai_pool, 'AI_POOL_SATURATED', 'reject')
+    _, headers = register('alice')
+    _hold_slot(executor)
+
+    response = client.post('/api/v1/mood/recommend', headers=headers, json={'mood': 'happy'})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '5'
+
+    monkeypatch.setattr(ai_pool, 'AI_POOL_SATURATED', 'degrade')
+    response = client.post('/api/v1/mood/recommend', headers=headers, json={'mood': 'happy', 'activity_type': 'music'})
+    assert response.status_code == 200
+    assert response.get_json()['recommendation']['type'] == 'music'
@@ -0,0 +1,163 @@
+"""
+ASGI entry point tests
+Drives asgi.py through httpx's ASGI transport: the native async /recommend
+handler against a thin async wrapper over mongomock, the WSGI bridge for
+every other route, and the profile-claims token refresh.
+Requires mongomock, starlette, a2wsgi and httpx; skipped otherwise.
+"""
+
+import asyncio
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+httpx = pytest.importorskip('httpx')
+pytest.importorskip('starlette')
+pytest.importorskip('a2wsgi')
+
+from bson import ObjectId
+
+RECOMMEND = '/api/v1/mood/recommend'
+
+class AsyncCollection:
+    """The two awaited collection calls asgi.py makes, over a mongomock collection"""
+
+    def __init__(self, collection, reads):
+        self.collection = collection
+        self.reads = reads
+
+    async def find_one(self, *args, **kwargs):
+        self.reads.append(self.collection.name)
+        return self.collection.find_one(*args, **kwargs)
+
+    async def insert_one(self, *args, **kwargs):
+        return self.collection.insert_one(*args, **kwargs)
+
+class AsyncDatabase:
+    def __init__(self, db):
+        self.db = db
+        self.reads = []
+
+    def __getattr__(self, name):
+        return AsyncCollection(self.db[name], self.reads)
+
+@pytest.fixture
+def asgi_module(monkeypatch):
+    """asgi.py, importing backend/app.py rather than the repository root's app.py shim"""
+    from backend import app as app_module
+    monkeypatch.setitem(sys.modules, 'app', app_module)
+    import asgi
+    return asgi
+
+@pytest.fixture
+def asgi_app(asgi_module, flask_app, mongo_db, monkeypatch):
+    """create_asgi_app around the test Flask app, without the lifespan's real MongoDB client"""
+    from services.mood_ai_service import MoodAIService
+
+    async def local_only(mood, user_profile, description=None, activity_type=None):
+        return MoodAIService._generate_local_recommendation(mood, user_profile, description=description,
+                                                            activity_type=activity_type)
+
+    monkeypatch.setattr(MoodAIService, 'generate_mood_recommendation', staticmethod(local_only))
+    app = asgi_module.create_asgi_app(flask_app)
+    app.native.state.db = AsyncDatabase(mongo_db)
+    return app
+
+def _run(app, *requests):
+    """Send (method, url, kwargs) requests through the ASGI app; returns the responses"""
+    async def send():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            return [await client.request(method, url, **kwargs) for method, url, kwargs in requests]
+    return asyncio.run(send())
+
+def test_native_recommend_stores_the_recommendation(asgi_app, register, mongo_db):
+    """Test that the async handler answers like the Flask one and writes through the async db"""
+    user_id, headers = register('alice')
+    ok, unauthenticated, malformed, no_mood = _run(
+        asgi_app,
+        ('POST', RECOMMEND, {'json': {'mood': 'happy', 'activity_type': 'music'}, 'headers': headers}),
+        ('POST', RECOMMEND, {'json': {'mood': 'happy'}}),
+        ('POST', RECOMMEND, {'content': b'{bad', 'headers': headers}),
+        ('POST', RECOMMEND, {'json': {'description': 'x'}, 'headers': headers}),
+    )
+
+    assert ok.status_code == 200
+    assert ok.headers['content-type'] == 'application/json'
+    recommendation = ok.json()['recommendation']
+    assert recommendation['type'] == 'music'
+    stored = mongo_db.recommendations.find_one({'_id': ObjectId(recommendation['id'])})
+    assert str(stored['user_id']) == user_id and stored['mood'] == 'happy'
+    assert 'X-Refreshed-Token' not in ok.headers
+
+    assert unauthenticated.status_code == 401
+    assert malformed.status_code == 400
+    assert no_mood.status_code == 400 and no_mood.json() == {'error': 'mood is required'}
+
+def test_other_routes_go_through_the_wsgi_bridge(asgi_app, register, mongo_db):
+    """Test that non-recommend routes and idempotent retries are served by Flask"""
+    _, headers = register('alice')
+    keyed = {**headers, 'Idempotency-Key': 'retry-1'}
+    health, first, replay = _run(
+        asgi_app,
+        ('GET', '/health', {}),
+        ('POST', RECOMMEND, {'json': {'mood': 'sad'}, 'headers': keyed}),
+        ('POST', RECOMMEND, {'json': {'mood': 'sad'}, 'headers': keyed}),
+    )
+
+    assert health.status_code == 200
+    assert first.status_code == replay.status_code == 200
+    # Only the Flask side stores idempotent responses, so the replay carries the same id
+    assert first.json()['recommendation']['id'] == replay.json()['recommendation']['id']
+    assert mongo_db.recommendations.count_documents({}) == 1
+    assert asgi_app.native.state.db.reads == []
+
+def test_busy_pool_is_a_503(asgi_module, asgi_app, register, monkeypatch):
+    async def busy(*args, **kwargs):
+        raise asgi_module.AIBusyError("AI recommendation queue is full")
+
+    monkeypatch.setattr(asgi_module, 'generate_recommendation_async', busy)
+    _, headers = register('alice')
+    response, = _run(asgi_app, ('POST', RECOMMEND, {'json': {'mood': 'happy'}, 'headers': headers}))
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '5'
+
+def test_load_profile_prefers_the_cache(asgi_module, register, mongo_db):
+    """Test that load_profile reads MongoDB once per user and rejects malformed ids"""
+    user_id, _ = register('alice')
+    db = AsyncDatabase(mongo_db)
+    asgi_module.profile_cache.clear()
+
+    async def load():
+        return [await asgi_module.load_profile(db, user_id), await asgi_module.load_profile(db, user_id),
+                await asgi_module.load_profile(db, 'not-an-id'), await asgi_module.load_profile(db, str(ObjectId()))]
+
+    first, second, malformed, missing = asyncio.run(load())
+    assert first['username'] == second['username'] == 'alice'
+    assert 'password_hash' not in first
+    assert malformed is None and missing is None
+    assert db.reads == ['users', 'users']
+
+def test_stale_profile_claims_are_refreshed(asgi_app, flask_app, client, register):
+    """Test that a token signed before a profile update gets X-Refreshed-Token with current claims"""
+    from auth.models import User
+
+    flask_app.config['JWT_PROFILE_CLAIMS'] = True
+    _, headers = register('alice', age=30)
+    current, = _run(asgi_app, ('POST', RECOMMEND, {'json': {'mood': 'happy'}, 'headers': headers}))
+    assert current.status_code == 200
+    assert 'X-Refreshed-Token' not in current.headers
+
+    update = client.put('/api/v1/auth/profile', headers=headers, json={'username': 'alice', 'age': 31})
+    assert update.status_code == 200
+    stale, = _run(asgi_app, ('POST', RECOMMEND, {'json': {'mood': 'happy'}, 'headers': headers}))
+    assert stale.status_code == 200
+
+    with flask_app.app_context():
+        refreshed = User.decode_jwt_token(stale.headers['X-Refreshed-Token'])
+    assert refreshed['prf']['v'] == 1
+    assert User.profile_from_claims(refreshed['prf'])['age'] == 31
@@ -0,0 +1,182 @@
+"""
+Authentication tests
+Covers the verified-token cache, the once-per-request auth hook, the
+bounded bcrypt process pool and rehashing to the configured cost.
+The API tests run against mongomock (pip install mongomock); skipped otherwise.
+"""
+
+import sys
+import os
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bcrypt
+import jwt
+import pytest
+from bson import ObjectId
+from flask import g
+
+import auth.utils as auth_utils
+from auth.models import User
+
+from auth.bcrypt_pool import BcryptBusyError, BcryptExecutor, bcrypt_executor
+from auth.token_cache import TokenCache, token_cache
+from auth.utils import _check_password_inline, _hash_password_inline
+
+def test_token_cache_never_outlives_the_token(monkeypatch):
+    """Test that a cached payload is only served until the token's own exp"""
+    cache = TokenCache(max_size=4)
+    now = 1_000_000.0
+    monkeypatch.setattr(time, 'time', lambda: now)
+
+    cache.put('t', {'user_id': 'u1', 'exp': now + 30})
+    assert cache.get('t') == {'user_id': 'u1', 'exp': now + 30}
+
+    now += 30
+    assert cache.get('t') is None
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'entries': 0}
+
+def test_token_cache_is_bounded_lru():
+    """Test that the least recently used token is evicted at max_size, and size 0 disables caching"""
+    cache = TokenCache(max_size=2)
+    exp = time.time() + 60
+    cache.put('a', {'exp': exp})
+    cache.put('b', {'exp': exp})
+    cache.get('a')
+    cache.put('c', {'exp': exp})
+
+    assert cache.get('b') is None
+    assert cache.get('a') and cache.get('c')
+    assert cache.stats()['entries'] == 2
+
+    disabled = TokenCache(max_size=0)
+    disabled.put('a', {'exp': exp})
+    assert disabled.get('a') is None
+
+def test_token_verified_once_across_requests(client, register, monkeypatch):
+    """Test that repeat requests with one token skip jwt.decode, and bad tokens get a 401"""
+    _, headers = register('alice')
+    token_cache.clear()
+    decodes = []
+    real_decode = jwt.decode
+    monkeypatch.setattr(jwt, 'decode', lambda *args, **kwargs: decodes.append(1) or real_decode(*args, **kwargs))
+
+    for _ in range(3):
+        assert client.get('/api/v1/mood/mood', headers=headers).status_code == 200
+    assert len(decodes) == 1
+
+    response = client.get('/api/v1/mood/mood', headers={'Authorization': 'Bearer not-a-jwt'})
+    assert response.status_code == 401
+    assert response.get_json() == {'error': 'Invalid or expired token'}
+    assert client.get('/api/v1/mood/mood').get_json() == {'error': 'Authorization header required'}
+
+def test_expired_token_is_rejected_even_if_cached(client, flask_app, register):
+    """Test that a token verified and cached earlier is refused once past its exp"""
+    user_id, _ = register('alice')
+    exp = time.time() + 1
+    token = jwt.encode({'user_id': user_id, 'exp': exp}, flask_app.config['JWT_SECRET_KEY'], algorithm='HS256')
+    headers = {'Authorization': f'Bearer {token}'}
+
+    assert client.get('/api/v1/mood/mood', headers=headers).status_code == 200
+    assert token_cache.get(token) is not None
+
+    time.sleep(max(0.0, exp - time.time()) + 0.05)
+    assert client.get('/api/v1/mood/mood', headers=headers).status_code == 401
+    assert token_cache.get(token) is None
+
+def test_bcrypt_pool_rejects_beyond_its_bound():
+    """Test that a saturated pool raises BcryptBusyError at once instead of queueing without limit"""
+    executor = BcryptExecutor(workers=1, max_pending=0, timeout=5)
+    try:
+        running = threading.Thread(target=executor.run, args=(time.sleep, 0.5))
+        running.start()
+        time.sleep(0.05)
+        with pytest.raises(BcryptBusyError):
+            executor.run(time.sleep, 0)
+        running.join()
+
+        assert executor.run(_check_password_inline, 'secret', _hash_password_inline('secret')) is True
+        stats = executor.stats()
+        assert (stats['completed'], stats['rejected'], stats['workers']) == (2, 1, 1)
+    finally:
+        if executor._pool is not None:
+            executor._pool.shutdown()
+
+def test_bcrypt_pool_times_out():
+    """Test that a job outliving the timeout raises BcryptBusyError and keeps its slot until it ends"""
+    executor = BcryptExecutor(workers=1, max_pending=0, timeout=0.2)
+    try:
+        executor.run(time.sleep, 0)
+        with pytest.raises(BcryptBusyError):
+            executor.run(time.sleep, 1)
+        with pytest.raises(BcryptBusyError):
+            executor.run(time.sleep, 0)
+        assert executor.stats()['timed_out'] == 1
+    finally:
+        executor._pool.shutdown()
+
+def test_inline_bcrypt_when_pool_disabled():
+    """Test that workers=0 hashes in the calling process"""
+    executor = BcryptExecutor(workers=0)
+    password_hash = executor.run(_hash_password_inline, 'secret')
+    assert executor.run(_check_password_inline, 'secret', password_hash) is True
+    assert executor._pool is None
+
+def test_busy_pool_answers_503(client, monkeypatch):
+    """Test that register and login turn a saturated pool into 503 with Retry-After"""
+    def busy(*args):
+        raise BcryptBusyError("Password hashing queue is full")
+    monkeypatch.setattr(bcrypt_executor, 'run', busy)
+
+    response = client.post('/api/v1/auth/register', json={
+        'username': 'alice', 'email': 'alice@example.com', 'password': 'secret123'
+    })
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+def test_bcrypt_cost_and_needs_rehash(monkeypatch):
+    """Test that hashes are flagged for rehash whenever their cost differs from BCRYPT_ROUNDS"""
+    monkeypatch.setattr(auth_utils, 'BCRYPT_ROUNDS', 12)
+    assert auth_utils.bcrypt_cost('$2b$12$' + 'x' * 53) == 12
+    assert auth_utils.bcrypt_cost('not a hash') is None
+    assert auth_utils.bcrypt_cost(None) is None
+
+    assert not auth_utils.needs_rehash('$2b$12$' + 'x' * 53)
+    assert auth_utils.needs_rehash('$2b$10$' + 'x' * 53)
+    assert auth_utils.needs_rehash('$2b$13$' + 'x' * 53)
+    assert auth_utils.needs_rehash('garbage')
+
+def test_login_upgrades_hash_cost(client, register, mongo_db):
+    """Test that a successful login rehashes an old-cost password, and a failed one does not"""
+    user_id, _ = register('alice')
+    old_cost = auth_utils.BCRYPT_ROUNDS + 1
+    old_hash = bcrypt.hashpw(b'secret123', bcrypt.gensalt(old_cost)).decode('utf-8')
+    mongo_db.users.update_one({'_id': ObjectId(user_id)}, {'$set': {'password_hash': old_hash}})
+
+    assert client.post('/api/v1/auth/login', json={'identifier': 'alice', 'password': 'wrong'}).status_code == 401
+    assert mongo_db.users.find_one({'_id': ObjectId(user_id)})['password_hash'] == old_hash
+
+    assert client.post('/api/v1/auth/login', json={'identifier': 'alice', 'password': 'secret123'}).status_code == 200
+    new_hash = mongo_db.users.find_one({'_id': ObjectId(user_id)})['password_hash']
+    assert auth_utils.bcrypt_cost(new_hash) == auth_utils.BCRYPT_ROUNDS
+    assert client.post('/api/v1/auth/login', json={'identifier': 'alice', 'password': 'secret123'}).status_code == 200
+
+def test_rehash_does_not_overwrite_a_concurrent_change(flask_app, register, mongo_db):
+    """Test that the rehash only replaces the exact hash that was verified"""
+    user_id, _ = register('alice')
+    with flask_app.app_context():
+        g.db = mongo_db
+        assert User.replace_password_hash(user_id, 'stale hash', 'new hash') is False
+        current = mongo_db.users.find_one({'_id': ObjectId(user_id)})['password_hash']
+        assert User.replace_password_hash(user_id, current, 'new hash') is True
+    assert mongo_db.users.find_one({'_id': ObjectId(user_id)})['password_hash'] == 'new hash'
+
+def test_calibration_picks_highest_cost_within_target(monkeypatch):
+    """Test that calibrate_bcrypt proposes the last cost under the target latency"""
+    import calibrate_bcrypt
+    monkeypatch.setattr(calibrate_bcrypt, 'measure_cost', lambda cost, samples: 0.001 * 2 ** (cost - 4))
+    assert calibrate_bcrypt.propose_cost(0.25, samples=1, verbose=False) == 11
+    assert calibrate_bcrypt.propose_cost(0.0001, samples=1, verbose=False) == calibrate_bcrypt.MIN_COST
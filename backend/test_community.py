@@ -0,0 +1,121 @@
+"""
+Community feed tests
+Drives the community endpoints against mongomock: like/star status
+overlays, the batch status endpoint and the my-liked/my-starred listings.
+Requires mongomock (pip install mongomock); skipped otherwise.
+"""
+
+import sys
+import os
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bson import ObjectId
+
+def _create_post(client, headers, mood='happy', activity_type='activity', title='Walk'):
+    response = client.post('/api/v1/community/posts', headers=headers, json={
+        'mood': mood, 'activity_title': title, 'activity_description': 'Around the block',
+        'activity_type': activity_type, 'mood_intensity': 6
+    })
+    assert response.status_code == 201
+    return response.get_json()['post_id']
+
+def _flags(body):
+    return {post['_id']: (post['isLiked'], post['isStarred']) for post in body['posts']}
+
+def test_feed_overlays_each_viewers_reactions(client, register):
+    """Test that the shared feed page carries the requesting user's own like/star flags"""
+    _, alice = register('alice')
+    _, bob = register('bob')
+    first, second, third = (_create_post(client, alice, title=f"p{i}") for i in range(3))
+
+    assert client.post(f'/api/v1/community/posts/{first}/like', headers=alice).status_code == 200
+    assert client.post(f'/api/v1/community/posts/{second}/star', headers=alice).status_code == 200
+    assert client.post(f'/api/v1/community/posts/{third}/like', headers=bob).status_code == 200
+
+    assert _flags(client.get('/api/v1/community/posts', headers=alice).get_json()) == {
+        first: (True, False), second: (False, True), third: (False, False)
+    }
+    assert _flags(client.get('/api/v1/community/posts', headers=bob).get_json()) == {
+        first: (False, False), second: (False, False), third: (True, False)
+    }
+    assert set(_flags(client.get('/api/v1/community/posts').get_json()).values()) == {(False, False)}
+
+def test_batch_status(client, register):
+    """Test that POST /posts/status resolves many posts at once and reports unknown ids"""
+    _, alice = register('alice')
+    _, bob = register('bob')
+    liked = _create_post(client, alice)
+    plain = _create_post(client, alice)
+    missing = str(ObjectId())
+    client.post(f'/api/v1/community/posts/{liked}/like', headers=bob)
+    client.post(f'/api/v1/community/posts/{liked}/star', headers=bob)
+    client.post(f'/api/v1/community/posts/{liked}/like', headers=alice)
+
+    response = client.post('/api/v1/community/posts/status', headers=bob,
+                           json={'post_ids': [liked, plain, missing]})
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['statuses'] == {
+        liked: {'is_liked': True, 'is_starred': True, 'total_likes': 2, 'total_stars': 1},
+        plain: {'is_liked': False, 'is_starred': False, 'total_likes': 0, 'total_stars': 0}
+    }
+    assert body['missing'] == [missing]
+
+def test_batch_status_validation(client, register):
+    """Test that the batch endpoint rejects bad input and anonymous callers"""
+    _, alice = register('alice')
+    url = '/api/v1/community/posts/status'
+
+    assert client.post(url, json={'post_ids': [str(ObjectId())]}).status_code == 401
+    assert client.post(url, headers=alice, json={'post_ids': []}).status_code == 400
+    assert client.post(url, headers=alice, json={'post_ids': ['nope']}).status_code == 400
+    assert client.post(url, headers=alice, json={'post_ids': [str(ObjectId()) for _ in range(101)]}).status_code == 400
+
+def _reacted(client, url, headers, limit):
+    """Follow next_cursor through a my-liked/my-starred listing; returns the pages of post ids"""
+    pages, cursor = [], None
+    while True:
+        query = {'limit': limit, **({'cursor': cursor} if cursor else {})}
+        body = client.get(url, headers=headers, query_string=query).get_json()
+        pages.append([post['_id'] for post in body['posts']])
+        if not body['has_more']:
+            return pages
+        cursor = body['next_cursor']
+
+def test_liked_and_starred_listings_page_by_reaction_time(client, register, mongo_db):
+    """Test that my-liked/my-starred list posts most recently reacted first, skipping deleted posts"""
+    user_id, alice = register('alice')
+    _, bob = register('bob')
+    posts = [_create_post(client, bob, title=f"p{i}") for i in range(5)]
+
+    # Like in a known order (oldest first); the reaction time, not the post's age, decides the order
+    start = datetime(2026, 10, 1, 9, 0)
+    order = [posts[2], posts[0], posts[4], posts[1], posts[3]]
+    mongo_db.post_likes.insert_many([
+        {'post_id': ObjectId(post_id), 'user_id': ObjectId(user_id), 'created_at': start + timedelta(minutes=i)}
+        for i, post_id in enumerate(order)
+    ])
+    assert client.post(f'/api/v1/community/posts/{posts[3]}/star', headers=alice).status_code == 200
+
+    newest_first = order[::-1]
+    assert _reacted(client, '/api/v1/community/my-liked-posts', alice, 2) == [
+        newest_first[0:2], newest_first[2:4], newest_first[4:]
+    ]
+    assert _reacted(client, '/api/v1/community/my-starred-posts', alice, 2) == [[posts[3]]]
+    assert _reacted(client, '/api/v1/community/my-liked-posts', bob, 2) == [[]]
+
+    # A like outliving its post (deleted concurrently) drops out of its page, which still advances
+    assert client.delete(f'/api/v1/community/posts/{newest_first[1]}', headers=bob).status_code == 200
+    mongo_db.post_likes.insert_one({'post_id': ObjectId(newest_first[1]), 'user_id': ObjectId(user_id),
+                                    'created_at': start + timedelta(minutes=3, seconds=30)})
+    assert _reacted(client, '/api/v1/community/my-liked-posts', alice, 2) == [
+        [newest_first[0]], [newest_first[2], newest_first[3]], [newest_first[4]]
+    ]
+
+    body = client.get('/api/v1/community/my-liked-posts', headers=alice,
+                      query_string={'limit': 1, 'fields': 'mood'}).get_json()
+    assert body['posts'] == [{'_id': newest_first[0], 'mood': 'happy', 'liked_at': body['posts'][0]['liked_at']}]
@@ -0,0 +1,141 @@
+"""
+Conditional GET and compression tests
+Drives services/http_cache.py through a bare Flask app (ETags, 304s and
+the -gzip ETag variant) and revalidates the community feed end to end
+against mongomock.
+Requires mongomock (pip install mongomock) for the feed test.
+"""
+
+import gzip
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from flask import Flask, Response, jsonify, stream_with_context
+
+import services.http_cache as http_cache
+from services.http_cache import etag_matches, http_cache_after_request, not_modified, payload_etag
+
+BIG = {'items': ['mood %d' % i for i in range(300)]}
+
+@pytest.fixture
+def bare_client(monkeypatch):
+    """A bare app with only the ETag/compression hook; gzip is the only coding offered"""
+    monkeypatch.setattr(http_cache, 'brotli', None)
+    app = Flask(__name__)
+    app.after_request(http_cache_after_request)
+    renders = []
+
+    @app.route('/big', methods=['GET', 'POST'])
+    def big():
+        return jsonify(BIG)
+
+    @app.route('/small')
+    def small():
+        return jsonify({'ok': True})
+
+    @app.route('/missing')
+    def missing():
+        return jsonify({'error': 'Not found'}), 404
+
+    @app.route('/stream')
+    def stream():
+        return Response(stream_with_context(iter([b'{"a":1}\n'] * 200)), mimetype='application/x-ndjson')
+
+    @app.route('/page')
+    def page():
+        # Handlers that know their version answer 304 before rendering anything
+        etag = payload_etag(b'page-v1')
+        if etag_matches(etag):
+            return not_modified(etag)
+        renders.append(1)
+        response = jsonify(BIG)
+        response.set_etag(etag)
+        return response
+
+    test_client = app.test_client()
+    test_client.renders = renders
+    return test_client
+
+def _etag(response):
+    return response.headers['ETag'].strip('"')
+
+def test_large_bodies_are_gzipped_with_a_variant_etag(bare_client):
+    """Test that a gzip-capable client gets a compressed body tagged <etag>-gzip"""
+    plain = bare_client.get('/big')
+    assert 'Content-Encoding' not in plain.headers
+    assert plain.get_json() == BIG
+    assert _etag(plain) == payload_etag(plain.get_data())
+
+    encoded = bare_client.get('/big', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert encoded.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in encoded.headers['Vary']
+    assert gzip.decompress(encoded.get_data()) == plain.get_data()
+    assert _etag(encoded) == _etag(plain) + '-gzip'
+
+def test_if_none_match_answers_304_for_any_variant(bare_client):
+    """Test that a stored ETag, plain or -gzip, revalidates to an empty 304 whatever the client now accepts"""
+    plain_etag = _etag(bare_client.get('/big'))
+    gzip_etag = _etag(bare_client.get('/big', headers={'Accept-Encoding': 'gzip'}))
+
+    for if_none_match, accept in ((plain_etag, ''), (gzip_etag, 'gzip'), (gzip_etag, ''), (plain_etag, 'gzip')):
+        response = bare_client.get('/big', headers={'If-None-Match': f'"{if_none_match}"', 'Accept-Encoding': accept})
+        assert response.status_code == 304
+        assert response.get_data() == b''
+        assert 'Content-Encoding' not in response.headers
+
+    assert bare_client.get('/big', headers={'If-None-Match': '"something-else"'}).status_code == 200
+    assert bare_client.get('/big', headers={'If-None-Match': '*'}).status_code == 304
+
+def test_handler_etag_short_circuits_rendering(bare_client):
+    """Test that a handler-set ETag is kept and a match skips the render"""
+    first = bare_client.get('/page', headers={'Accept-Encoding': 'gzip'})
+    assert _etag(first) == payload_etag(b'page-v1') + '-gzip'
+
+    again = bare_client.get('/page', headers={'If-None-Match': first.headers['ETag'], 'Accept-Encoding': 'gzip'})
+    assert again.status_code == 304
+    assert _etag(again) == payload_etag(b'page-v1')
+    assert len(bare_client.renders) == 1
+
+def test_responses_left_alone(bare_client):
+    """Test that small, non-GET, non-200 and streamed responses are not compressed or tagged"""
+    gzip_ok = {'Accept-Encoding': 'gzip'}
+
+    small = bare_client.get('/small', headers=gzip_ok)
+    assert 'Content-Encoding' not in small.headers
+    assert 'ETag' in small.headers
+
+    post = bare_client.post('/big', headers=gzip_ok)
+    assert 'Content-Encoding' not in post.headers and 'ETag' not in post.headers
+
+    missing = bare_client.get('/missing', headers=gzip_ok)
+    assert missing.status_code == 404 and 'ETag' not in missing.headers
+
+    stream = bare_client.get('/stream', headers=gzip_ok)
+    assert 'Content-Encoding' not in stream.headers and 'ETag' not in stream.headers
+    assert stream.get_data().count(b'\n') == 200
+
+def test_feed_revalidates_per_viewer(client, register):
+    """Test that the feed answers 304 until the viewer's own reactions change"""
+    _, alice = register('alice')
+    post = client.post('/api/v1/community/posts', headers=alice, json={
+        'mood': 'happy', 'activity_title': 'Walk', 'activity_description': 'Outside',
+        'activity_type': 'activity', 'mood_intensity': 6
+    }).get_json()['post_id']
+
+    etag = client.get('/api/v1/community/posts', headers=alice).headers['ETag']
+    assert client.get('/api/v1/community/posts', headers={**alice, 'If-None-Match': etag}).status_code == 304
+
+    client.post(f'/api/v1/community/posts/{post}/like', headers=alice)
+    changed = client.get('/api/v1/community/posts', headers={**alice, 'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.get_json()['posts'][0]['isLiked'] is True
+    assert changed.headers['ETag'] != etag
+
+    # The ETag covers the viewer's flags, so alice's copy doesn't validate an anonymous one
+    anonymous = client.get('/api/v1/community/posts', headers={'If-None-Match': changed.headers['ETag']})
+    assert anonymous.status_code == 200
+    assert anonymous.get_json()['posts'][0]['isLiked'] is False
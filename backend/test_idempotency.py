@@ -0,0 +1,169 @@
+"""
+Idempotency-Key tests
+Drives a small Flask app through the idempotency hooks with a mongomock
+database: replay, body mismatch, in-flight conflicts, 5xx release and
+takeover of stale claims.
+Requires mongomock (pip install mongomock); skipped otherwise.
+"""
+
+import hashlib
+import json
+import sys
+import os
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from flask import Flask, g, jsonify, request
+
+mongomock = pytest.importorskip('mongomock')
+
+from services.idempotency import IdempotencyStore
+
+@pytest.fixture
+def setup():
+    """A bare app with the idempotency hooks, a counting handler and a fresh store/db"""
+    db = mongomock.MongoClient().idempotency_test
+    store = IdempotencyStore(max_size=16, ttl=60, lock_seconds=120)
+    calls = []
+
+    app = Flask(__name__)
+
+    @app.before_request
+    def load_db():
+        g.db = db
+        g.user_id = request.headers.get('X-User')
+
+    app.before_request(store.before_request)
+    app.after_request_funcs.setdefault(None, []).insert(0, store.after_request)
+    app.teardown_request(store.teardown_request)
+
+    @app.route('/items', methods=['POST'])
+    def create_item():
+        calls.append(request.get_json())
+        response = jsonify({'id': len(calls)})
+        response.headers['Location'] = f"/items/{len(calls)}"
+        response.headers['X-Not-Replayed'] = 'x'
+        return response, 201
+
+    @app.route('/flaky', methods=['POST'])
+    def flaky():
+        calls.append(request.get_json())
+        if len(calls) == 1:
+            return jsonify({'error': 'upstream down'}), 503
+        return jsonify({'ok': True}), 200
+
+    return app.test_client(), db, store, calls
+
+def _post(client, path, body, key='k1', user='alice'):
+    headers = {'Idempotency-Key': key}
+    if user:
+        headers['X-User'] = user
+    return client.post(path, data=json.dumps(body), content_type='application/json', headers=headers)
+
+def _fingerprint(path, body):
+    return hashlib.sha256(b'POST ' + path.encode() + b'\n' + json.dumps(body).encode()).hexdigest()
+
+def test_replay_returns_stored_response_without_rerunning(setup):
+    """Test that a retry gets the saved status, body and headers back and the handler runs once"""
+    client, db, store, calls = setup
+
+    first = _post(client, '/items', {'name': 'a'})
+    second = _post(client, '/items', {'name': 'a'})
+
+    assert len(calls) == 1
+    assert first.status_code == second.status_code == 201
+    assert second.get_json() == first.get_json() == {'id': 1}
+    assert second.headers['Location'] == first.headers['Location'] == '/items/1'
+    assert second.headers['Idempotent-Replayed'] == 'true'
+    assert 'Idempotent-Replayed' not in first.headers
+    assert 'X-Not-Replayed' not in second.headers
+    assert store.stats()['replayed'] == 1
+
+    # A worker without the LRU entry replays from the collection
+    store._entries.clear()
+    third = _post(client, '/items', {'name': 'a'})
+    assert len(calls) == 1
+    assert third.headers['Location'] == '/items/1'
+    assert third.get_json() == {'id': 1}
+
+def test_keys_are_scoped_to_the_caller(setup):
+    """Test that the same key from two users runs twice"""
+    client, db, store, calls = setup
+    _post(client, '/items', {'name': 'a'}, user='alice')
+    _post(client, '/items', {'name': 'a'}, user='bob')
+    _post(client, '/items', {'name': 'a'}, user=None)
+    assert len(calls) == 3
+    assert db.idempotency_keys.find_one({'_id': 'ip:127.0.0.1|k1'})['status'] == 'done'
+
+def test_same_key_different_body_is_rejected(setup):
+    """Test that reusing a key for another payload answers 422"""
+    client, db, store, calls = setup
+    _post(client, '/items', {'name': 'a'})
+    response = _post(client, '/items', {'name': 'b'})
+
+    assert response.status_code == 422
+    assert len(calls) == 1
+
+def test_pending_key_answers_409(setup):
+    """Test that a retry while the first request is still running gets 409 with Retry-After"""
+    client, db, store, calls = setup
+    # Claim the key as an in-flight request on another worker would
+    db.idempotency_keys.insert_one({
+        '_id': 'user:alice|k1',
+        'fingerprint': _fingerprint('/items', {'name': 'a'}),
+        'status': 'pending',
+        'created_at': datetime.now(timezone.utc)
+    })
+
+    response = _post(client, '/items', {'name': 'a'})
+
+    assert response.status_code == 409
+    assert response.headers['Retry-After'] == '1'
+    assert calls == []
+    assert store.stats()['conflicts'] == 1
+
+def test_server_error_releases_the_key(setup):
+    """Test that a 5xx is not saved, so the retry runs the handler for real"""
+    client, db, store, calls = setup
+
+    first = _post(client, '/flaky', {'n': 1})
+    assert first.status_code == 503
+    assert db.idempotency_keys.count_documents({}) == 0
+
+    second = _post(client, '/flaky', {'n': 1})
+    assert second.status_code == 200
+    assert 'Idempotent-Replayed' not in second.headers
+    assert len(calls) == 2
+
+    third = _post(client, '/flaky', {'n': 1})
+    assert third.headers['Idempotent-Replayed'] == 'true'
+    assert len(calls) == 2
+
+def test_stale_pending_claim_is_taken_over(setup):
+    """Test that a pending record older than the lock window no longer blocks the key"""
+    client, db, store, calls = setup
+    db.idempotency_keys.insert_one({
+        '_id': 'user:alice|k1',
+        'fingerprint': 'from a worker that died',
+        'status': 'pending',
+        'created_at': datetime.now(timezone.utc) - timedelta(seconds=store.lock_seconds + 5)
+    })
+
+    response = _post(client, '/items', {'name': 'a'})
+
+    assert response.status_code == 201
+    assert len(calls) == 1
+    record = db.idempotency_keys.find_one({'_id': 'user:alice|k1'})
+    assert record['status'] == 'done'
+    assert record['status_code'] == 201
+    assert record['headers'] == {'Location': '/items/1'}
+
+def test_invalid_key_is_rejected(setup):
+    """Test that empty or overlong keys answer 400 before the handler runs"""
+    client, db, store, calls = setup
+    assert _post(client, '/items', {}, key='   ').status_code == 400
+    assert _post(client, '/items', {}, key='x' * 256).status_code == 400
+    assert calls == []
@@ -0,0 +1,90 @@
+"""
+JSON layer tests
+Checks services/json_provider.py encodes MongoDB and Python types the same
+way with orjson and with the standard library, and that jsonify and
+request.get_json go through it once init_json is applied.
+No database required.
+"""
+
+import sys
+import os
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from bson import Decimal128, ObjectId
+from flask import Flask, jsonify, request
+
+import services.json_provider as json_provider
+from services.json_provider import dumps, init_json, loads
+
+OID = ObjectId('652f1c2e9b1e8a3f4c5d6e7f')
+DOC = {
+    '_id': OID,
+    'user_id': OID,
+    'created_at': datetime(2026, 10, 19, 12, 30, 15, 123456),
+    'aware': datetime(2026, 10, 19, 12, 30, tzinfo=timezone.utc),
+    'offset': datetime(2026, 10, 19, 7, 30, tzinfo=timezone(timedelta(hours=-5))),
+    'day': date(2026, 10, 19),
+    'price': Decimal('12.50'),
+    'stored_price': Decimal128('3.10'),
+    'tags': ['a', 'ü', None, True, 1.5],
+    'nested': {'ids': [OID], 'count': 3}
+}
+
+@pytest.fixture(params=['orjson', 'stdlib'])
+def backend(request, monkeypatch):
+    if request.param == 'orjson':
+        pytest.importorskip('orjson')
+    else:
+        monkeypatch.setattr(json_provider, 'orjson', None)
+    return request.param
+
+def test_dumps_encodes_mongo_types(backend):
+    """Test that ObjectId, datetimes, dates and decimals become strings, compactly and in UTF-8"""
+    encoded = dumps(DOC)
+    assert encoded.startswith(b'{"_id":"652f1c2e9b1e8a3f4c5d6e7f","user_id":')
+    assert loads(encoded) == {
+        '_id': '652f1c2e9b1e8a3f4c5d6e7f',
+        'user_id': '652f1c2e9b1e8a3f4c5d6e7f',
+        'created_at': '2026-10-19T12:30:15.123456',
+        'aware': '2026-10-19T12:30:00+00:00',
+        'offset': '2026-10-19T07:30:00-05:00',
+        'day': '2026-10-19',
+        'price': '12.50',
+        'stored_price': '3.10',
+        'tags': ['a', 'ü', None, True, 1.5],
+        'nested': {'ids': ['652f1c2e9b1e8a3f4c5d6e7f'], 'count': 3}
+    }
+    assert 'ü'.encode('utf-8') in encoded
+
+def test_dumps_rejects_unknown_types(backend):
+    with pytest.raises(TypeError):
+        dumps({'value': object()})
+
+def test_orjson_and_stdlib_agree(monkeypatch):
+    """Test that both backends produce byte-identical output, so switching is invisible to clients"""
+    pytest.importorskip('orjson')
+    fast = (dumps(DOC), dumps(DOC, sort_keys=True), dumps({1: 'int key'}))
+    monkeypatch.setattr(json_provider, 'orjson', None)
+    assert (dumps(DOC), dumps(DOC, sort_keys=True), dumps({1: 'int key'})) == fast
+
+def test_flask_uses_the_json_layer(backend):
+    """Test that jsonify serialises ObjectId/datetime and get_json parses request bodies"""
+    app = init_json(Flask(__name__))
+
+    @app.route('/echo', methods=['POST'])
+    def echo():
+        return jsonify({'received': request.get_json(), '_id': OID, 'at': DOC['created_at']})
+
+    response = app.test_client().post('/echo', json={'mood': 'happy', 'n': [1, 2]})
+    assert response.status_code == 200
+    assert response.mimetype == 'application/json'
+    assert response.get_json() == {
+        'received': {'mood': 'happy', 'n': [1, 2]},
+        '_id': '652f1c2e9b1e8a3f4c5d6e7f',
+        'at': '2026-10-19T12:30:15.123456'
+    }
@@ -0,0 +1,103 @@
+"""
+Prometheus metrics tests
+Checks /metrics serves the text exposition format with per-endpoint
+latency histograms and status counters, and that StatsBridge mirrors the
+counters components keep in stats() into Prometheus.
+Requires prometheus_client and mongomock; skipped otherwise.
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+prometheus_client = pytest.importorskip('prometheus_client')
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Gauge
+
+import services.metrics as metrics
+from services.metrics import StatsBridge
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+def test_metrics_exposes_latency_and_status_per_endpoint(client):
+    """Test that requests show up in /metrics under their endpoint, method and final status"""
+    before = {
+        'ok': _sample('http_requests_total', endpoint='health_check', method='GET', status='200'),
+        'missing': _sample('http_requests_total', endpoint='unmatched', method='GET', status='404'),
+        'observed': _sample('http_request_duration_seconds_count', endpoint='health_check', method='GET'),
+    }
+    client.get('/health')
+    client.get('/health')
+    client.get('/no-such-route')
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain')
+    text = response.get_data(as_text=True)
+    assert '# TYPE http_request_duration_seconds histogram' in text
+    assert 'http_request_duration_seconds_bucket{endpoint="health_check",le="0.005",method="GET"}' in text
+    assert 'http_requests_in_flight{endpoint="health_check"} 0.0' in text
+
+    assert _sample('http_requests_total', endpoint='health_check', method='GET', status='200') == before['ok'] + 2
+    assert _sample('http_requests_total', endpoint='unmatched', method='GET', status='404') == before['missing'] + 1
+    assert _sample('http_request_duration_seconds_count', endpoint='health_check', method='GET') == before['observed'] + 2
+
+def test_metrics_mirrors_component_stats(client, register):
+    """Test that /metrics syncs cache counters from the components' stats before rendering"""
+    _, headers = register('alice')
+    before = _sample('cache_requests_total', cache='jwt', result='hit')
+    for _ in range(3):
+        client.get('/api/v1/auth/profile', headers=headers)
+
+    client.get('/metrics')
+    assert _sample('cache_requests_total', cache='jwt', result='hit') >= before + 2
+
+def test_metrics_token(client, monkeypatch):
+    monkeypatch.setattr(metrics, 'METRICS_AUTH_TOKEN', 'scrape-me')
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer scrape-me'}).status_code == 200
+
+def test_stats_bridge_adds_growth_since_last_sync():
+    """Test that sync adds only increases, survives a stats reset and sets gauges"""
+    registry = CollectorRegistry()
+    hits = Counter('bridge_hits', 'hits', registry=registry)
+    pressure = Gauge('bridge_pressure', 'pressure', registry=registry)
+    stats = {'hits': 0}
+    level = [0]
+
+    bridge = StatsBridge(interval=60)
+    bridge.add(lambda: dict(stats), [('hits', hits), ('absent', Counter('bridge_absent', 'x', registry=registry))])
+    bridge.add_gauge(lambda: level[0], pressure)
+
+    stats['hits'] = 3
+    bridge.sync()
+    bridge.sync()
+    assert registry.get_sample_value('bridge_hits_total') == 3
+
+    stats['hits'] = 5
+    level[0] = 1
+    bridge.sync()
+    assert registry.get_sample_value('bridge_hits_total') == 5
+    assert registry.get_sample_value('bridge_pressure') == 1
+    assert registry.get_sample_value('bridge_absent_total') == 0
+
+    # A restarted component counts from zero again; the Prometheus counter keeps its total
+    stats['hits'] = 1
+    bridge.sync()
+    assert registry.get_sample_value('bridge_hits_total') == 5
+    stats['hits'] = 4
+    bridge.sync()
+    assert registry.get_sample_value('bridge_hits_total') == 8
+
+def test_stats_bridge_thread_starts_once_per_process(monkeypatch):
+    started = []
+    monkeypatch.setattr(metrics.threading.Thread, 'start', lambda self: started.append(self.name))
+    bridge = StatsBridge()
+    bridge.start()
+    bridge.start()
+    assert started == ['metrics-sync']
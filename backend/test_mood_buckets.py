@@ -0,0 +1,111 @@
+"""
+Mood storage layout tests
+Runs the same mood API flows against both MOOD_STORAGE_LAYOUT values
+(documents and monthly buckets) on mongomock, and checks bucket spill-over
+and the migration between layouts.
+Requires mongomock (pip install mongomock); skipped otherwise.
+"""
+
+import sys
+import os
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from bson import ObjectId
+
+import models.mood_buckets as mood_buckets
+import models.mood_journal as mood_journal
+from models.mood_buckets import MoodBucketStore
+
+@pytest.fixture(params=['documents', 'buckets'])
+def layout(request, monkeypatch):
+    monkeypatch.setattr(mood_journal, 'MOOD_STORAGE_LAYOUT', request.param)
+    return request.param
+
+def _log(client, headers, when, mood='happy', intensity=5, **extra):
+    response = client.post('/api/v1/mood/mood', headers=headers, json={
+        'mood': mood, 'intensity': intensity, 'date': when.isoformat() + 'Z', **extra
+    })
+    assert response.status_code in (200, 201), response.get_json()
+    return response.get_json()['mood_id']
+
+def _history(client, headers, limit=2):
+    """Every entry of the user's history, following next_cursor"""
+    moods, cursor = [], None
+    while True:
+        query = {'limit': limit, **({'cursor': cursor} if cursor else {})}
+        body = client.get('/api/v1/mood/mood', headers=headers, query_string=query).get_json()
+        moods.extend(body['moods'])
+        if not body['has_more']:
+            return moods
+        cursor = body['next_cursor']
+
+def test_history_delete_and_daily_upsert(client, register, mongo_db, layout):
+    """Test that both layouts page, delete and replace entries identically across month boundaries"""
+    _, headers = register('alice')
+    _, other = register('bob')
+    start = datetime(2026, 8, 30, 12, 0)
+    ids = [_log(client, headers, start + timedelta(days=i), intensity=i + 1) for i in range(5)]
+    _log(client, other, start)
+
+    history = _history(client, headers)
+    assert [mood['_id'] for mood in history] == ids[::-1]
+    assert [mood['intensity'] for mood in history] == [5, 4, 3, 2, 1]
+    assert history[0]['date'] == history[0]['created_at']
+    assert {mood['day'] for mood in history} == {'2026-08-30', '2026-08-31', '2026-09-01', '2026-09-02', '2026-09-03'}
+
+    assert client.delete(f'/api/v1/mood/mood/{ids[2]}', headers=headers).status_code == 200
+    assert client.delete(f'/api/v1/mood/mood/{ids[2]}', headers=headers).status_code == 404
+    assert client.delete(f'/api/v1/mood/mood/{ids[3]}', headers=other).status_code == 404
+    assert [mood['_id'] for mood in _history(client, headers)] == [ids[4], ids[3], ids[1], ids[0]]
+
+    daily = start + timedelta(days=10)
+    first = _log(client, headers, daily, mood='sad', one_per_day=True)
+    second = _log(client, headers, daily + timedelta(hours=1), mood='calm', one_per_day=True)
+    assert first == second
+    assert [(mood['_id'], mood['mood']) for mood in _history(client, headers)][0] == (first, 'calm')
+
+    if layout == 'buckets':
+        assert mongo_db.mood_entries.count_documents({}) == 0
+        assert sorted(bucket['month'] for bucket in mongo_db.mood_entry_buckets.find()) == \
+            ['2026-08', '2026-08', '2026-09']
+    else:
+        assert mongo_db.mood_entry_buckets.count_documents({}) == 0
+
+def test_full_bucket_spills_into_another(client, register, mongo_db, monkeypatch):
+    """Test that a month with more than BUCKET_SIZE entries uses several buckets and still reads in order"""
+    monkeypatch.setattr(mood_journal, 'MOOD_STORAGE_LAYOUT', 'buckets')
+    monkeypatch.setattr(mood_buckets, 'BUCKET_SIZE', 2)
+    _, headers = register('alice')
+    start = datetime(2026, 9, 1, 8, 0)
+    ids = [_log(client, headers, start + timedelta(hours=i)) for i in range(5)]
+
+    assert sorted(bucket['count'] for bucket in mongo_db.mood_entry_buckets.find()) == [1, 2, 2]
+    assert [mood['_id'] for mood in _history(client, headers, limit=3)] == ids[::-1]
+
+def test_migration_round_trip(mongo_db, monkeypatch):
+    """Test that documents -> buckets -> documents keeps every entry and its fields"""
+    monkeypatch.setattr(mood_buckets, 'BUCKET_SIZE', 3)
+    users = [ObjectId(), ObjectId()]
+    start = datetime(2026, 7, 28, 10, 0)
+    originals = [
+        {'_id': ObjectId(), 'user_id': users[i % 2], 'mood': 'happy', 'intensity': i % 10 + 1,
+         'created_at': start + timedelta(days=i), 'date': start + timedelta(days=i),
+         'day': (start + timedelta(days=i)).date().isoformat(), 'updated_at': start + timedelta(days=i)}
+        for i in range(12)
+    ]
+    mongo_db.mood_entries.insert_many([dict(doc) for doc in originals])
+
+    assert MoodBucketStore.migrate_to_buckets(mongo_db, batch_size=4) == 12
+    buckets = list(mongo_db.mood_entry_buckets.find())
+    assert sum(bucket['count'] for bucket in buckets) == 12
+    assert all(bucket['count'] <= 3 for bucket in buckets)
+    assert all(bucket['first'] <= bucket['last'] for bucket in buckets)
+
+    mongo_db.mood_entries.drop()
+    assert MoodBucketStore.migrate_to_documents(mongo_db, batch_size=5) == 12
+    restored = sorted(mongo_db.mood_entries.find(), key=lambda doc: doc['created_at'])
+    assert restored == originals
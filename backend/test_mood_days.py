@@ -0,0 +1,84 @@
+"""
+Mood day key and calendar tests
+Checks local-day and month boundary helpers, and that GET /mood/calendar
+files entries under the user's local day in both storage layouts, against
+mongomock.
+Requires mongomock (pip install mongomock) for the API tests.
+"""
+
+import sys
+import os
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+import models.mood_journal as mood_journal
+from models.mood_journal import day_key, local_day, month_days
+
+def test_local_day_uses_the_timestamps_own_offset():
+    """Test that local_day keeps the user's date while day_key converts to UTC"""
+    evening_in_chicago = datetime(2026, 10, 19, 23, 30, tzinfo=timezone(timedelta(hours=-5)))
+    morning_in_tokyo = datetime(2026, 10, 20, 1, 0, tzinfo=timezone(timedelta(hours=9)))
+
+    assert local_day(evening_in_chicago) == '2026-10-19'
+    assert day_key(evening_in_chicago) == '2026-10-20'
+    assert local_day(morning_in_tokyo) == '2026-10-20'
+    assert day_key(morning_in_tokyo) == '2026-10-19'
+    assert local_day(datetime(2026, 10, 19, 23, 59)) == day_key(datetime(2026, 10, 19, 23, 59)) == '2026-10-19'
+
+@pytest.mark.parametrize('month, expected', [
+    ('2024-02', ('2024-02-01', '2024-02-29')),
+    ('2026-02', ('2026-02-01', '2026-02-28')),
+    ('2026-04', ('2026-04-01', '2026-04-30')),
+    ('2026-12', ('2026-12-01', '2026-12-31')),
+    ('2027-01', ('2027-01-01', '2027-01-31')),
+])
+def test_month_days(month, expected):
+    """Test month boundaries across leap years, 30-day months and the year end"""
+    assert month_days(month) == expected
+
+@pytest.mark.parametrize('month', ['2026-13', '2026-1x', '2026', '', '10-2026'])
+def test_month_days_rejects_malformed(month):
+    with pytest.raises(ValueError):
+        month_days(month)
+
+@pytest.mark.parametrize('layout', ['documents', 'buckets'])
+def test_calendar_files_entries_under_the_local_day(client, register, monkeypatch, layout):
+    """Test that the calendar shows each local day's latest mood, at month edges and with explicit days"""
+    monkeypatch.setattr(mood_journal, 'MOOD_STORAGE_LAYOUT', layout)
+    _, headers = register('alice')
+
+    def log(mood, when, **extra):
+        response = client.post('/api/v1/mood/mood', headers=headers,
+                               json={'mood': mood, 'intensity': 5, 'date': when, **extra})
+        assert response.status_code == 201, response.get_json()
+        return response.get_json()
+
+    # Late on Oct 31 in UTC-5 is already Nov 1 in UTC; it belongs to October
+    late = log('tired', '2026-10-31T23:30:00-05:00')
+    assert late['day'] == '2026-10-31'
+    log('calm', '2026-10-01T00:10:00+02:00')
+    log('sad', '2026-10-15T08:00:00Z')
+    latest = log('happy', '2026-10-15T20:00:00Z')
+    # An explicit day wins over the timestamp's offset
+    log('excited', '2026-11-01T03:00:00Z', day='2026-11-02')
+
+    october = client.get('/api/v1/mood/mood/calendar', headers=headers, query_string={'month': '2026-10'}).get_json()
+    assert october['month'] == '2026-10'
+    assert {day: (entry['mood'], entry['entries']) for day, entry in october['days'].items()} == {
+        '2026-10-01': ('calm', 1),
+        '2026-10-15': ('happy', 2),
+        '2026-10-31': ('tired', 1)
+    }
+    assert october['days']['2026-10-15']['mood_id'] == latest['mood_id']
+
+    november = client.get('/api/v1/mood/mood/calendar', headers=headers, query_string={'month': '2026-11'}).get_json()
+    assert list(november['days']) == ['2026-11-02']
+
+    assert client.get('/api/v1/mood/mood/calendar', headers=headers,
+                      query_string={'month': '2026-13'}).status_code == 400
+    bad_day = client.post('/api/v1/mood/mood', headers=headers, json={'mood': 'x', 'intensity': 5, 'day': '31/10/2026'})
+    assert bad_day.status_code == 400
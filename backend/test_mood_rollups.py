@@ -0,0 +1,90 @@
+"""
+Daily mood rollup tests
+Logs, replaces, deletes and bulk-uploads moods through the API against
+mongomock and checks the mood_daily_rollups counters and /mood/stats
+agree with a rebuild from the raw entries.
+Requires mongomock (pip install mongomock); skipped otherwise.
+"""
+
+import sys
+import os
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bson import ObjectId
+from flask import g
+
+from models.mood_journal import MoodRollup, day_key
+
+TODAY = day_key(datetime.now(timezone.utc))
+YESTERDAY = day_key(datetime.now(timezone.utc) - timedelta(days=1))
+
+def _rollups(mongo_db, user_id):
+    return {
+        doc['day']: (doc['total'], {mood: (c['count'], c['intensity_sum']) for mood, c in doc['moods'].items() if c['count']})
+        for doc in mongo_db.mood_daily_rollups.find({'user_id': ObjectId(user_id)})
+    }
+
+def _log(client, headers, mood, intensity, day=TODAY, **extra):
+    response = client.post('/api/v1/mood/mood', headers=headers,
+                           json={'mood': mood, 'intensity': intensity, 'day': day, **extra})
+    assert response.status_code in (200, 201)
+    return response.get_json()['mood_id']
+
+def test_rollups_follow_every_write_path(client, register, mongo_db, flask_app):
+    """Test that create, one-per-day replace, delete and bulk keep the day counters exact"""
+    user_id, headers = register('alice')
+
+    first = _log(client, headers, 'happy', 8)
+    _log(client, headers, 'sad', 2, day=YESTERDAY)
+    _log(client, headers, 'Happy', 6, one_per_day=True)
+    _log(client, headers, 'calm', 4, one_per_day=True)
+    assert _rollups(mongo_db, user_id) == {
+        TODAY: (2, {'happy': (1, 8), 'calm': (1, 4)}),
+        YESTERDAY: (1, {'sad': (1, 2)})
+    }
+
+    batch = {'entries': [
+        {'client_id': 'a', 'mood': 'happy', 'intensity': 4, 'day': TODAY},
+        {'client_id': 'b', 'mood': 'sad', 'intensity': 4, 'day': YESTERDAY},
+        {'client_id': 'c', 'mood': 'sad', 'intensity': 11, 'day': YESTERDAY}
+    ]}
+    assert client.post('/api/v1/mood/mood/bulk', headers=headers, json=batch).get_json()['created'] == 2
+    # A replayed batch is recognised by client_id and counted only once
+    assert client.post('/api/v1/mood/mood/bulk', headers=headers, json=batch).get_json()['created'] == 0
+
+    assert client.delete(f'/api/v1/mood/mood/{first}', headers=headers).status_code == 200
+
+    expected = {
+        TODAY: (2, {'happy': (1, 4), 'calm': (1, 4)}),
+        YESTERDAY: (2, {'sad': (2, 6)})
+    }
+    assert _rollups(mongo_db, user_id) == expected
+
+    body = client.get('/api/v1/mood/mood/stats', headers=headers, query_string={'daily': 'true'}).get_json()
+    assert {stat['_id']: (stat['count'], stat['avg_intensity']) for stat in body['stats']} == {
+        'sad': (2, 3.0), 'happy': (1, 4.0), 'calm': (1, 4.0)
+    }
+    assert body['stats'][0]['_id'] == 'sad'
+    assert [(day['day'], day['count'], day['avg_intensity']) for day in body['daily']] == [
+        (YESTERDAY, 2, 3.0), (TODAY, 2, 4.0)
+    ]
+
+    # The counters match what a rebuild from the raw entries produces
+    MoodRollup.rebuild(mongo_db, user_id)
+    assert _rollups(mongo_db, user_id) == expected
+
+def test_decrement_never_creates_or_goes_negative(flask_app, mongo_db):
+    """Test that taking back an entry that was never counted leaves the rollups alone"""
+    user_id = str(ObjectId())
+    with flask_app.app_context():
+        g.db = mongo_db
+        MoodRollup.record(user_id, TODAY, 'happy', 5, count=-1)
+        assert mongo_db.mood_daily_rollups.count_documents({}) == 0
+
+        MoodRollup.record(user_id, TODAY, 'happy', 5)
+        MoodRollup.record(user_id, TODAY, 'happy', 5, count=-1)
+        MoodRollup.record(user_id, TODAY, 'happy', 5, count=-1)
+    assert _rollups(mongo_db, user_id) == {TODAY: (0, {})}
@@ -0,0 +1,137 @@
+"""
+Keyset pagination tests
+Checks the cursor helpers in models/pagination.py, walks the community
+feed and the mood/feedback histories page by page through next_cursor,
+and reads the histories back as NDJSON streams, against mongomock.
+Requires mongomock (pip install mongomock) for the API tests.
+"""
+
+import json
+import sys
+import os
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from bson import ObjectId
+
+from models.pagination import decode_cursor, encode_cursor, keyset_filter, split_page
+
+def test_split_page_cursor_round_trip():
+    """Test that split_page's cursor decodes back to the last document of the page"""
+    now = datetime(2026, 10, 19, 12, 30, 15, 123000)
+    docs = [{'_id': ObjectId(), 'created_at': now - timedelta(minutes=i)} for i in range(4)]
+
+    page, cursor = split_page(docs, 3)
+    assert page == docs[:3]
+    assert decode_cursor(cursor) == (docs[2]['created_at'], docs[2]['_id'])
+
+    assert split_page(docs, 4) == (docs, None)
+    assert split_page([], 10) == ([], None)
+
+def test_keyset_filter_breaks_ties_by_id():
+    """Test that documents sharing a timestamp are ordered by _id after the cursor"""
+    now = datetime(2026, 10, 19, 12, 0)
+    last_id = ObjectId()
+    assert keyset_filter(encode_cursor(now, last_id)) == {
+        '$or': [
+            {'created_at': {'$lt': now}},
+            {'created_at': now, '_id': {'$lt': last_id}}
+        ]
+    }
+
+@pytest.mark.parametrize('cursor', ['', 'garbage', encode_cursor(datetime.now(), ObjectId())[:-4]])
+def test_decode_rejects_malformed_cursors(cursor):
+    """Test that tampered or truncated cursors raise ValueError"""
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+def test_feed_pages_through_cursor(client, mongo_db):
+    """Test that following next_cursor visits every public post once, newest first, across timestamp ties"""
+    start = datetime(2026, 10, 1, 9, 0)
+    # Pairs of posts share a created_at, so page boundaries fall inside ties
+    mongo_db.community_posts.insert_many([
+        {'_id': ObjectId(), 'user_id': ObjectId(), 'is_public': True, 'mood': 'happy', 'activity_type': 'movie',
+         'created_at': start + timedelta(minutes=i // 2), 'likes': 0, 'stars': 0, 'comments_count': 0}
+        for i in range(7)
+    ] + [{'_id': ObjectId(), 'user_id': ObjectId(), 'is_public': False, 'created_at': start}])
+    expected = [
+        str(post['_id']) for post in mongo_db.community_posts.find({'is_public': True}).sort(
+            [('created_at', -1), ('_id', -1)]
+        )
+    ]
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        response = client.get('/api/v1/community/posts',
+                              query_string={'limit': 3, **({'cursor': cursor} if cursor else {})})
+        assert response.status_code == 200
+        body = response.get_json()
+        seen.extend(post['_id'] for post in body['posts'])
+        pages += 1
+        if not body['has_more']:
+            assert body['next_cursor'] is None
+            break
+        cursor = body['next_cursor']
+
+    assert seen == expected
+    assert pages == 3
+
+    assert client.get('/api/v1/community/posts', query_string={'cursor': 'garbage'}).status_code == 400
+
+def _walk(client, url, key, headers, limit):
+    """Follow next_cursor to the end; returns (ids, number of pages)"""
+    ids, cursor, pages = [], None, 0
+    while True:
+        query = {'limit': limit, **({'cursor': cursor} if cursor else {})}
+        body = client.get(url, headers=headers, query_string=query).get_json()
+        ids.extend(doc['_id'] for doc in body[key])
+        pages += 1
+        if not body['has_more']:
+            return ids, pages
+        cursor = body['next_cursor']
+
+def _ndjson(response):
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    return [json.loads(line) for line in response.get_data().splitlines()]
+
+def test_mood_history_pages_and_streams(client, register):
+    """Test that mood history pages through cursors and streams the same entries as NDJSON"""
+    _, headers = register('alice')
+    for intensity in range(1, 6):
+        assert client.post('/api/v1/mood/mood', headers=headers,
+                           json={'mood': 'calm', 'intensity': intensity}).status_code == 201
+
+    ids, pages = _walk(client, '/api/v1/mood/mood', 'moods', headers, limit=2)
+    assert len(ids) == len(set(ids)) == 5
+    assert pages == 3
+
+    streamed = _ndjson(client.get('/api/v1/mood/mood', headers=headers, query_string={'format': 'ndjson'}))
+    assert [doc['_id'] for doc in streamed] == ids
+    assert sorted(doc['intensity'] for doc in streamed) == [1, 2, 3, 4, 5]
+
+    # The Accept header selects the stream too, and fields= trims every line
+    streamed = _ndjson(client.get('/api/v1/mood/mood', query_string={'fields': 'mood'},
+                                  headers={**headers, 'Accept': 'application/x-ndjson'}))
+    assert streamed == [{'_id': doc_id, 'mood': 'calm'} for doc_id in ids]
+
+def test_feedback_history_pages_and_streams(client, register, mongo_db):
+    """Test that feedback history pages through cursors and streams as NDJSON, only for its owner"""
+    user_id, headers = register('alice')
+    start = datetime(2026, 10, 1, 9, 0)
+    mongo_db.user_feedback.insert_many([
+        {'user_id': ObjectId(owner), 'recommendation_id': ObjectId(), 'liked': i % 2 == 0,
+         'mood': 'happy', 'created_at': start + timedelta(hours=i)}
+        for i, owner in enumerate([user_id] * 5 + [str(ObjectId())])
+    ])
+    url = '/api/v1/mood/recommendation/feedback/history'
+
+    ids, pages = _walk(client, url, 'feedback_history', headers, limit=2)
+    assert len(ids) == 5 and pages == 3
+
+    streamed = _ndjson(client.get(url, headers=headers, query_string={'format': 'ndjson'}))
+    assert [doc['_id'] for doc in streamed] == ids
+    assert client.get(url, headers=headers, query_string={'cursor': 'garbage'}).status_code == 400
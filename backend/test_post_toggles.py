@@ -0,0 +1,88 @@
+"""
+Concurrency stress test for community like/star toggles
+Hammers like/unlike/star/unstar from many threads and checks the post
+counters match the number of reaction documents exactly.
+Requires a reachable MongoDB (MONGO_URI); the test is skipped otherwise.
+"""
+
+import sys
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from bson import ObjectId
+from flask import Flask, g
+from pymongo import MongoClient
+
+TEST_DB_NAME = 'mood_journal_toggle_stress_test'
+THREADS = 32
+USERS = 40
+TAPS_PER_USER = 5
+
+def _connect():
+    """Return a test database, skipping the test when MongoDB is not reachable"""
+    from backend.config import config
+    try:
+        client = MongoClient(config.MONGO_URI, serverSelectionTimeoutMS=2000)
+        client.admin.command('ping')
+    except Exception as e:
+        pytest.skip(f"MongoDB not reachable: {e}")
+    client.drop_database(TEST_DB_NAME)
+    return client[TEST_DB_NAME]
+
+def _run_concurrently(app, db, fn, calls):
+    """Run fn(*args) for every args tuple from a thread pool, each inside its own app context"""
+    def worker(args):
+        with app.app_context():
+            g.db = db
+            return fn(*args)
+
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        return list(pool.map(worker, calls))
+
+def _check_toggle(app, db, add, remove, collection, counter):
+    post_id = str(db.community_posts.insert_one({
+        'is_public': True,
+        'created_at': datetime.utcnow(),
+        'likes': 0,
+        'stars': 0,
+        'comments_count': 0
+    }).inserted_id)
+    user_ids = [str(ObjectId()) for _ in range(USERS)]
+
+    # Every user double-taps several times at once: exactly one add per user may win
+    calls = [(post_id, user_id) for user_id in user_ids for _ in range(TAPS_PER_USER)]
+    results = _run_concurrently(app, db, add, calls)
+    post = db.community_posts.find_one({'_id': ObjectId(post_id)})
+    stored = db[collection].count_documents({'post_id': ObjectId(post_id)})
+    assert (sum(results), post[counter], stored) == (USERS, USERS, USERS), \
+        f"{counter}: {sum(results)} adds reported, counter={post[counter]}, documents={stored}, expected {USERS}"
+
+    # Concurrent removes must bring the counter back to zero, never below
+    results = _run_concurrently(app, db, remove, calls)
+    post = db.community_posts.find_one({'_id': ObjectId(post_id)})
+    stored = db[collection].count_documents({'post_id': ObjectId(post_id)})
+    assert (sum(results), post[counter], stored) == (USERS, 0, 0), \
+        f"{counter}: {sum(results)} removes reported, counter={post[counter]}, documents={stored}, expected 0"
+
+def test_concurrent_toggles_keep_counters_exact():
+    """Test that like/star counters stay exact under concurrent toggles"""
+    db = _connect()
+
+    from backend.models.community_posts import CommunityPost
+
+    app = Flask(__name__)
+    try:
+        CommunityPost.ensure_indexes(db)
+        _check_toggle(app, db, CommunityPost.like_post, CommunityPost.unlike_post, 'post_likes', 'likes')
+        _check_toggle(app, db, CommunityPost.star_post, CommunityPost.unstar_post, 'post_stars', 'stars')
+    finally:
+        db.client.drop_database(TEST_DB_NAME)
+        db.client.close()
+
+if __name__ == "__main__":
+    test_concurrent_toggles_keep_counters_exact()
@@ -0,0 +1,79 @@
+"""
+Field projection tests
+Checks the projection helpers, that user lookups never load password_hash
+unless asked to, and the fields= parameter on list endpoints, against
+mongomock.
+Requires mongomock (pip install mongomock) for the database tests.
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from flask import g
+
+from models.projection import apply_projection, build_projection, parse_fields
+
+def test_build_and_apply_projection():
+    """Test that projections include the asked fields plus required ones, and _id always"""
+    assert build_projection(None) is None
+    assert build_projection([]) is None
+    assert build_projection(['mood'], required=('created_at',)) == {'mood': 1, 'created_at': 1}
+
+    doc = {'_id': 1, 'mood': 'happy', 'intensity': 5, 'note': 'x'}
+    assert apply_projection(doc, None) is doc
+    assert apply_projection(doc, {'mood': 1}) == {'_id': 1, 'mood': 'happy'}
+
+def test_parse_fields():
+    assert parse_fields(' mood, intensity ,,', ('mood', 'intensity')) == ['mood', 'intensity']
+    assert parse_fields(None, ('mood',)) == []
+    with pytest.raises(ValueError, match='password_hash'):
+        parse_fields('mood,password_hash', ('mood',))
+
+def test_user_reads_leave_out_password_hash(flask_app, register, mongo_db):
+    """Test that every user lookup except the credential one omits password_hash"""
+    from auth.models import User
+    from auth.profile_cache import profile_cache
+
+    user_id, _ = register('alice')
+    with flask_app.app_context():
+        g.db = mongo_db
+        for doc in (User.find_by_id(user_id), User.find_by_username_or_email('alice'),
+                    User.find_by_username_or_email('alice@example.com'), User.get_profile(user_id)):
+            assert doc['username'] == 'alice'
+            assert 'password_hash' not in doc
+            assert set(doc) <= set(User.PROFILE_PROJECTION) | {'_id'}
+        assert 'password_hash' not in profile_cache.peek(user_id)
+
+        assert User.find_by_username_or_email('alice', fields=['_id']) == {'_id': mongo_db.users.find_one()['_id']}
+        credentials = User.find_by_username_or_email('alice', fields=User.CREDENTIAL_FIELDS)
+        assert credentials['password_hash'].startswith('$2')
+
+def test_profile_endpoints_never_expose_the_hash(client, register):
+    _, headers = register('alice')
+    for url in ('/api/v1/auth/profile', '/api/v1/mood/profile'):
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200
+        assert b'password' not in response.get_data()
+
+def test_fields_parameter_on_list_endpoints(client, register):
+    """Test that fields= trims list responses and unknown fields are a 400"""
+    _, headers = register('alice')
+    client.post('/api/v1/mood/mood', headers=headers, json={'mood': 'happy', 'intensity': 5, 'note': 'n'})
+    client.post('/api/v1/community/posts', headers=headers, json={
+        'mood': 'happy', 'activity_title': 'Walk', 'activity_description': 'Outside',
+        'activity_type': 'activity', 'mood_intensity': 6
+    })
+
+    moods = client.get('/api/v1/mood/mood', headers=headers, query_string={'fields': 'mood,intensity'}).get_json()
+    assert [set(mood) for mood in moods['moods']] == [{'_id', 'mood', 'intensity', 'created_at'}]
+
+    posts = client.get('/api/v1/community/posts', query_string={'fields': 'mood'}).get_json()
+    assert [set(post) for post in posts['posts']] == [{'_id', 'mood', 'created_at', 'isLiked', 'isStarred'}]
+
+    response = client.get('/api/v1/mood/mood', headers=headers, query_string={'fields': 'mood,password_hash'})
+    assert response.status_code == 400
+    assert client.get('/api/v1/community/posts', query_string={'fields': 'secret'}).status_code == 400
@@ -0,0 +1,130 @@
+"""
+Rate limiter tests
+Checks the GCRA arithmetic with an injected clock, the per-user / per-IP
+keying, the OPTIONS exemption and the 429 response.
+No database required.
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from flask import Flask, g, request
+
+from services.rate_limiter import MemoryBackend, RateLimiter, SharedMemoryBackend, parse_rate
+
+def _limited_app(rate):
+    """A bare app whose only endpoint is limited to `rate`; X-User sets g.user_id like the auth hook does"""
+    app = Flask(__name__)
+    limiter = RateLimiter({'ping': rate})
+
+    @app.before_request
+    def load_user():
+        g.user_id = request.headers.get('X-User')
+
+    app.before_request(limiter.before_request)
+
+    @app.route('/ping', methods=['GET', 'POST'])
+    def ping():
+        return 'pong'
+
+    return app, limiter
+
+def test_parse_rate():
+    """Test that rates parse to (count, period seconds) and unknown periods are rejected"""
+    assert parse_rate('10/minute') == (10, 60.0)
+    assert parse_rate('5/Seconds') == (5, 1.0)
+    with pytest.raises(ValueError):
+        parse_rate('3/fortnight')
+
+@pytest.mark.parametrize('backend_factory', [
+    lambda tmp_path: MemoryBackend(),
+    lambda tmp_path: SharedMemoryBackend(str(tmp_path / 'ratelimit'), slots=64),
+], ids=['memory', 'shared'])
+def test_burst_then_refill(tmp_path, backend_factory):
+    """Test that N/period allows a burst of N, then one request per period/N"""
+    limiter = RateLimiter(backend=backend_factory(tmp_path))
+    t0 = 1000.0
+
+    # A full burst of 6 fits at one instant; the 7th must wait one emission interval (10s)
+    assert [limiter.hit('login', 'ip:a', 6, 60, now=t0) for _ in range(6)] == [0.0] * 6
+    assert limiter.hit('login', 'ip:a', 6, 60, now=t0) == pytest.approx(10.0)
+
+    # Rejected hits do not push the schedule back
+    assert limiter.hit('login', 'ip:a', 6, 60, now=t0 + 4) == pytest.approx(6.0)
+
+    # After one interval exactly one more request is admitted
+    assert limiter.hit('login', 'ip:a', 6, 60, now=t0 + 10) == 0.0
+    assert limiter.hit('login', 'ip:a', 6, 60, now=t0 + 10) == pytest.approx(10.0)
+
+    # After a full idle period the whole burst is available again, but never more
+    later = t0 + 10 + 60
+    assert [limiter.hit('login', 'ip:a', 6, 60, now=later) for _ in range(6)] == [0.0] * 6
+    assert limiter.hit('login', 'ip:a', 6, 60, now=later) > 0
+
+    # Other identities and scopes have their own budget
+    assert limiter.hit('login', 'ip:b', 6, 60, now=t0) == 0.0
+    assert limiter.hit('register', 'ip:a', 6, 60, now=t0) == 0.0
+
+def test_shared_backend_is_shared_between_instances(tmp_path):
+    """Test that two workers mapping the same file draw from one budget"""
+    path = str(tmp_path / 'ratelimit')
+    first = RateLimiter(backend=SharedMemoryBackend(path, slots=64))
+    second = RateLimiter(backend=SharedMemoryBackend(path, slots=64))
+
+    assert first.hit('login', 'ip:a', 2, 60, now=500.0) == 0.0
+    assert second.hit('login', 'ip:a', 2, 60, now=500.0) == 0.0
+    assert first.hit('login', 'ip:a', 2, 60, now=500.0) == pytest.approx(30.0)
+
+def test_rule_for_prefers_endpoint_over_blueprint():
+    """Test that an endpoint rule wins over its blueprint's rule"""
+    limiter = RateLimiter({'auth_bp.login': '5/minute', 'auth_bp': '100/minute'})
+    assert limiter.rule_for('auth_bp.login', 'auth_bp') == ('auth_bp.login', (5, 60.0))
+    assert limiter.rule_for('auth_bp.register', 'auth_bp') == ('auth_bp', (100, 60.0))
+    assert limiter.rule_for('health', None) == (None, None)
+
+def test_429_headers():
+    """Test that an exceeded limit answers 429 with Retry-After and X-RateLimit-Limit"""
+    app, limiter = _limited_app('2/minute')
+    client = app.test_client()
+
+    assert client.get('/ping').status_code == 200
+    assert client.get('/ping').status_code == 200
+    response = client.get('/ping')
+
+    assert response.status_code == 429
+    assert response.get_json() == {'error': 'Too many requests, please slow down'}
+    assert 1 <= int(response.headers['Retry-After']) <= 30
+    assert response.headers['X-RateLimit-Limit'] == '2;w=60'
+    assert limiter.rejected == 1
+
+def test_keys_by_user_when_authenticated_else_by_ip():
+    """Test that users get their own budget while anonymous clients share one per IP"""
+    app, _ = _limited_app('1/minute')
+    client = app.test_client()
+
+    assert client.get('/ping', headers={'X-User': 'alice'}).status_code == 200
+    assert client.get('/ping', headers={'X-User': 'alice'}).status_code == 429
+
+    # Same address, different user: not affected by alice's usage
+    assert client.get('/ping', headers={'X-User': 'bob'}).status_code == 200
+
+    # Anonymous requests are keyed by address, separately from the users behind it
+    assert client.get('/ping').status_code == 200
+    assert client.get('/ping').status_code == 429
+    assert client.get('/ping', environ_base={'REMOTE_ADDR': '10.0.0.2'}).status_code == 200
+
+def test_options_preflight_is_exempt():
+    """Test that CORS preflights neither count against nor get blocked by the limit"""
+    app, limiter = _limited_app('1/minute')
+    client = app.test_client()
+
+    for _ in range(5):
+        assert client.options('/ping').status_code == 200
+    assert client.post('/ping').status_code == 200
+    assert client.options('/ping').status_code == 200
+    assert client.post('/ping').status_code == 429
+    assert limiter.rejected == 1
@@ -0,0 +1,152 @@
+"""
+Delta sync tests
+Drives GET /api/v1/sync against mongomock: sync tokens, paging across
+streams, and tombstones left by the DELETE endpoints.
+Requires mongomock (pip install mongomock); skipped otherwise.
+"""
+
+import sys
+import os
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+import models.sync as sync_module
+from models.sync import decode_sync_token, encode_sync_token, utcnow
+
+@pytest.fixture(autouse=True)
+def no_overlap(monkeypatch):
+    """Exact rounds: without the clock-skew overlap a round never repeats the previous one"""
+    monkeypatch.setattr(sync_module, 'SYNC_OVERLAP_SECONDS', 0)
+
+def _sync(client, headers, token=None):
+    response = client.get('/api/v1/sync', headers=headers, query_string={'since': token} if token else None)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+def _log_mood(client, headers, mood='happy'):
+    response = client.post('/api/v1/mood/mood', headers=headers, json={'mood': mood, 'intensity': 5})
+    assert response.status_code == 201
+    return response.get_json()['mood_id']
+
+def _create_post(client, headers):
+    response = client.post('/api/v1/community/posts', headers=headers, json={
+        'mood': 'happy', 'activity_title': 'Walk', 'activity_description': 'Around the block',
+        'activity_type': 'activity', 'mood_intensity': 6
+    })
+    assert response.status_code == 201
+    return response.get_json()['post_id']
+
+def _comment(client, headers, post_id, text='nice'):
+    response = client.post(f'/api/v1/community/posts/{post_id}/comments', headers=headers, json={'comment': text})
+    assert response.status_code == 201
+    return response.get_json()['comment_id']
+
+def _ids(docs):
+    return [doc['_id'] for doc in docs]
+
+def test_sync_token_round_trip():
+    """Test that tokens decode to the position they encode and garbage is rejected"""
+    since = utcnow().replace(microsecond=0)
+    state = decode_sync_token(encode_sync_token({'since': since.isoformat()}))
+    assert state == {'since': since, 'next': None, 'pos': None}
+
+    for token in ('not-a-token', encode_sync_token({'pos': {'moods': ['yesterday', 'x']}})):
+        with pytest.raises(ValueError):
+            decode_sync_token(token)
+
+def test_full_then_delta_sync(client, register):
+    """Test that the first sync returns everything and the next one only what changed since"""
+    user_id, headers = register('alice')
+    mood_id = _log_mood(client, headers)
+    post_id = _create_post(client, headers)
+    comment_id = _comment(client, headers, post_id)
+
+    first = _sync(client, headers)
+    assert _ids(first['moods']) == [mood_id]
+    assert _ids(first['posts']) == [post_id]
+    assert _ids(first['comments']) == [comment_id]
+    assert first['deleted'] == []
+    assert (first['has_more'], first['reset']) == (False, False)
+
+    assert _ids(_sync(client, headers, first['next'])['moods']) == []
+
+    second_mood = _log_mood(client, headers, 'calm')
+    delta = _sync(client, headers, first['next'])
+    assert _ids(delta['moods']) == [second_mood]
+    assert delta['posts'] == delta['comments'] == []
+
+    # Other users' documents never appear
+    _, other_headers = register('bob')
+    assert _sync(client, other_headers)['moods'] == []
+
+def test_bad_and_expired_tokens(client, register):
+    """Test that a malformed token is a 400 and one older than the tombstones forces a reset"""
+    _, headers = register('alice')
+    mood_id = _log_mood(client, headers)
+
+    response = client.get('/api/v1/sync', headers=headers, query_string={'since': 'garbage'})
+    assert response.status_code == 400
+
+    expired = encode_sync_token({'since': (utcnow() - timedelta(days=sync_module.SYNC_TOMBSTONE_DAYS + 1)).isoformat()})
+    body = _sync(client, headers, expired)
+    assert body['reset'] is True
+    assert _ids(body['moods']) == [mood_id]
+
+def test_paging_across_streams(client, register, monkeypatch):
+    """Test that a round pages every stream independently and hands out each document exactly once"""
+    monkeypatch.setattr(sync_module, 'SYNC_PAGE_SIZE', 2)
+    _, headers = register('alice')
+    moods = [_log_mood(client, headers) for _ in range(3)]
+    post_id = _create_post(client, headers)
+    comments = [_comment(client, headers, post_id, f"c{i}") for i in range(5)]
+
+    pages = [_sync(client, headers)]
+    while pages[-1]['has_more']:
+        assert len(pages) < 10
+        pages.append(_sync(client, headers, pages[-1]['next']))
+
+    assert [len(page['moods']) for page in pages] == [2, 1, 0]
+    assert [len(page['posts']) for page in pages] == [1, 0, 0]
+    assert [len(page['comments']) for page in pages] == [2, 2, 1]
+    assert [mood for page in pages for mood in _ids(page['moods'])] == moods
+    assert [comment for page in pages for comment in _ids(page['comments'])] == comments
+
+    # Every page of a round carries the round's start time; the last one moves the client past it
+    assert decode_sync_token(pages[0]['next'])['next'] == decode_sync_token(pages[1]['next'])['next']
+    final = decode_sync_token(pages[-1]['next'])
+    assert final['pos'] is None and final['since'] == decode_sync_token(pages[0]['next'])['next']
+    assert _sync(client, headers, pages[-1]['next'])['moods'] == []
+
+def test_deletes_leave_tombstones(client, register):
+    """Test that the DELETE endpoints report deletions to every user syncing the documents"""
+    _, alice = register('alice')
+    _, bob = register('bob')
+    mood_id = _log_mood(client, alice)
+    post_id = _create_post(client, alice)
+    other_post = _create_post(client, alice)
+    own_comment = _comment(client, alice, other_post)
+    bobs_comment = _comment(client, bob, post_id)
+
+    alice_token = _sync(client, alice)['next']
+    bob_token = _sync(client, bob)['next']
+
+    assert client.delete(f'/api/v1/mood/mood/{mood_id}', headers=alice).status_code == 200
+    assert client.delete(f'/api/v1/community/posts/{other_post}/comments/{own_comment}', headers=alice).status_code == 200
+    assert client.delete(f'/api/v1/community/posts/{post_id}', headers=alice).status_code == 200
+    assert client.delete(f'/api/v1/mood/mood/{mood_id}', headers=alice).status_code == 404
+
+    deleted = _sync(client, alice, alice_token)['deleted']
+    assert sorted((d['type'], d['id']) for d in deleted) == sorted([
+        ('moods', mood_id), ('comments', own_comment), ('posts', post_id)
+    ])
+    assert all(d['deleted_at'] for d in deleted)
+
+    # Bob's comment went with alice's post; his client learns about it too
+    assert [(d['type'], d['id']) for d in _sync(client, bob, bob_token)['deleted']] == [('comments', bobs_comment)]
+
+    # A full download has nothing to delete
+    assert _sync(client, alice)['deleted'] == []